@@ -1,11 +1,15 @@
 from pathlib import Path
 
 ROOT_DIR = Path(__file__).resolve().parents[2]
-DB_DIR = ROOT_DIR / "db"
-DB_DIR.mkdir(parents=True, exist_ok=True)
+DB_DIR = ROOT_DIR / "db"   # 作成は app.core.db.init_db() が行う（import 時にはディスクに触れない）
 
 DB_PATH = DB_DIR / "heartful_dev.db"
 
+# 締めた月の環境ログ（Parquet）。farm=<farm>/month=<yyyy-mm>/part-0.parquet（app.core.env_archive）
+ENV_ARCHIVE_DIR = ROOT_DIR / "data" / "archive" / "env"
+# 取り込み済みの CSV（etl/watch_inbox.py）。raw/<kind>/<yyyy-mm>/（Parquet のデータセットとは別のディレクトリに置く）
+RAW_ARCHIVE_DIR = ROOT_DIR / "data" / "archive" / "raw"
+
 # ブランド系farm
 FARM_BRAND_AIKAWA_FRUIT_ICHIGO      = "Aikawa-FRUIT-Ichigo"
 FARM_BRAND_AIKAWA_FRUIT_MINITOMATO  = "Aikawa-FRUIT-MiniTomato"
@@ -0,0 +1,142 @@
+"""
+取り込み（ETL / CSV Upload）共通のパーサ。
+
+1行ずつ .apply() せず、列（Series）単位でまとめて変換する。
+収量CSVの日付・収量の列は値の種類が少ないので、ユニーク値だけを変換して元の行に戻す。
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+EXCEL_SERIAL_MIN = 30000  # 1982-02-18
+EXCEL_SERIAL_MAX = 60000  # 2064-04-08
+
+ZEN_DATE = str.maketrans("０１２３４５６７８９／－：", "0123456789/-:")
+ZEN_NUM = str.maketrans(
+    {**{chr(ord("０") + i): str(i) for i in range(10)}, "．": ".", "，": ",", "－": "-", "＋": "+",
+     "ｋ": "k", "Ｋ": "k", "ｇ": "g", "Ｇ": "g", "㎏": "kg"}
+)
+
+# 単位 -> kg にするときの除数（0.001 を掛けると 350g が 0.35000000000000003kg になり、
+# 重複判定キー（amount_kg を含む）が旧データと一致しなくなるので割り算にする）
+UNIT_DIVISOR = {"g": 1000.0, "kg": 1.0}
+
+# 年-月-日（区切りは / か -、前後の空白可）+ 任意の時刻（00:00〜23:59:59）+ 任意のタイムゾーン（日付は書かれたまま。UTC には直さない）
+_DATE_RE = (
+    r"^(?P<year>\d{4})\s*[/-]\s*(?P<month>\d{1,2})\s*[/-]\s*(?P<day>\d{1,2})"
+    r"(?:[\sT]*(?:[01]?\d|2[0-3]):[0-5]\d(?::[0-5]\d(?:\.\d+)?)?"
+    r"\s*(?:Z|[+-]\d{2}:?\d{2})?)?$"
+)
+# Excelシリアル（数値列として読まれた "45933.0" も含む）。8桁なら YYYYMMDD
+_SERIAL_RE = r"^(?P<serial>\d+)(?:\.0*)?$"
+
+
+def _map_unique(values: pd.Series, parse) -> np.ndarray:
+    """values のユニーク値（欠損以外）を文字列にして parse に渡し、結果を元の行に引き当てる。"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    parsed = parse(pd.Series(uniques, dtype=object).astype(str))
+    out = np.full(len(values), None, dtype=object)
+    ok = codes >= 0
+    out[ok] = parsed[codes[ok]]
+    return out
+
+
+def _to_naive(ts) -> pd.Timestamp:
+    """1値を Timestamp に（タイムゾーン付きは書かれた時刻のまま外す）。変換できなければ NaT。"""
+    try:
+        ts = pd.Timestamp(ts)
+    except (TypeError, ValueError, OverflowError):
+        return pd.NaT
+    return ts.tz_localize(None) if ts is not pd.NaT and ts.tzinfo is not None else ts
+
+
+def _parse_other_dates(s: pd.Series) -> pd.Series:
+    """正規表現で拾えない表記を pandas で変換する。タイムゾーンの有無が混ざって一括変換できなければ1値ずつ。"""
+    try:
+        parsed = pd.to_datetime(s, format="mixed", errors="coerce")
+        if parsed.dt.tz is not None:
+            parsed = parsed.dt.tz_localize(None)
+        return parsed
+    except (TypeError, ValueError, OverflowError, AttributeError):
+        return pd.Series([_to_naive(v) for v in s], index=s.index, dtype="datetime64[ns]")
+
+
+def _parse_unique_dates(values: pd.Series) -> pd.Series:
+    """重複のない文字列 Series を日付（datetime64, 失敗は NaT）に変換する。例外は出さない。"""
+    s = values.str.translate(ZEN_DATE).str.strip()
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+
+    # 1) Excelシリアル / 8桁の YYYYMMDD
+    serial = pd.to_numeric(s.str.extract(_SERIAL_RE)["serial"], errors="coerce")
+    is_serial = serial.notna()
+    in_range = is_serial & serial.between(EXCEL_SERIAL_MIN, EXCEL_SERIAL_MAX)
+    out[in_range] = EXCEL_EPOCH + pd.to_timedelta(serial[in_range], unit="D")
+    compact = is_serial & serial.between(10000101, 99991231)
+    if compact.any():
+        out[compact] = pd.to_datetime(
+            serial[compact].astype("int64").astype(str), format="%Y%m%d", errors="coerce"
+        )
+
+    # 2) YYYY/MM/DD, YYYY-M-D（時刻・タイムゾーン付きも可）。2025/2/30 のような不正な日付は NaT
+    ymd = s[~is_serial].str.extract(_DATE_RE).dropna()
+    if not ymd.empty:
+        out[ymd.index] = pd.to_datetime(ymd.astype(int), errors="coerce")
+
+    # 3) それ以外の表記だけ pandas に任せる（数字だけの範囲外シリアルは対象外。25:00 などもここで NaT になる）
+    rest = out.isna() & ~is_serial & s.ne("")
+    rest.loc[ymd.index] = False
+    if rest.any():
+        out[rest] = _parse_other_dates(s[rest])
+    return out
+
+
+def parse_harvest_dates(values: pd.Series) -> pd.Series:
+    """
+    収穫日の列を ISO 形式（YYYY-MM-DD）の文字列に揃える。変換できない値は None。
+
+    - "2025/8/18" "2025-08-18" "2025/08/18 10:00:00"（区切り・時刻の有無は問わない。時刻は 0:00〜23:59:59）
+    - タイムゾーン付き "2025-08-18 00:00:00+09:00"（書かれた日付のまま。UTC には直さない）
+    - 全角数字・全角の ／ － ：
+    - Excelシリアル（30000〜60000）、8桁の "20250818"
+    """
+    def parse(uniques: pd.Series) -> np.ndarray:
+        parsed = _parse_unique_dates(uniques)
+        return np.where(parsed.notna(), parsed.dt.strftime("%Y-%m-%d").to_numpy(dtype=object), None)
+
+    return pd.Series(_map_unique(values, parse), index=values.index, dtype=object)
+
+
+def unit_from_header(name: str, default: str = "g") -> str:
+    """収量列の列名から単位（"g" / "kg"）を決める。例: "収穫量（ｇ）" -> g, "収量(㎏)" -> kg"""
+    s = str(name).translate(ZEN_NUM).lower()
+    if "kg" in s:
+        return "kg"
+    if "g" in s:
+        return "g"
+    return default
+
+
+def parse_amounts_kg(values: pd.Series, unit: str = "g") -> pd.Series:
+    """
+    収量の列を kg の float に揃える。数値が取り出せない値は NaN。
+
+    - 全角数字・全角の ． ， ｋｇ ㎏、桁区切りのカンマ、空白を除去
+    - セルに "kg" / "g" があればそれに従い、無ければ unit（列名から決めた単位）とみなす
+    """
+    divisor = UNIT_DIVISOR[unit]
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype(float) / divisor
+
+    def parse(uniques: pd.Series) -> np.ndarray:
+        s = uniques.str.translate(ZEN_NUM).str.replace(r"[\s,]+", "", regex=True).str.lower()
+        x = pd.to_numeric(s.str.extract(r"([-+]?\d*\.?\d+)")[0], errors="coerce")
+        cell_divisor = np.where(
+            s.str.contains("kg", regex=False), UNIT_DIVISOR["kg"],
+            np.where(s.str.contains("g", regex=False), UNIT_DIVISOR["g"], divisor),
+        )
+        return (x / cell_divisor).to_numpy(dtype=float)
+
+    out = _map_unique(values, parse)
+    return pd.Series(out, index=values.index, dtype=float)
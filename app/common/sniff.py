@@ -0,0 +1,186 @@
+"""
+CSV の判定（文字コード・区切り文字・ヘッダー行・列の役割）を先頭の一部だけ読んで1回で行う。
+
+収量CSV（ETL / CSV Upload）と GL240 の環境CSV の読み込みで共通に使う。
+ファイル全体を文字コード候補の数だけ読み直さず、先頭 SNIFF_BYTES を1回読むだけで決める。
+
+    info = sniff_file(path)
+    df = pd.read_csv(path, encoding=info["encoding"], sep=info["delimiter"], header=info["header_row"])
+    df.iloc[:, info["roles"]["date"]]
+
+先頭 SNIFF_BYTES が ASCII だけだと文字コードは決めきれない（utf-8-sig と判定される）。
+本体を読んで UnicodeDecodeError になったら、次の候補の文字コードで判定し直して読み直す:
+
+    info, df = retry_encodings(sniff_file(path), partial(sniff_file, path), read)   # read(info) -> DataFrame
+
+戻り値（dict）:
+- encoding   : pandas / open() に渡せる文字コード名
+- delimiter  : "," / "\\t" / ";"
+- header_row : ヘッダー行の行番号（0始まり）
+- columns    : ヘッダー行の列名（元の表記のまま）
+- roles      : 役割 -> 列の位置。date / time / company / crop / amount / ch1..chN
+- layout     : "harvest"（収穫日・企業・作物・収量）/ "gl240"（CH1, CH2 …）/ None（判定できず。header_row=0）
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, TypeVar
+
+SNIFF_BYTES = 64 * 1024   # 判定に読む先頭バイト数（GL240 のヘッダーは 2KB 程度）
+MAX_HEADER_LINE = 200     # ヘッダー行を探す行数
+ENCODINGS = ("utf-8-sig", "cp932")
+DELIMITERS = (",", "\t", ";")
+SNIFF_CACHE_SIZE = 256    # 判定結果・決め直した文字コードを覚えておくファイル数
+
+T = TypeVar("T")
+
+# (役割, 正規化した列名に対するパターン)。列ごとに最初に当たったものを採用
+_ROLE_PATTERNS: list[tuple[str, re.Pattern]] = [
+    ("time", re.compile(r"時刻|時間|日時|time")),          # GL240 の "日付 時間" もこちら
+    ("date", re.compile(r"収穫日|日付|date")),
+    ("company", re.compile(r"企業|会社|company")),
+    ("crop", re.compile(r"作物|野菜|品目|crop")),
+    # 旧実装と同じく「量」を含む列（重量(g) など）と、単位 g / kg で終わる列も収量とみなす
+    ("amount", re.compile(r"量|amount|\(k?g\)$|[_\-]k?g$")),
+]
+# 収量CSV では日付を先に見る（"収穫日時" は時刻ではなく収穫日）
+_DATE_FIRST_PATTERNS = sorted(_ROLE_PATTERNS, key=lambda rp: rp[0] != "date")
+_CH_RE = re.compile(r"^ch[_\-]*0*(\d+)(?!\d)")
+
+# レイアウト -> ヘッダー行とみなすのに必要な役割（harvest は日付を先に見て役割を決める）
+LAYOUTS: dict[str, set[str]] = {
+    "harvest": {"date", "company", "crop", "amount"},
+    "gl240": {"ch1", "ch2"},
+}
+
+
+def normalize_name(name) -> str:
+    """列名の表記ゆれを吸収する（全角→半角、空白・BOM 除去、小文字）。例: "CH 1" -> "ch1", "収穫量（ｇ）" -> "収穫量(g)" """
+    s = unicodedata.normalize("NFKC", str(name)).replace("﻿", "")
+    return re.sub(r"\s+", "", s).lower()
+
+
+def column_roles(columns, date_first: bool = False) -> dict[str, int]:
+    """
+    列名の並びから 役割 -> 列の位置 を返す（同じ役割の列が複数あれば先頭）。
+    date_first=True なら時刻より日付を先に見る（収量CSV の "収穫日時" を date にする）。
+    """
+    patterns = _DATE_FIRST_PATTERNS if date_first else _ROLE_PATTERNS
+    roles: dict[str, int] = {}
+    for i, name in enumerate(columns):
+        s = normalize_name(name)
+        m = _CH_RE.match(s)
+        if m:
+            roles.setdefault(f"ch{int(m.group(1))}", i)
+            continue
+        for role, pat in patterns:
+            if pat.search(s):
+                roles.setdefault(role, i)
+                break
+    return roles
+
+
+def _guess_encoding(head: bytes) -> list[str]:
+    """BOM と NUL の出方から UTF-16 を先に判定し、それ以外は ENCODINGS を順に試す。"""
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return ["utf-16"]
+    sample = head[:4096]
+    if sample and sample.count(0) > len(sample) // 4:
+        return ["utf-16le" if sample[1::2].count(0) > sample[0::2].count(0) else "utf-16be"]
+    return list(ENCODINGS)
+
+
+def _decode(head: bytes, encoding: str | None = None) -> tuple[str, str]:
+    for enc in [encoding] if encoding else _guess_encoding(head):
+        try:
+            # 末尾で切れたマルチバイト文字はエラーにしない
+            return enc, codecs.getincrementaldecoder(enc)().decode(head, final=False)
+        except UnicodeDecodeError:
+            continue
+    raise UnicodeDecodeError("sniff", head[:16], 0, 1, f"none of {ENCODINGS} can decode the file")
+
+
+def _split(line: str, delimiter: str) -> list[str]:
+    return next(csv.reader(io.StringIO(line), delimiter=delimiter), [])
+
+
+def sniff_bytes(head: bytes, encoding: str | None = None) -> dict:
+    """ファイル先頭のバイト列から判定する（CSV Upload のようにパスが無い場合）。encoding を渡せば文字コードはそれに決める。"""
+    encoding, text = _decode(head, encoding)
+    lines = text.split("\n")
+    if len(head) >= SNIFF_BYTES:
+        lines = lines[:-1]  # 途中で切れた行
+    lines = [ln.rstrip("\r") for ln in lines[:MAX_HEADER_LINE]]
+
+    for i, line in enumerate(lines):
+        # 区切り文字はヘッダー候補の行で一番多く出てくるもの
+        delimiter = max(DELIMITERS, key=line.count)
+        columns = _split(line, delimiter)
+        for layout, required in LAYOUTS.items():
+            roles = column_roles(columns, date_first=(layout == "harvest"))
+            if required <= roles.keys():
+                return {
+                    "encoding": encoding, "delimiter": delimiter, "header_row": i,
+                    "columns": columns, "roles": roles, "layout": layout,
+                }
+
+    first = lines[0] if lines else ""
+    delimiter = max(DELIMITERS, key=first.count)
+    columns = _split(first, delimiter)
+    return {
+        "encoding": encoding, "delimiter": delimiter, "header_row": 0,
+        "columns": columns, "roles": column_roles(columns), "layout": None,
+    }
+
+
+@lru_cache(maxsize=SNIFF_CACHE_SIZE)
+def _sniff_path(path: str, size: int, mtime_ns: int, encoding: str | None = None) -> dict:
+    with open(path, "rb") as f:
+        return sniff_bytes(f.read(SNIFF_BYTES), encoding)
+
+
+# (パス, サイズ, 更新時刻) -> 本体を読んで決め直した文字コード（retry_encodings から sniff_file(path, encoding) で登録）
+# 常駐の inbox 監視で増え続けないよう、_sniff_path と同じく SNIFF_CACHE_SIZE 件まで（古い順に捨てる）
+_ENCODING_OVERRIDES: dict[tuple[str, int, int], str] = {}
+
+
+def sniff_file(path: str | Path, encoding: str | None = None) -> dict:
+    """
+    ファイルを判定する。結果は (パス, サイズ, 更新時刻) ごとにキャッシュする
+    （ファイルが書き換わればキーが変わるので読み直す）。戻り値の dict は書き換えないこと。
+    encoding を渡すと、そのファイルの文字コードをそれに決めて判定し直す（以後の sniff_file(path) もそれを返す）。
+    """
+    st = os.stat(path)
+    key = (str(Path(path).resolve()), st.st_size, st.st_mtime_ns)
+    if encoding is not None:
+        _ENCODING_OVERRIDES.pop(key, None)
+        _ENCODING_OVERRIDES[key] = encoding
+        while len(_ENCODING_OVERRIDES) > SNIFF_CACHE_SIZE:
+            del _ENCODING_OVERRIDES[next(iter(_ENCODING_OVERRIDES))]
+    return _sniff_path(*key, _ENCODING_OVERRIDES.get(key))
+
+
+def retry_encodings(info: dict, resniff: Callable[[str], dict], read: Callable[[dict], T]) -> tuple[dict, T]:
+    """
+    read(info) を実行し、(info, 結果) を返す。
+    先頭 SNIFF_BYTES より後ろに初めて出たマルチバイト文字で UnicodeDecodeError になったら、
+    ENCODINGS のまだ試していない文字コードで判定し直して（resniff(文字コード) -> info）読み直す。
+    UTF-16 と判定したファイルや、候補が尽きた場合は最後のエラーをそのまま出す。
+    """
+    tried: list[str] = []
+    while True:
+        try:
+            return info, read(info)
+        except UnicodeDecodeError:
+            tried.append(info["encoding"])
+            rest = [e for e in ENCODINGS if e not in tried]
+            if info["encoding"] not in ENCODINGS or not rest:
+                raise
+            info = resniff(rest[0])
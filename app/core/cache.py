@@ -0,0 +1,81 @@
+"""
+ページ共通のクエリキャッシュ（プロセス内・全セッション共有）。
+
+キーは (関数, 引数, 参照テーブルの更新カウンタ)。
+書き込み側が app.core.versions.bump_versions() でカウンタを上げると、
+そのテーブルを参照するクエリだけが次回から読み直しになる。
+古いキーのエントリは CACHE_MAX_ENTRIES を超えた分から LRU で捨てる。
+
+    @cached("harvest_daily", "company_dim", "crop_dim")
+    def load_summary(date_start, date_end, companies: tuple, crops: tuple): ...
+
+引数はハッシュ可能であること（リストではなくタプルを渡す）。
+返り値は共有されるので、呼び出し側で書き換えないこと。
+"""
+from __future__ import annotations
+
+import functools
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from app.core.db import get_engine
+from app.core.versions import get_versions
+
+CACHE_MAX_ENTRIES = 256
+
+_cache: OrderedDict[tuple, object] = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def data_version(*tables: str) -> tuple[int, ...]:
+    """tables の現在の更新カウンタ（ページング状態のリセット判定などに使う）。"""
+    with get_engine().connect() as conn:
+        return get_versions(conn, tables)
+
+
+def cached(*tables: str) -> Callable[[Callable], Callable]:
+    """tables の更新カウンタが変わるまで結果を使い回すデコレータ。"""
+
+    def decorator(fn: Callable) -> Callable:
+        # Streamlit のページは毎回 __main__ として実行されるので、ファイル名で区別する
+        name = f"{fn.__code__.co_filename}:{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())), data_version(*tables))
+            with _lock:
+                if key in _cache:
+                    _cache.move_to_end(key)
+                    _stats["hits"] += 1
+                    return _cache[key]
+                _stats["misses"] += 1
+
+            # 計算はロックの外で行う（同じキーが同時に来たら二重に計算するだけ）
+            value = fn(*args, **kwargs)
+
+            with _lock:
+                _cache[key] = value
+                _cache.move_to_end(key)
+                while len(_cache) > CACHE_MAX_ENTRIES:
+                    _cache.popitem(last=False)
+                    _stats["evictions"] += 1
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def cache_stats() -> dict:
+    """hits / misses / evictions / entries / maxsize。"""
+    with _lock:
+        return {**_stats, "entries": len(_cache), "maxsize": CACHE_MAX_ENTRIES}
+
+
+def clear_cache() -> None:
+    with _lock:
+        _cache.clear()
+        for k in _stats:
+            _stats[k] = 0
@@ -1,43 +1,115 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine, text
+import threading
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 from app.common.constants import DB_PATH
 
-_engine = None
-
-def get_engine():
-    return create_engine(f"sqlite:///{DB_PATH}", future=True)
-
-def init_db():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-ddl_harvest_fact = """
-CREATE TABLE IF NOT EXISTS harvest_fact (
-    harvest_date TEXT NOT NULL,
-    company      TEXT NOT NULL,
-    crop         TEXT NOT NULL,
-    amount_kg    REAL NOT NULL,
-    source_file  TEXT,
-    created_at   TEXT DEFAULT (datetime('now')),
-    UNIQUE(harvest_date, company, crop, amount_kg)
-);
-"""
-
-ddl_raw_csv = """
-CREATE TABLE IF NOT EXISTS raw_csv (
-    c1 TEXT,
-    c2 TEXT,
-    c3 TEXT,
-    c4 TEXT,
-    source_file TEXT,
-    created_at TEXT DEFAULT (datetime('now'))
-);
-"""
-
-engine = get_engine()
-with engine.begin() as conn:
-    conn.exec_driver_sql(ddl_harvest_fact)
-    conn.exec_driver_sql(ddl_raw_csv)
+# =========================
+# Engine (プロセス内で共有)
+# =========================
+# 接続ごとに適用する PRAGMA。get_engine(pragmas=...) で上書きできる。
+PRAGMA_PROFILE: dict[str, object] = {
+    "journal_mode": "WAL",          # 読み取りと書き込みを並行させる
+    "synchronous": "NORMAL",        # WAL なら NORMAL で十分に安全
+    "mmap_size": 256 * 1024 * 1024, # 256MiB までメモリマップで読む
+    "cache_size": -64 * 1024,       # 負値は KiB 指定（= 64MiB）
+    "temp_store": "MEMORY",         # ソート・一時テーブルをメモリに置く
+    "busy_timeout": 5000,           # ロック待ち(ms)。ETLとページの同時実行用
+}
+
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+
+_engines: dict[tuple, Engine] = {}
+_engines_lock = threading.Lock()
+
+_initialized: set[str] = set()
+_init_lock = threading.Lock()
+
+
+def _apply_pragmas(dbapi_conn, pragmas: dict[str, object]) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        for name, value in pragmas.items():
+            cur.execute(f"PRAGMA {name}={value}")
+    finally:
+        cur.close()
+
+
+def get_engine(db_path: str | Path | None = None, pragmas: dict[str, object] | None = None) -> Engine:
+    """
+    DBパスごとに1つの Engine を返す（初回のみ作成し、以降は使い回す）。
+
+    - コネクションプール(QueuePool)で接続を再利用する
+    - 新規接続時に PRAGMA_PROFILE（または pragmas）を適用する
+    """
+    path = Path(db_path) if db_path is not None else DB_PATH
+    profile = dict(PRAGMA_PROFILE if pragmas is None else pragmas)
+    key = (str(path.resolve()), tuple(sorted(profile.items())))
+
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                f"sqlite:///{path}",
+                future=True,
+                poolclass=QueuePool,
+                pool_size=POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+                connect_args={"check_same_thread": False},
+            )
+
+            @event.listens_for(engine, "connect")
+            def _on_connect(dbapi_conn, _record, _profile=profile):
+                # pysqlite 任せだと DDL がトランザクション外で確定してしまうため、
+                # BEGIN は SQLAlchemy 側で明示的に発行する
+                dbapi_conn.isolation_level = None
+                _apply_pragmas(dbapi_conn, _profile)
+
+            @event.listens_for(engine, "begin")
+            def _on_begin(conn):
+                conn.exec_driver_sql("BEGIN")
+
+            _engines[key] = engine
+    return engine
+
+
+def dispose_engines() -> None:
+    """共有 Engine をすべて破棄する（ベンチマーク・DB差し替え用）。"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def init_db(force: bool = False) -> None:
+    """
+    DBファイルを用意し、スキーマを最新化する（app.core.migrations）。
+
+    プロセス内で1回だけ実行され、2回目以降は何もしない（ページの再実行ごとに呼んでよい）。
+    import 時には実行されないので、DBを使う入口（Home / 各ページ / ETL）で明示的に呼ぶこと。
+    """
+    key = str(DB_PATH.resolve())
+    if key in _initialized and not force:
+        return
+
+    with _init_lock:
+        if key in _initialized and not force:
+            return
+        from app.core.migrations import migrate
+
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        migrate(get_engine())
+        _initialized.add(key)
+
 
 def db_debug_caption(st):
     st.caption(f"DB_PATH = {DB_PATH}")
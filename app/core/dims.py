@@ -0,0 +1,61 @@
+"""
+company_dim / crop_dim / farm_dim（辞書テーブル）の読み書き。
+
+- 取り込み側: resolve_keys() で名前 → 整数キーにまとめて変換する
+- 読み込み側: decode_dims() で整数キー → pandas Categorical に戻す
+"""
+from __future__ import annotations
+
+import pandas as pd
+from sqlalchemy.engine import Connection
+
+# 名前列 -> (辞書テーブル, キー列)
+DIMS: dict[str, tuple[str, str]] = {
+    "company": ("company_dim", "company_id"),
+    "crop": ("crop_dim", "crop_id"),
+    "farm": ("farm_dim", "farm_id"),
+}
+
+
+def resolve_keys(conn: Connection, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    df の company / crop / farm 列（あるものだけ）を company_id / crop_id / farm_id 列に置き換えて返す。
+    未登録の名前は辞書テーブルに追加する（1列につき INSERT 1回 + SELECT 1回）。
+    """
+    out = df.copy()
+    for col, (table, key) in DIMS.items():
+        if col not in out.columns:
+            continue
+        names = [str(n) for n in pd.unique(out[col])]
+        conn.exec_driver_sql(
+            f"INSERT OR IGNORE INTO {table}(name) VALUES (?)", [(n,) for n in names]
+        )
+        ids = dict(conn.exec_driver_sql(f"SELECT name, {key} FROM {table}").fetchall())
+        out[key] = out[col].map(ids)
+        out = out.drop(columns=[col])
+    return out
+
+
+def load_dim(conn: Connection, col: str) -> pd.Series:
+    """辞書テーブルを名前順の Series（index=キー, 値=名前）で返す。"""
+    table, key = DIMS[col]
+    rows = conn.exec_driver_sql(f"SELECT {key}, name FROM {table} ORDER BY name").fetchall()
+    return pd.Series([r[1] for r in rows], index=[r[0] for r in rows], dtype=object)
+
+
+def to_categorical(ids: pd.Series, dim: pd.Series) -> pd.Categorical:
+    """整数キーの列を、辞書テーブルをカテゴリにした Categorical に変換する。"""
+    codes = pd.Index(dim.index).get_indexer(ids)
+    return pd.Categorical.from_codes(codes, categories=pd.Index(dim.values))
+
+
+def decode_dims(conn: Connection, df: pd.DataFrame) -> pd.DataFrame:
+    """company_id / crop_id / farm_id 列を company / crop / farm の Categorical 列に置き換えて返す。"""
+    for col, (_table, key) in DIMS.items():
+        if key not in df.columns:
+            continue
+        cat = to_categorical(df[key], load_dim(conn, col))
+        df = df.drop(columns=[key]).assign(**{col: cat})[
+            [col if c == key else c for c in df.columns]
+        ]
+    return df
@@ -0,0 +1,238 @@
+"""
+締めた月の環境ログの Parquet アーカイブ。
+
+env_sample に置くのは当月分だけにし、前月以前は farm × 月 ごとに1ファイルへ書き出して SQLite から消す。
+
+    data/archive/env/farm=<farm>/month=<yyyy-mm>/part-0.parquet   列: epoch, 測定値
+
+<farm> は farm 名を URL エンコードしたもの（pyarrow の Hive パーティションの値と同じ。"/" や ".." を含む名前でも
+データセットの外に書かない）。
+
+- 書き出し: archive_env_months(conn)   締めた月を書き出し、書いた分を env_sample から消す（1トランザクション）。
+  アーカイブ済みの月に遅れて届いた行は、次回の実行で既存のファイルとマージして書き直す（圧縮も兼ねる）
+- 読み込み: read_archived(farms, start, end, columns)
+  パスで farm・月を絞り（パーティションの枝刈り）、Parquet は必要な列だけを epoch の範囲で読む（統計で row group を飛ばす）。
+- SQLite の当月分と合わせて読むなら read_env(conn, ...)（集計の作り直し・ページはこちら）
+
+    python -m app.core.env_archive            # 当月より前を書き出す
+    python -m app.core.env_archive --plan     # 書き出す farm × 月 の表示のみ
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from datetime import date
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import pandas as pd
+from sqlalchemy.engine import Connection
+
+from app.common.constants import ENV_ARCHIVE_DIR
+from app.core.env_store import ENV_VALUE_COLUMNS, to_epoch
+
+PART_FILE = "part-0.parquet"
+
+
+def partition_dir(farm: str, month: str, root: Path = ENV_ARCHIVE_DIR) -> Path:
+    # farm 名はそのままパスにしない（"/" や ".." でルートの外に出る・"=" や "%" で Hive の解釈が崩れる）
+    return Path(root) / f"farm={quote(farm, safe='')}" / f"month={month}"
+
+
+def list_partitions(
+    farms: list[str] | None = None, months: tuple[str, str] | None = None, root: Path = ENV_ARCHIVE_DIR
+) -> list[tuple[str, str, Path]]:
+    """
+    アーカイブ済みの (farm, 月, ファイル) を返す。farms・months（最初の月, 最後の月）で絞る。
+    ディレクトリ名だけで判定し、ファイルは開かない。
+    """
+    out = []
+    for farm_dir in sorted(Path(root).glob("farm=*")):
+        farm = unquote(farm_dir.name.split("=", 1)[1])
+        if farms is not None and farm not in farms:
+            continue
+        for month_dir in sorted(farm_dir.glob("month=*")):
+            month = month_dir.name.split("=", 1)[1]
+            if months is not None and not (months[0] <= month <= months[1]):
+                continue
+            if (month_dir / PART_FILE).exists():
+                out.append((farm, month, month_dir / PART_FILE))
+    return out
+
+
+def read_archived(
+    farms: list[str] | None = None,
+    start=None,
+    end=None,
+    columns: list[str] | None = None,
+    root: Path = ENV_ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """アーカイブから start <= ts < end の行を返す（列: farm, epoch, columns）。start / end は省略可。"""
+    import pyarrow.parquet as pq
+
+    columns = columns or ENV_VALUE_COLUMNS
+    lo, hi = (None if v is None else int(to_epoch([v]).iloc[0]) for v in (start, end))
+    months = (
+        "0000-00" if start is None else pd.Timestamp(start).strftime("%Y-%m"),
+        "9999-99" if end is None else (pd.Timestamp(end) - pd.Timedelta(seconds=1)).strftime("%Y-%m"),
+    )
+    filters = [f for f in (("epoch", ">=", lo), ("epoch", "<", hi)) if f[2] is not None]
+
+    frames = []
+    for farm, _month, path in list_partitions(farms, months, root):
+        table = pq.read_table(path, columns=["epoch", *columns], filters=filters or None)
+        frames.append(table.to_pandas().assign(farm=farm))
+    if not frames:
+        return pd.DataFrame(columns=["farm", "epoch", *columns])
+    return pd.concat(frames, ignore_index=True)[["farm", "epoch", *columns]]
+
+
+def read_env(
+    conn: Connection,
+    farms: list[str] | None = None,
+    start=None,
+    end=None,
+    columns: list[str] | None = None,
+    root: Path = ENV_ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """
+    アーカイブと env_sample を合わせて start <= ts < end の行を farm・時刻順に返す（列: farm, ts, columns）。
+    同じ (farm, 時刻) が両方にあれば（アーカイブ済みの月に遅れて届いた行）アーカイブ側を残す。
+    """
+    columns = columns or ENV_VALUE_COLUMNS
+    archived = read_archived(farms, start, end, columns, root)
+
+    where, params = [], []
+    if farms is not None:
+        where.append("f.name IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(farms)))
+    for op, v in ((">=", start), ("<", end)):
+        if v is not None:
+            where.append(f"s.epoch {op} ?")
+            params.append(int(to_epoch([v]).iloc[0]))
+    hot = pd.read_sql(
+        f"""
+        SELECT f.name AS farm, s.epoch, {', '.join('s.' + c for c in columns)}
+        FROM env_sample s
+        JOIN farm_dim f ON f.farm_id = s.farm_id
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        """,
+        conn,
+        params=tuple(params),
+    )
+
+    frames = [df for df in (archived, hot) if not df.empty]
+    df = (
+        pd.concat(frames or [hot], ignore_index=True)
+        .drop_duplicates(["farm", "epoch"])
+        .sort_values(["farm", "epoch"], ignore_index=True)
+    )
+    df.insert(1, "ts", pd.to_datetime(df["epoch"], unit="s"))
+    return df.drop(columns="epoch")
+
+
+def _write_partition(path: Path, df: pd.DataFrame) -> None:
+    """一時ファイルに書いてから置き換える（途中で落ちても既存のファイルは壊れない）。"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def closed_months(conn: Connection, before: str) -> list[tuple[int, str, str]]:
+    """env_sample にある before（yyyy-mm）より前の (farm_id, farm, 月)。"""
+    return [tuple(r) for r in conn.exec_driver_sql(
+        """
+        SELECT DISTINCT s.farm_id, f.name, strftime('%Y-%m', s.epoch, 'unixepoch') AS month
+        FROM env_sample s
+        JOIN farm_dim f ON f.farm_id = s.farm_id
+        WHERE s.epoch < CAST(strftime('%s', ? || '-01') AS INTEGER)
+        ORDER BY 1, 3
+        """,
+        (before,),
+    )]
+
+
+def archive_env_months(
+    conn: Connection, before: str | None = None, root: Path = ENV_ARCHIVE_DIR
+) -> list[tuple[str, str, int]]:
+    """
+    before（既定は当月）より前の月を farm × 月 ごとに Parquet に書き出し、env_sample から消す。
+    書き出した [(farm, 月, ファイルの行数)] を返す。呼び出し側のトランザクション内で実行する
+    （ファイルを書いてから DELETE するので、コミット前に落ちても次回の実行でマージし直すだけで済む）。
+    """
+    before = before or date.today().strftime("%Y-%m")
+    done = []
+    for farm_id, farm, month in closed_months(conn, before):
+        lo = f"{month}-01"
+        rows = pd.read_sql(
+            f"""
+            SELECT epoch, {', '.join(ENV_VALUE_COLUMNS)}
+            FROM env_sample
+            WHERE farm_id = ?
+              AND epoch >= CAST(strftime('%s', ?) AS INTEGER)
+              AND epoch <  CAST(strftime('%s', ?, '+1 month') AS INTEGER)
+            ORDER BY epoch
+            """,
+            conn,
+            params=(farm_id, lo, lo),
+        )
+        path = partition_dir(farm, month, root) / PART_FILE
+        if path.exists():
+            # 遅れて届いた分を既存のファイルとマージ（同じ時刻は先にアーカイブした行を残す）
+            rows = (
+                pd.concat([pd.read_parquet(path), rows], ignore_index=True)
+                .drop_duplicates("epoch")
+                .sort_values("epoch", ignore_index=True)
+            )
+        _write_partition(path, rows)
+        conn.exec_driver_sql(
+            """
+            DELETE FROM env_sample
+            WHERE farm_id = ?
+              AND epoch >= CAST(strftime('%s', ?) AS INTEGER)
+              AND epoch <  CAST(strftime('%s', ?, '+1 month') AS INTEGER)
+            """,
+            (farm_id, lo, lo),
+        )
+        done.append((farm, month, len(rows)))
+    return done
+
+
+# =========================
+# CLI
+# =========================
+def main(argv: list[str] | None = None) -> None:
+    from app.core.db import get_engine, init_db
+    from app.core.versions import bump_versions
+
+    ap = argparse.ArgumentParser(description="締めた月の環境ログを Parquet に書き出し、SQLite から消す")
+    ap.add_argument("--before", default=None, help="この月（yyyy-mm）より前を書き出す。省略時は当月")
+    ap.add_argument("--plan", action="store_true", help="書き出す farm × 月 を表示するだけで変更しない")
+    args = ap.parse_args(argv)
+
+    init_db()
+    before = args.before or date.today().strftime("%Y-%m")
+    engine = get_engine()
+    if args.plan:
+        with engine.connect() as conn:
+            for _farm_id, farm, month in closed_months(conn, before):
+                print(f"[PLAN] {partition_dir(farm, month)}")
+        return
+
+    with engine.begin() as conn:
+        done = archive_env_months(conn, before)
+        if done:
+            bump_versions(conn, "env_raw")
+    for farm, month, n in done:
+        print(f"[OK] {partition_dir(farm, month) / PART_FILE} ({n} rows)")
+    if not done:
+        print(f"[INFO] {before} より前の環境ログは env_sample にありません。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+環境ログの時間・日・月ごとの集計（env_rollup_hour / _day / _month。migration 013）と、グラフ用の間引き。
+
+- 集計: farm × 区間 ごとに、チャネルごとの min / max / mean / std / n（列名は <チャネル>_<統計>）
+  取り込み後は refresh_env_rollups(conn, dirty) で触った (farm, 月) だけ作り直す（etl/import_env_csv.py の refresh_env_daily から）。
+  全件は rebuild_env_rollups(conn, df_raw)（import_env_csv.py --full）
+- 読み込み: env_series(conn, farm, start, end, channel, points)
+  期間に対しておよそ points 点になる、いちばん粗い解像度（月 → 日 → 時間 → 生データ）を選ぶ。
+  それでも points 点を超える分（生データ、または段の間の解像度）は LTTB で points 点に間引くので、
+  期間の長さによらずグラフに送る点数は points 点以内に収まる
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.engine import Connection
+
+from app.core.dims import resolve_keys
+from app.core.env_archive import read_env
+from app.core.env_store import ENV_VALUE_COLUMNS, to_epoch
+
+# 解像度 -> 区間の秒数（粗い順。月は30日換算で、点数の見積もりにだけ使う）
+RESOLUTIONS: dict[str, int] = {"month": 30 * 86400, "day": 86400, "hour": 3600}
+ENV_ROLLUP_TABLES = tuple(f"env_rollup_{r}" for r in RESOLUTIONS)
+DEFAULT_POINTS = 500
+
+
+def _bucket_start(ts: pd.Series, resolution: str) -> pd.Series:
+    if resolution == "month":
+        return ts.dt.to_period("M").dt.start_time
+    return ts.dt.floor({"day": "D", "hour": "h"}[resolution])
+
+
+def rollup_frame(df: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    """env_raw 形式（farm, ts, チャネル）の行を resolution の区間ごとに集計する（列: farm, bucket, <チャネル>_<統計>）。"""
+    agg = (
+        df.assign(bucket=_bucket_start(df["ts"], resolution))
+        .groupby(["farm", "bucket"])[ENV_VALUE_COLUMNS]
+        .agg(["min", "max", "mean", "std", "count"])
+    )
+    agg.columns = [f"{ch}_{'n' if stat == 'count' else stat}" for ch, stat in agg.columns]
+    out = agg.reset_index()
+    out["bucket"] = to_epoch(out["bucket"]).to_numpy()
+    return out
+
+
+def _write_rollups(conn: Connection, df_raw: pd.DataFrame) -> None:
+    if df_raw.empty:
+        return
+    for resolution in RESOLUTIONS:
+        resolve_keys(conn, rollup_frame(df_raw, resolution)).to_sql(
+            f"env_rollup_{resolution}", conn, if_exists="append", index=False
+        )
+
+
+def rebuild_env_rollups(conn: Connection, df_raw: pd.DataFrame) -> None:
+    """集計を全件 df_raw（env_sample + アーカイブの全行）から作り直す。呼び出し側のトランザクション内で実行する。"""
+    for resolution in RESOLUTIONS:
+        conn.exec_driver_sql(f"DELETE FROM env_rollup_{resolution}")
+    _write_rollups(conn, df_raw)
+
+
+def refresh_env_rollups(conn: Connection, dirty: pd.DataFrame) -> int:
+    """
+    dirty（farm, date）の日を含む月の集計を作り直し、作り直した (farm, 月) の数を返す。
+    月の集計は月全体の行が要るので、時間・日も月単位でまとめて作り直す（1 farm × 1か月 = 約4,300行）。
+    集計がまだ空なら全件作り直す。
+    """
+    if conn.exec_driver_sql("SELECT 1 FROM env_rollup_month LIMIT 1").fetchone() is None:
+        rebuild_env_rollups(conn, read_env(conn))
+        return -1
+
+    months = dirty.assign(month=pd.to_datetime(dirty["date"]).dt.to_period("M"))[["farm", "month"]].drop_duplicates()
+    for farm, month in months.itertuples(index=False):
+        start, end = month.start_time, (month + 1).start_time
+        farm_id = conn.exec_driver_sql("SELECT farm_id FROM farm_dim WHERE name = ?", (farm,)).scalar()
+        if farm_id is not None:
+            lo, hi = (int(v) for v in to_epoch([start, end]))
+            for resolution in RESOLUTIONS:
+                conn.exec_driver_sql(
+                    f"DELETE FROM env_rollup_{resolution} WHERE farm_id = ? AND bucket >= ? AND bucket < ?",
+                    (farm_id, lo, hi),
+                )
+        _write_rollups(conn, read_env(conn, [farm], start, end))
+    return len(months)
+
+
+# =========================
+# グラフ用の読み込み
+# =========================
+def pick_resolution(start, end, points: int = DEFAULT_POINTS) -> str:
+    """
+    期間 [start, end) でおよそ points 点になる、いちばん粗い解像度を返す（"month" / "day" / "hour" / "raw"）。
+    区間数が points の半分以上になる最初の解像度。どれも足りなければ生データ。
+    """
+    window = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+    for resolution, step in RESOLUTIONS.items():
+        if window / step >= points / 2:
+            return resolution
+    return "raw"
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets で n 点を選び、その位置（昇順）を返す。
+    先頭・末尾は必ず残し、間を n-2 個のバケツに分けて、前に選んだ点と次のバケツの平均とで作る三角形が最大の点を選ぶ。
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    every = (size - 2) / (n - 2)
+    bounds = (np.arange(n - 1) * every).astype(np.int64) + 1
+    bounds[-1] = size - 1
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        nlo, nhi = hi, (bounds[i + 2] if i + 2 < n - 1 else size)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _downsample(df: pd.DataFrame, channel: str, points: int) -> pd.DataFrame:
+    """df（ts, channel, ...）の channel が欠測の行を除き、points 行より多ければ LTTB で points 行に間引く。"""
+    df = df.dropna(subset=[channel])
+    keep = lttb(to_epoch(df["ts"]).to_numpy(), df[channel].to_numpy(dtype=float), points)
+    return df.iloc[keep].reset_index(drop=True)
+
+
+def env_series(
+    conn: Connection,
+    farm: str,
+    start,
+    end,
+    channel: str,
+    points: int = DEFAULT_POINTS,
+    resolution: str | None = None,
+) -> tuple[str, pd.DataFrame]:
+    """
+    farm の channel を [start, end) でグラフ用に返す: (解像度, DataFrame)。
+    - 集計の解像度: 列 ts, <channel>（平均）, <channel>_min / _max / _std / _n
+    - "raw"       : 列 ts, <channel>
+    どちらも points 行より多ければ LTTB で points 行に間引く。resolution を省略すると pick_resolution() で選ぶ。
+    """
+    if channel not in ENV_VALUE_COLUMNS:
+        raise ValueError(f"unknown channel: {channel}")
+    resolution = resolution or pick_resolution(start, end, points)
+
+    if resolution == "raw":
+        df = read_env(conn, [farm], start, end, [channel])[["ts", channel]]
+        return resolution, _downsample(df, channel, points)
+
+    lo, hi = (int(v) for v in to_epoch([start, end]))
+    df = pd.read_sql(
+        f"""
+        SELECT r.bucket,
+               r.{channel}_mean AS {channel},
+               r.{channel}_min, r.{channel}_max, r.{channel}_std, r.{channel}_n
+        FROM env_rollup_{resolution} r
+        WHERE r.farm_id = (SELECT farm_id FROM farm_dim WHERE name = ?)
+          AND r.bucket >= ? AND r.bucket < ?
+        ORDER BY r.bucket
+        """,
+        conn,
+        params=(farm, lo, hi),
+    )
+    df.insert(0, "ts", pd.to_datetime(df.pop("bucket"), unit="s"))
+    # 解像度の段の間（例: 日 → 時間は24倍）で points を超えた分は、平均の系列で LTTB して行ごと間引く
+    return resolution, _downsample(df, channel, points)
@@ -0,0 +1,69 @@
+"""
+環境ログ（env_sample）の読み書き。
+
+env_sample は (farm_id, epoch) を主キーにした WITHOUT ROWID テーブル（migration 012）。
+farm は farm_dim の整数キー、時刻は epoch 秒で持つ。旧来の列（farm, ts, ...）の VIEW env_raw_current は当月分だけ（migration 014）。
+締めた月も含めて読むのは app.core.env_archive.read_env()。
+
+- 書き込み: insert_env_samples(conn, df)   df は env_raw 形式（farm, ts, 測定値）
+- 読み込み: read_env_samples(conn, farm, start, end)   主キーの範囲読み
+"""
+from __future__ import annotations
+
+import pandas as pd
+from sqlalchemy.engine import Connection
+
+from app.core.dims import resolve_keys
+
+# 測定値の列（env_raw / env_sample 共通）
+ENV_VALUE_COLUMNS = ["air_temp_c", "rh_percent", "sand_temp_c", "water_content", "irradiance_wm2"]
+SAMPLE_COLUMNS = ("farm_id", "epoch", *ENV_VALUE_COLUMNS)
+
+
+def to_epoch(ts) -> pd.Series:
+    """時刻（datetime / 文字列）を epoch 秒の整数にする。タイムゾーンは付けない（表記のまま UTC とみなす）。"""
+    ts = pd.to_datetime(pd.Series(ts))
+    return (ts - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+
+def insert_env_samples(conn: Connection, df: pd.DataFrame) -> int:
+    """
+    df（farm, ts, 測定値）を env_sample に追加し、行数を返す。(farm, ts) が既にあればエラー（呼び出し側で除いておく）。
+    呼び出し側のトランザクション内で実行する。
+    """
+    if df.empty:
+        return 0
+    out = resolve_keys(conn, df[["farm"]]).assign(epoch=to_epoch(df["ts"]).to_numpy())
+    # 列ごとに Python の値のリストにしてからタプルに組む（numpy の整数はそのままでは渡せない。NaN は NULL になる）
+    cols = [out["farm_id"].tolist(), out["epoch"].tolist(), *(df[c].tolist() for c in ENV_VALUE_COLUMNS)]
+    cur = conn.connection.driver_connection.cursor()
+    try:
+        cur.executemany(
+            f"INSERT INTO env_sample ({', '.join(SAMPLE_COLUMNS)}) VALUES ({', '.join('?' * len(SAMPLE_COLUMNS))})",
+            zip(*cols),
+        )
+    finally:
+        cur.close()
+    return len(df)
+
+
+def read_env_samples(conn: Connection, farm: str, start, end, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    farm の start <= ts < end の行を時刻順に返す（列: ts, epoch, 測定値）。主キー (farm_id, epoch) の範囲読みだけで済む。
+    start / end は datetime か 'YYYY-MM-DD[ HH:MM:SS]'。
+    """
+    columns = columns or ENV_VALUE_COLUMNS
+    lo, hi = (int(v) for v in to_epoch([start, end]))
+    df = pd.read_sql(
+        f"""
+        SELECT s.epoch, {', '.join('s.' + c for c in columns)}
+        FROM env_sample s
+        WHERE s.farm_id = (SELECT farm_id FROM farm_dim WHERE name = ?)
+          AND s.epoch >= ? AND s.epoch < ?
+        ORDER BY s.epoch
+        """,
+        conn,
+        params=(farm, lo, hi),
+    )
+    df.insert(0, "ts", pd.to_datetime(df["epoch"], unit="s"))
+    return df
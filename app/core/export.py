@@ -0,0 +1,116 @@
+"""
+検索結果のエクスポート（CSV / CSV.gz / Parquet）。
+
+DBカーソルから EXPORT_CHUNK_ROWS 行ずつ読み、そのまま書き出す。
+全件の DataFrame や CSV 文字列をメモリに作らないので、書き出し中のメモリはヒット件数によらず一定。
+書き出し先は SpooledTemporaryFile（一定サイズを超えるとディスクに逃がす）。
+
+ただし st.download_button は、渡したファイルも読み切って bytes としてメモリ上のメディアストアに置く
+（ファイルを渡しても逐次送信にはならない）。そのため Search/List では EXPORT_MAX_ROWS 行までに制限し、
+それを超える条件では絞り込みを促す。
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import tempfile
+from typing import BinaryIO, Iterator
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+EXPORT_CHUNK_ROWS = 50_000
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+# ダウンロードの上限行数（CSV で 1行 40 バイト前後。100万行 ≒ 40MB がダウンロード1回分のメモリの上限になる）
+EXPORT_MAX_ROWS = 1_000_000
+
+# 出力形式 -> (拡張子, MIME)
+EXPORT_FORMATS: dict[str, tuple[str, str]] = {
+    "csv": ("csv", "text/csv"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def iter_harvest_chunks(
+    conn: Connection,
+    where: str = "",
+    params: dict | None = None,
+    chunksize: int = EXPORT_CHUNK_ROWS,
+    limit: int | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    条件に該当する明細を chunksize 行ずつ返す（並びはページングと同じ 日付 → 企業名 → 作物名 → id）。
+    limit を渡すと先頭 limit 行まで。
+    """
+    params = dict(params or {})
+    page = ""
+    if limit is not None:
+        page = "LIMIT :limit"
+        params["limit"] = int(limit)
+    sql = f"""
+    SELECT h.harvest_date, c.name AS company, k.name AS crop, h.amount_kg
+    FROM harvest_fact h
+    JOIN company_dim c ON c.company_id = h.company_id
+    JOIN crop_dim    k ON k.crop_id    = h.crop_id
+    {where}
+    ORDER BY h.harvest_date, c.name, k.name, h.id
+    {page}
+    """
+    yield from pd.read_sql_query(text(sql), conn, params=params, chunksize=chunksize)
+
+
+def write_csv(out: BinaryIO, chunks: Iterator[pd.DataFrame]) -> int:
+    """チャンクを utf-8-sig（BOM付き）CSV として out に書き、行数を返す。"""
+    n = 0
+    text_out = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")
+    try:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(text_out, index=False, header=(i == 0))
+            n += len(chunk)
+        text_out.flush()
+    finally:
+        text_out.detach()
+    return n
+
+
+def write_parquet(out: BinaryIO, chunks: Iterator[pd.DataFrame]) -> int:
+    """チャンクごとに row group を書き足す形で Parquet を書き、行数を返す。"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    n = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table)
+            n += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def export_harvest(
+    engine: Engine, fmt: str, where: str = "", params: dict | None = None, limit: int | None = None
+) -> BinaryIO:
+    """条件に該当する明細（limit を渡すと先頭 limit 行まで）を fmt（EXPORT_FORMATS のキー）で書き出し、先頭に巻き戻したファイルを返す。"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    with engine.connect() as conn:
+        chunks = iter_harvest_chunks(conn, where, params, limit=limit)
+        if fmt == "csv":
+            write_csv(out, chunks)
+        elif fmt == "csv.gz":
+            with gzip.GzipFile(fileobj=out, mode="wb") as gz:
+                write_csv(gz, chunks)
+        else:
+            write_parquet(out, chunks)
+    out.seek(0)
+    return out
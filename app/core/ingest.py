@@ -0,0 +1,100 @@
+"""
+複数ファイルの取り込み（パースは並列、書き込みは1本）。
+
+- パース: jobs > 1 ならプロセスプールで並列に実行する（文字コード判定・read_csv・列検出は CPU 処理）
+- 書き込み: batch_size 個ずつ、パースが終わったバッチを呼び出し元プロセスの短いトランザクションで順に書く。
+  ファイルごとに SAVEPOINT を切り、失敗したファイルだけ巻き戻して次へ進む
+  （SQLite の書き込みは1本しか通らないので並列にしない。書き込みロックを持つのは書いている間だけ）
+- メモリに持つパース結果は、書いているバッチと、並列時に先読みしている次のバッチの分だけ
+  （inbox に数百ファイル溜まっていても全ファイル分の DataFrame は持たない）。
+  並列時は書き込み中に次のバッチのパースが進む
+
+    ok, errors = ingest_files(engine, todo, parse, write, jobs=4)
+
+parse(path) -> DataFrame はプロセス間で受け渡すため、モジュールのトップレベル関数
+（または functools.partial）にすること。
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterator
+
+import pandas as pd
+from sqlalchemy.engine import Connection, Engine
+
+
+# 1トランザクションで書くファイル数
+INGEST_BATCH_FILES = 32
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def _run_parse(parse: Callable[[str], pd.DataFrame], path: str) -> tuple[pd.DataFrame | None, float, str | None]:
+    """ワーカー側: (DataFrame, 所要秒, エラー)。例外はプロセスをまたがせず文字列で返す。"""
+    t0 = time.perf_counter()
+    try:
+        return parse(path), time.perf_counter() - t0, None
+    except Exception as e:
+        return None, time.perf_counter() - t0, f"{type(e).__name__}: {e}"
+
+
+def _parse_batches(
+    parse: Callable[[str], pd.DataFrame], paths: list[str], jobs: int, batch_size: int
+) -> Iterator[list[tuple]]:
+    """paths を batch_size 個ずつパースし、バッチごとに入力順の結果を返す。並列時は次のバッチを先に投げておく。"""
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    if jobs <= 1 or len(paths) <= 1:
+        for batch in batches:
+            yield [_run_parse(parse, p) for p in batch]
+        return
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        pending = [pool.submit(_run_parse, parse, p) for p in batches[0]]
+        for nxt in [*batches[1:], []]:
+            # 呼び出し元がこのバッチを書いている間に、次のバッチをパースしておく（先読みは1バッチまで）
+            ahead = [pool.submit(_run_parse, parse, p) for p in nxt]
+            yield [f.result() for f in pending]
+            pending = ahead
+
+
+def ingest_files(
+    engine: Engine,
+    entries: list[dict],
+    parse: Callable[[str], pd.DataFrame],
+    write: Callable[[Connection, dict, pd.DataFrame, float], None],
+    jobs: int = 1,
+    batch_size: int = INGEST_BATCH_FILES,
+) -> tuple[int, list[tuple[str, str]]]:
+    """
+    entries（app.core.ledger.scan_inbox() の取り込み対象）をパースし、write(conn, entry, df, t0) で書き込む。
+    batch_size 個ずつ、パースが終わってから1トランザクションで書く。
+    t0 はパース開始時刻相当の time.perf_counter() 値（所要時間 = perf_counter() - t0）。
+    戻り値: (成功したファイル数, [(パス, エラー)])
+    """
+    ok = 0
+    errors: list[tuple[str, str]] = []
+    paths = [e["path"] for e in entries]
+    batch_size = max(1, batch_size)
+
+    # バッチのパースが終わってから書き込みのトランザクションを開く
+    # （パース中に書き込みロックを持つと、その間 Upload の登録などが待たされる）
+    for i, parsed in enumerate(_parse_batches(parse, paths, jobs, batch_size)):
+        batch = entries[i * batch_size:(i + 1) * batch_size]
+        with engine.begin() as conn:
+            for entry, (df, parse_s, err) in zip(batch, parsed):
+                if err is not None:
+                    errors.append((entry["path"], err))
+                    continue
+                savepoint = conn.begin_nested()
+                try:
+                    write(conn, entry, df, time.perf_counter() - parse_s)
+                    savepoint.commit()
+                    ok += 1
+                except Exception as e:
+                    savepoint.rollback()
+                    errors.append((entry["path"], f"{type(e).__name__}: {e}"))
+    return ok, errors
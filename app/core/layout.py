@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import streamlit as st
+
+from app.core.cache import cache_stats
+
+
+def pager(key: str, total: int, page_size: int, sig: str) -> tuple[int, dict]:
+    """
+    「← 前 / ページ番号 / 次 →」を表示し、(現在ページ, ページ境界キャッシュ) を返す。
+
+    - sig（絞り込み条件・表示件数・DB更新時刻など）が変わったら1ページ目に戻し、境界キャッシュも捨てる
+    - ページ番号は直接入力でジャンプできる
+    - 境界キャッシュは app.core.pagination.keyset_page() にそのまま渡す
+    """
+    page_key = f"{key}_page"
+    bounds_key = f"{key}_boundaries"
+    sig_key = f"{key}_sig"
+
+    max_page = max(1, (total + page_size - 1) // page_size)
+
+    if st.session_state.get(sig_key) != sig:
+        st.session_state[sig_key] = sig
+        st.session_state[page_key] = 1
+        st.session_state[bounds_key] = {}
+    st.session_state[page_key] = min(max(1, int(st.session_state.get(page_key, 1))), max_page)
+
+    # ボタンを先に処理してから番号入力を描画する（同じ key のウィジェットは描画後に書き換えられないため）
+    col_prev, col_mid, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("← 前", use_container_width=True, key=f"{key}_prev") and st.session_state[page_key] > 1:
+            st.session_state[page_key] -= 1
+    with col_next:
+        if st.button("次 →", use_container_width=True, key=f"{key}_next") and st.session_state[page_key] < max_page:
+            st.session_state[page_key] += 1
+    with col_mid:
+        st.number_input(f"ページ（全 {max_page}）", min_value=1, max_value=max_page, step=1, key=page_key)
+
+    return int(st.session_state[page_key]), st.session_state[bounds_key]
+
+
+def cache_caption() -> None:
+    """共有クエリキャッシュ（app.core.cache）のヒット状況をサイドバーに小さく表示する。"""
+    s = cache_stats()
+    st.sidebar.caption(
+        f"query cache: hit {s['hits']} / miss {s['misses']} / "
+        f"{s['entries']}/{s['maxsize']} entries / evicted {s['evictions']}"
+    )
@@ -0,0 +1,145 @@
+"""
+取り込み台帳（import_ledger）。inbox のファイルを「取り込み済みか」で振り分ける。
+
+判定はファイル内容の sha256 で行うので、
+- 移動・リネームしただけのファイルは取り込み直さない
+- 同じ名前で中身が変わった（追記して再出力した）ファイルは取り込む
+
+毎回全ファイルを読むと遅いので、台帳のパス・サイズ・更新時刻が一致するファイルは読まずに飛ばす。
+台帳は種類（kind）ごとに1回のクエリでまとめて読む。
+
+    with engine.begin() as conn:
+        todo, skipped = scan_inbox(conn, "harvest", paths)
+    for entry in todo:
+        ...  # 取り込み
+        with engine.begin() as conn:
+            ...  # データの書き込み
+            record_import(conn, entry, row_count, elapsed_s)
+"""
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Iterable
+
+from sqlalchemy.engine import Connection
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# 台帳導入前のパス単位のログ。ここに載っているファイルは取り込み済みとして台帳に移す
+LEGACY_LOGS = {
+    "harvest": "harvest_import_log",
+    "env": "env_import_log",
+}
+
+
+def file_signature(path: Path) -> tuple[int, int]:
+    """(サイズ, 更新時刻 ns)。"""
+    st = path.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def content_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_ledger(conn: Connection, kind: str) -> tuple[dict[str, tuple], dict[str, str]]:
+    """台帳と旧ログを1回のクエリで読み、(パス -> (size, mtime_ns, hash), hash -> パス) を返す。"""
+    sql = "SELECT path, size, mtime_ns, content_hash FROM import_ledger WHERE kind = ?"
+    if kind in LEGACY_LOGS:
+        sql += f" UNION ALL SELECT path, NULL, NULL, NULL FROM {LEGACY_LOGS[kind]}"
+    by_path: dict[str, tuple] = {}
+    by_hash: dict[str, str] = {}
+    for path, size, mtime_ns, digest in conn.exec_driver_sql(sql, (kind,)):
+        if digest is None:
+            by_path.setdefault(path, (None, None, None))  # 旧ログ（ハッシュ未記録）
+            continue
+        by_path[path] = (size, mtime_ns, digest)
+        by_hash[digest] = path
+    return by_path, by_hash
+
+
+def scan_inbox(conn: Connection, kind: str, paths: Iterable[Path]) -> tuple[list[dict], list[dict]]:
+    """
+    paths を (取り込むもの, 飛ばすもの) に振り分ける。要素は dict:
+    kind / path / size / mtime_ns / content_hash / reason（飛ばす理由）
+
+    移動・リネームされたファイルと旧ログにあるファイルは、次回から高速判定できるよう台帳を更新する。
+    """
+    by_path, by_hash = _load_ledger(conn, kind)
+    todo: list[dict] = []
+    skipped: list[dict] = []
+    touched: list[dict] = []
+
+    for p in paths:
+        p = Path(p).resolve()
+        size, mtime_ns = file_signature(p)
+        entry = {"kind": kind, "path": str(p), "size": size, "mtime_ns": mtime_ns, "content_hash": None}
+
+        known = by_path.get(entry["path"])
+        if known is not None and known[:2] == (size, mtime_ns):
+            skipped.append({**entry, "content_hash": known[2], "reason": "unchanged"})
+            continue
+
+        entry["content_hash"] = digest = content_hash(p)
+        if digest in by_hash:
+            seen_at = by_hash[digest]
+            if seen_at == entry["path"]:
+                skipped.append({**entry, "reason": "unchanged"})  # 更新時刻だけ変わった
+                touched.append(entry)
+            elif not Path(seen_at).exists():
+                skipped.append({**entry, "reason": f"moved from {seen_at}"})
+                touched.append(entry)
+            else:
+                # 同じ内容のコピー。台帳は元のパスのまま（付け替えると毎回入れ替わる）
+                skipped.append({**entry, "reason": f"same content as {seen_at}"})
+        elif known is not None and known[2] is None:
+            skipped.append({**entry, "reason": "in legacy import log"})
+            touched.append(entry)
+        else:
+            todo.append(entry)
+        # 同じ inbox 内の同一内容ファイルは1回だけ取り込む
+        by_hash.setdefault(digest, entry["path"])
+
+    if touched:
+        conn.exec_driver_sql(
+            """
+            INSERT INTO import_ledger(kind, content_hash, path, size, mtime_ns)
+            VALUES (:kind, :content_hash, :path, :size, :mtime_ns)
+            ON CONFLICT(kind, content_hash) DO UPDATE SET
+                path = excluded.path, size = excluded.size, mtime_ns = excluded.mtime_ns
+            """,
+            touched,
+        )
+    return todo, skipped
+
+
+def record_import(conn: Connection, entry: dict, row_count: int, elapsed_s: float) -> None:
+    """取り込み完了を台帳に記録する。データの書き込みと同じトランザクションで呼ぶこと。"""
+    conn.exec_driver_sql(
+        """
+        INSERT INTO import_ledger(kind, content_hash, path, size, mtime_ns, row_count, elapsed_ms)
+        VALUES (:kind, :content_hash, :path, :size, :mtime_ns, :row_count, :elapsed_ms)
+        ON CONFLICT(kind, content_hash) DO UPDATE SET
+            path = excluded.path, size = excluded.size, mtime_ns = excluded.mtime_ns,
+            row_count = excluded.row_count, elapsed_ms = excluded.elapsed_ms,
+            imported_at = datetime('now')
+        """,
+        {
+            **{k: entry[k] for k in ("kind", "content_hash", "path", "size", "mtime_ns")},
+            "row_count": int(row_count),
+            "elapsed_ms": round(elapsed_s * 1000, 1),
+        },
+    )
+
+
+def relocate(conn: Connection, kind: str, moves: Iterable[tuple[Path, Path]]) -> None:
+    """取り込み済みのファイルを移動（アーカイブ）したら、台帳のパスを移動先に付け替える。"""
+    conn.exec_driver_sql(
+        "UPDATE import_ledger SET path = ? WHERE kind = ? AND path = ?",
+        [(str(Path(new).resolve()), kind, str(Path(old).resolve())) for old, new in moves],
+    )
@@ -0,0 +1,706 @@
+"""
+スキーマのバージョン管理（マイグレーション）とインデックス定義。
+
+- MIGRATIONS: 番号順に一度だけ適用する変更。適用済みの番号は schema_migrations に記録する
+- INDEXES   : 最新スキーマで張っておくべきインデックス。起動時に不足分だけ作成する
+
+どちらも冪等なので、init_db() から毎回呼んでよい。
+
+    python -m app.core.migrations          # 適用
+    python -m app.core.migrations --plan   # 適用予定の表示のみ
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Callable
+
+from sqlalchemy.engine import Connection, Engine
+
+
+# =========================
+# Helpers
+# =========================
+def _table_exists(conn: Connection, name: str) -> bool:
+    row = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def _columns(conn: Connection, table: str) -> list[str]:
+    return [r[1] for r in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+
+
+# =========================
+# Migrations
+# =========================
+def _m001_baseline(conn: Connection) -> None:
+    """
+    正規 DDL の作成。
+    既存の harvest_fact（db.py / ETL / Upload の3種類の定義のどれか）は
+    正規形に作り直し、(harvest_date, company, crop, amount_kg) の重複は1行に畳む。
+    """
+    ddl_harvest_fact = """
+    CREATE TABLE {name} (
+        id           INTEGER PRIMARY KEY,
+        harvest_date TEXT NOT NULL,            -- YYYY-MM-DD
+        company      TEXT NOT NULL,
+        crop         TEXT NOT NULL,
+        amount_kg    REAL NOT NULL,
+        source_file  TEXT,
+        created_at   TEXT DEFAULT (datetime('now'))
+    );
+    """
+    if _table_exists(conn, "harvest_fact"):
+        old_cols = set(_columns(conn, "harvest_fact"))
+        copy_cols = [
+            c for c in ("harvest_date", "company", "crop", "amount_kg", "source_file", "created_at")
+            if c in old_cols
+        ]
+        cols = ", ".join(copy_cols)
+        conn.exec_driver_sql(ddl_harvest_fact.format(name="harvest_fact_new"))
+        conn.exec_driver_sql(
+            f"""
+            INSERT INTO harvest_fact_new ({cols})
+            SELECT {cols} FROM harvest_fact
+            WHERE rowid IN (
+                SELECT MIN(rowid) FROM harvest_fact
+                GROUP BY harvest_date, company, crop, amount_kg
+            )
+            """
+        )
+        conn.exec_driver_sql("DROP TABLE harvest_fact")
+        conn.exec_driver_sql("ALTER TABLE harvest_fact_new RENAME TO harvest_fact")
+    else:
+        conn.exec_driver_sql(ddl_harvest_fact.format(name="harvest_fact"))
+
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS raw_csv (
+            c1 TEXT,          -- date raw
+            c2 TEXT,          -- company raw
+            c3 TEXT,          -- crop raw
+            c4 TEXT,          -- amount raw
+            source_file TEXT, -- file name
+            created_at  TEXT DEFAULT (datetime('now'))
+        );
+        """
+    )
+    if "created_at" not in _columns(conn, "raw_csv"):
+        conn.exec_driver_sql("ALTER TABLE raw_csv ADD COLUMN created_at TEXT")
+
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS env_raw (
+          id               INTEGER PRIMARY KEY,
+          farm             TEXT NOT NULL,
+          ts               TEXT NOT NULL,        -- 'YYYY-MM-DD HH:MM[:SS]'
+          air_temp_c       REAL,                 -- CH1: 気温
+          rh_percent       REAL,                 -- CH2: 相対湿度(%)
+          sand_temp_c      REAL,                 -- CH3: 砂温
+          water_content    REAL,                 -- CH4: 含水率
+          irradiance_wm2   REAL                  -- CH5: 日射量(W/m2)
+        );
+        """
+    )
+    for log_table in ("harvest_import_log", "env_import_log"):
+        conn.exec_driver_sql(
+            f"""
+            CREATE TABLE IF NOT EXISTS {log_table} (
+              id          INTEGER PRIMARY KEY,
+              path        TEXT NOT NULL,
+              imported_at TEXT NOT NULL              -- ISO8601 文字列
+            );
+            """
+        )
+
+
+def _m002_company_crop_dims(conn: Connection) -> None:
+    """
+    company / crop を辞書化する。
+    company_dim / crop_dim に名前を1回だけ持ち、harvest_fact は整数キーを持つ。
+    名前で読みたい場合は v_harvest_fact を使う。
+    """
+    for dim, key in (("company_dim", "company_id"), ("crop_dim", "crop_id")):
+        conn.exec_driver_sql(
+            f"""
+            CREATE TABLE IF NOT EXISTS {dim} (
+                {key} INTEGER PRIMARY KEY,
+                name  TEXT NOT NULL UNIQUE
+            );
+            """
+        )
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO company_dim(name) SELECT DISTINCT trim(company) FROM harvest_fact ORDER BY 1"
+    )
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO crop_dim(name) SELECT DISTINCT trim(crop) FROM harvest_fact ORDER BY 1"
+    )
+
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE harvest_fact_new (
+            id           INTEGER PRIMARY KEY,
+            harvest_date TEXT NOT NULL,            -- YYYY-MM-DD
+            company_id   INTEGER NOT NULL REFERENCES company_dim(company_id),
+            crop_id      INTEGER NOT NULL REFERENCES crop_dim(crop_id),
+            amount_kg    REAL NOT NULL,
+            source_file  TEXT,
+            created_at   TEXT DEFAULT (datetime('now'))
+        );
+        """
+    )
+    # trim で同一キーになる行が出うるので、ここでも1行に畳む
+    conn.exec_driver_sql(
+        """
+        INSERT INTO harvest_fact_new (id, harvest_date, company_id, crop_id, amount_kg, source_file, created_at)
+        SELECT h.id, h.harvest_date, c.company_id, k.crop_id, h.amount_kg, h.source_file, h.created_at
+        FROM harvest_fact h
+        JOIN company_dim c ON c.name = trim(h.company)
+        JOIN crop_dim    k ON k.name = trim(h.crop)
+        WHERE h.rowid IN (
+            SELECT MIN(rowid) FROM harvest_fact
+            GROUP BY harvest_date, trim(company), trim(crop), amount_kg
+        )
+        """
+    )
+    conn.exec_driver_sql("DROP TABLE harvest_fact")
+    conn.exec_driver_sql("ALTER TABLE harvest_fact_new RENAME TO harvest_fact")
+
+    conn.exec_driver_sql(
+        """
+        CREATE VIEW IF NOT EXISTS v_harvest_fact AS
+        SELECT
+            h.id,
+            h.harvest_date,
+            c.name AS company,
+            k.name AS crop,
+            h.amount_kg,
+            h.source_file,
+            h.created_at
+        FROM harvest_fact h
+        JOIN company_dim c ON c.company_id = h.company_id
+        JOIN crop_dim    k ON k.crop_id    = h.crop_id;
+        """
+    )
+
+
+def _m003_harvest_daily(conn: Connection) -> None:
+    """
+    日 × 企業 × 作物 の集計テーブル harvest_daily を作り、既存の harvest_fact から埋める。
+    以降の更新は app.core.rollup が取り込みと同じトランザクションで行う。
+    """
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS harvest_daily (
+            day        TEXT    NOT NULL,           -- YYYY-MM-DD
+            company_id INTEGER NOT NULL REFERENCES company_dim(company_id),
+            crop_id    INTEGER NOT NULL REFERENCES crop_dim(crop_id),
+            kg_sum     REAL    NOT NULL,
+            row_count  INTEGER NOT NULL,
+            PRIMARY KEY (day, company_id, crop_id)
+        ) WITHOUT ROWID;
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        INSERT INTO harvest_daily (day, company_id, crop_id, kg_sum, row_count)
+        SELECT harvest_date, company_id, crop_id, SUM(amount_kg), COUNT(*)
+        FROM harvest_fact
+        GROUP BY harvest_date, company_id, crop_id
+        """
+    )
+
+
+def _m004_table_versions(conn: Connection) -> None:
+    """
+    テーブルごとの更新カウンタ。書き込み側が同じトランザクション内で +1 し、
+    app.core.cache がキャッシュキーに使う（app.core.versions 参照）。
+    """
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT    PRIMARY KEY,
+            version    INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def _m005_raw_csv_amount_unit(conn: Connection) -> None:
+    """
+    raw_csv に収量列の単位（列名から判定した "g" / "kg"）を持たせる。
+    既存行は NULL のまま（従来どおり g とみなす）。
+    """
+    if "amount_unit" not in _columns(conn, "raw_csv"):
+        conn.exec_driver_sql("ALTER TABLE raw_csv ADD COLUMN amount_unit TEXT")
+
+
+def _m006_raw_csv_batches(conn: Connection) -> None:
+    """
+    raw_csv をファイル単位のバッチで管理する。
+    raw_csv_batch に1ファイル1行、raw_csv.batch_id でひも付ける。
+    harvest_fact への反映済み位置（最後に反映した batch_id）は etl_watermark に持つ。
+    既存行はファイルごとにバッチを振り、ウォーターマークは 0（次回は全件反映）から始める。
+    """
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS raw_csv_batch (
+            batch_id    INTEGER PRIMARY KEY,
+            source_file TEXT,
+            row_count   INTEGER NOT NULL DEFAULT 0,
+            loaded_at   TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        """
+    )
+    if "batch_id" not in _columns(conn, "raw_csv"):
+        conn.exec_driver_sql("ALTER TABLE raw_csv ADD COLUMN batch_id INTEGER REFERENCES raw_csv_batch(batch_id)")
+    conn.exec_driver_sql(
+        """
+        INSERT INTO raw_csv_batch (source_file, row_count, loaded_at)
+        SELECT source_file, COUNT(*), COALESCE(MIN(created_at), datetime('now'))
+        FROM raw_csv
+        WHERE batch_id IS NULL
+        GROUP BY source_file
+        ORDER BY MIN(rowid)
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        UPDATE raw_csv
+        SET batch_id = (SELECT b.batch_id FROM raw_csv_batch b WHERE b.source_file IS raw_csv.source_file)
+        WHERE batch_id IS NULL
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS etl_watermark (
+            name  TEXT    PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def _m007_import_ledger(conn: Connection) -> None:
+    """
+    取り込み台帳。ファイル内容のハッシュで「取り込み済み」を判定する（app.core.ledger 参照）。
+    旧来のパス単位のログ（harvest_import_log / env_import_log）は移行用に残す。
+    """
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS import_ledger (
+            kind         TEXT    NOT NULL,         -- 'harvest' / 'env'
+            content_hash TEXT    NOT NULL,         -- sha256
+            path         TEXT    NOT NULL,         -- 最後に見たパス
+            size         INTEGER NOT NULL,
+            mtime_ns     INTEGER NOT NULL,
+            row_count    INTEGER,
+            elapsed_ms   REAL,
+            imported_at  TEXT    NOT NULL DEFAULT (datetime('now')),
+            PRIMARY KEY (kind, content_hash)
+        );
+        """
+    )
+
+
+def _m008_raw_csv_batch_autoincrement(conn: Connection) -> None:
+    """
+    raw_csv_batch.batch_id を AUTOINCREMENT にする。
+    ただの INTEGER PRIMARY KEY だと末尾のバッチを消したときに番号が再利用され、
+    ウォーターマーク以下の番号になった新しいバッチが反映されない。
+    """
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE raw_csv_batch_new (
+            batch_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_file TEXT,
+            row_count   INTEGER NOT NULL DEFAULT 0,
+            loaded_at   TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        INSERT INTO raw_csv_batch_new (batch_id, source_file, row_count, loaded_at)
+        SELECT batch_id, source_file, row_count, loaded_at FROM raw_csv_batch
+        """
+    )
+    conn.exec_driver_sql("DROP TABLE raw_csv_batch")
+    conn.exec_driver_sql("ALTER TABLE raw_csv_batch_new RENAME TO raw_csv_batch")
+    # 次の番号は 既存の最大値 と ウォーターマーク の大きい方 + 1
+    # （sqlite_sequence は name が一意ではないので、あれば UPDATE、無ければ INSERT）
+    seq = conn.exec_driver_sql(
+        """
+        SELECT MAX(
+            (SELECT COALESCE(MAX(batch_id), 0) FROM raw_csv_batch),
+            (SELECT COALESCE(MAX(value), 0) FROM etl_watermark)
+        )
+        """
+    ).scalar_one()
+    updated = conn.exec_driver_sql(
+        "UPDATE sqlite_sequence SET seq = ? WHERE name = 'raw_csv_batch'", (seq,)
+    ).rowcount
+    if not updated:
+        conn.exec_driver_sql("INSERT INTO sqlite_sequence(name, seq) VALUES ('raw_csv_batch', ?)", (seq,))
+
+
+def _m009_upload_stage(conn: Connection) -> None:
+    """
+    CSV Upload のプレビュー用ステージング。アップロード1回（upload_id）ごとに解析済みの行を置き、
+    新規 / 登録済み / ファイル内の重複 / 不正 を判定してから新規行だけを登録する（app.core.staging）。
+    """
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS upload_stage (
+            upload_id    TEXT    NOT NULL,
+            row_no       INTEGER NOT NULL,         -- CSV のデータ行番号（1始まり）
+            harvest_date TEXT,                     -- 変換できなければ NULL
+            company      TEXT,
+            crop         TEXT,
+            amount_kg    REAL,
+            raw          TEXT,                     -- 元の値（不正な行の表示用）
+            status       TEXT,                     -- new / dup_db / dup_file / invalid
+            staged_at    TEXT    NOT NULL DEFAULT (datetime('now')),
+            PRIMARY KEY (upload_id, row_no)
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def _m010_env_daily_dirty(conn: Connection) -> None:
+    """
+    env_daily の集計し直しが必要な (farm, 日付)。環境CSVの取り込みで env_raw に行を書いたときに同じトランザクションで記録し、
+    refresh_env_daily()（etl/import_env_csv.py）がその日だけ env_daily を作り直してから消す。
+    """
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS env_daily_dirty (
+            farm TEXT NOT NULL,
+            date TEXT NOT NULL,                    -- 'YYYY-MM-DD'
+            PRIMARY KEY (farm, date)
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def _m011_env_raw_unique_ts(conn: Connection) -> None:
+    """
+    env_raw を (farm, ts) で一意にする。GL240 の出力は期間が重なることがあり、重なった分が二重に入っていた。
+    - ts を 'YYYY-MM-DD HH:MM:SS' にそろえる（to_sql の '.000000' 付きなど表記違いで一意にならないため）
+    - 同じ (farm, ts) は最初に入った行（id が最小）だけ残し、消した行の日は env_daily を集計し直す
+    """
+    conn.exec_driver_sql(
+        "UPDATE env_raw SET ts = COALESCE(strftime('%Y-%m-%d %H:%M:%S', ts), ts)"
+    )
+    conn.exec_driver_sql(
+        """
+        INSERT OR IGNORE INTO env_daily_dirty (farm, date)
+        SELECT DISTINCT farm, substr(ts, 1, 10) FROM env_raw
+        WHERE id NOT IN (SELECT MIN(id) FROM env_raw GROUP BY farm, ts)
+        """
+    )
+    conn.exec_driver_sql(
+        "DELETE FROM env_raw WHERE id NOT IN (SELECT MIN(id) FROM env_raw GROUP BY farm, ts)"
+    )
+    # 一意インデックスが同じ列の検索も兼ねる
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_env_raw_farm_ts")
+    conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ux_env_raw_farm_ts ON env_raw(farm, ts)")
+
+
+def _m012_env_sample(conn: Connection) -> None:
+    """
+    env_raw を (farm_id, epoch) でクラスタ化した WITHOUT ROWID テーブル env_sample に移す。
+    - farm は farm_dim の整数キー、ts は epoch 秒（ts の表記のまま UTC とみなす。タイムゾーンの変換はしない）
+    - 行は主キー順に並ぶので、farm × 期間 の検索は主キーの範囲読みだけで済む（別インデックス・rowid の引き直しが無い）
+    env_raw は同じ列（id を除く）の VIEW として残し、INSERT も INSTEAD OF トリガーで env_sample に流す。
+    取り込み・集計は env_sample を直接読み書きする（app.core.env_store）。
+    """
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS farm_dim (
+            farm_id INTEGER PRIMARY KEY,
+            name    TEXT NOT NULL UNIQUE
+        );
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS env_sample (
+            farm_id        INTEGER NOT NULL REFERENCES farm_dim(farm_id),
+            epoch          INTEGER NOT NULL,       -- ts の epoch 秒
+            air_temp_c     REAL,                   -- CH1: 気温
+            rh_percent     REAL,                   -- CH2: 相対湿度(%)
+            sand_temp_c    REAL,                   -- CH3: 砂温
+            water_content  REAL,                   -- CH4: 含水率
+            irradiance_wm2 REAL,                   -- CH5: 日射量(W/m2)
+            PRIMARY KEY (farm_id, epoch)
+        ) WITHOUT ROWID;
+        """
+    )
+    conn.exec_driver_sql("INSERT OR IGNORE INTO farm_dim(name) SELECT DISTINCT farm FROM env_raw ORDER BY 1")
+    conn.exec_driver_sql(
+        """
+        INSERT OR IGNORE INTO env_sample
+            (farm_id, epoch, air_temp_c, rh_percent, sand_temp_c, water_content, irradiance_wm2)
+        SELECT f.farm_id, CAST(strftime('%s', r.ts) AS INTEGER),
+               r.air_temp_c, r.rh_percent, r.sand_temp_c, r.water_content, r.irradiance_wm2
+        FROM env_raw r
+        JOIN farm_dim f ON f.name = r.farm
+        WHERE strftime('%s', r.ts) IS NOT NULL
+        ORDER BY 1, 2
+        """
+    )
+    conn.exec_driver_sql("DROP TABLE env_raw")
+    conn.exec_driver_sql(
+        """
+        CREATE VIEW env_raw AS
+        SELECT
+            f.name                         AS farm,
+            datetime(s.epoch, 'unixepoch') AS ts,
+            s.air_temp_c,
+            s.rh_percent,
+            s.sand_temp_c,
+            s.water_content,
+            s.irradiance_wm2
+        FROM env_sample s
+        JOIN farm_dim f ON f.farm_id = s.farm_id;
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        CREATE TRIGGER env_raw_insert INSTEAD OF INSERT ON env_raw
+        BEGIN
+            INSERT OR IGNORE INTO farm_dim(name) VALUES (NEW.farm);
+            INSERT INTO env_sample
+                (farm_id, epoch, air_temp_c, rh_percent, sand_temp_c, water_content, irradiance_wm2)
+            VALUES (
+                (SELECT farm_id FROM farm_dim WHERE name = NEW.farm),
+                CAST(strftime('%s', NEW.ts) AS INTEGER),
+                NEW.air_temp_c, NEW.rh_percent, NEW.sand_temp_c, NEW.water_content, NEW.irradiance_wm2
+            );
+        END;
+        """
+    )
+
+
+def _m013_env_rollups(conn: Connection) -> None:
+    """
+    環境ログの時間・日・月ごとの集計（app.core.env_rollup）。チャネルごとに min / max / mean / std / n を持つ。
+    bucket は区間の先頭の epoch 秒。中身は env_daily と同じく取り込み・--full の再構築で作る。
+    """
+    channels = ("air_temp_c", "rh_percent", "sand_temp_c", "water_content", "irradiance_wm2")
+    stats = ",\n".join(
+        f"            {ch}_{stat} {'INTEGER' if stat == 'n' else 'REAL'}"
+        for ch in channels for stat in ("min", "max", "mean", "std", "n")
+    )
+    for resolution in ("hour", "day", "month"):
+        conn.exec_driver_sql(
+            f"""
+            CREATE TABLE IF NOT EXISTS env_rollup_{resolution} (
+                farm_id INTEGER NOT NULL REFERENCES farm_dim(farm_id),
+                bucket  INTEGER NOT NULL,      -- 区間の先頭（epoch 秒）
+{stats},
+                PRIMARY KEY (farm_id, bucket)
+            ) WITHOUT ROWID;
+            """
+        )
+
+
+def _m014_env_raw_current(conn: Connection) -> None:
+    """
+    互換 VIEW env_raw を env_raw_current に改名する。
+    締めた月は Parquet アーカイブ（app.core.env_archive）に移るので、この VIEW で見えるのは当月分だけ。
+    全期間を読むのは read_env()。INSERT の INSTEAD OF トリガーも付け替える。
+    """
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS env_raw_insert")
+    conn.exec_driver_sql("DROP VIEW IF EXISTS env_raw")
+    conn.exec_driver_sql(
+        """
+        CREATE VIEW IF NOT EXISTS env_raw_current AS
+        SELECT
+            f.name                         AS farm,
+            datetime(s.epoch, 'unixepoch') AS ts,
+            s.air_temp_c,
+            s.rh_percent,
+            s.sand_temp_c,
+            s.water_content,
+            s.irradiance_wm2
+        FROM env_sample s
+        JOIN farm_dim f ON f.farm_id = s.farm_id;
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS env_raw_current_insert INSTEAD OF INSERT ON env_raw_current
+        BEGIN
+            INSERT OR IGNORE INTO farm_dim(name) VALUES (NEW.farm);
+            INSERT INTO env_sample
+                (farm_id, epoch, air_temp_c, rh_percent, sand_temp_c, water_content, irradiance_wm2)
+            VALUES (
+                (SELECT farm_id FROM farm_dim WHERE name = NEW.farm),
+                CAST(strftime('%s', NEW.ts) AS INTEGER),
+                NEW.air_temp_c, NEW.rh_percent, NEW.sand_temp_c, NEW.water_content, NEW.irradiance_wm2
+            );
+        END;
+        """
+    )
+
+
+def _m015_drop_harvest_fact_page_index(conn: Connection) -> None:
+    """
+    ix_harvest_fact_page(harvest_date, company_id, crop_id) を消す。
+    ux_harvest_fact_key の先頭3列と同じで、キーセットページングも名前順になって使わなくなった（書き込みとサイズのコストだけ残る）。
+    """
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_harvest_fact_page")
+
+
+# (version, name, apply)
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline", _m001_baseline),
+    (2, "company_crop_dims", _m002_company_crop_dims),
+    (3, "harvest_daily", _m003_harvest_daily),
+    (4, "table_versions", _m004_table_versions),
+    (5, "raw_csv_amount_unit", _m005_raw_csv_amount_unit),
+    (6, "raw_csv_batches", _m006_raw_csv_batches),
+    (7, "import_ledger", _m007_import_ledger),
+    (8, "raw_csv_batch_autoincrement", _m008_raw_csv_batch_autoincrement),
+    (9, "upload_stage", _m009_upload_stage),
+    (10, "env_daily_dirty", _m010_env_daily_dirty),
+    (11, "env_raw_unique_ts", _m011_env_raw_unique_ts),
+    (12, "env_sample", _m012_env_sample),
+    (13, "env_rollups", _m013_env_rollups),
+    (14, "env_raw_current", _m014_env_raw_current),
+    (15, "drop_harvest_fact_page_index", _m015_drop_harvest_fact_page_index),
+]
+
+
+# =========================
+# Index catalog
+# =========================
+# (name, table, columns, unique)
+INDEXES: list[tuple[str, str, str, bool]] = [
+    # 重複判定キー。先頭3列で 期間 / 企業 / 作物 の絞り込みにも効く（キーセットページングも harvest_date の範囲読みに使う）
+    ("ux_harvest_fact_key", "harvest_fact", "harvest_date, company_id, crop_id, amount_kg", True),
+    # 未反映バッチだけを読む（etl/import_harvest_csv.py の promote）
+    ("ix_raw_csv_batch", "raw_csv", "batch_id", False),
+    # 取り込み済み判定
+    ("ux_harvest_import_log_path", "harvest_import_log", "path", True),
+    ("ux_env_import_log_path", "env_import_log", "path", True),
+]
+
+
+# =========================
+# Runner
+# =========================
+def _ensure_version_table(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INTEGER PRIMARY KEY,
+            name       TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        """
+    )
+
+
+def current_version(conn: Connection) -> int:
+    if not _table_exists(conn, "schema_migrations"):
+        return 0
+    row = conn.exec_driver_sql("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return int(row[0] or 0)
+
+
+def pending_migrations(conn: Connection) -> list[tuple[int, str, Callable[[Connection], None]]]:
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def missing_indexes(conn: Connection) -> list[tuple[str, str, str, bool]]:
+    existing = {
+        r[0] for r in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='index'")
+    }
+    return [ix for ix in INDEXES if ix[0] not in existing]
+
+
+def _apply_migration(conn: Connection, version: int, name: str, apply: Callable[[Connection], None]) -> str:
+    apply(conn)
+    conn.exec_driver_sql(
+        "INSERT INTO schema_migrations(version, name) VALUES(?, ?)", (version, name)
+    )
+    return f"migration {version:03d} {name}"
+
+
+def _create_missing_indexes(conn: Connection) -> list[str]:
+    created = []
+    for name, table, cols, unique in missing_indexes(conn):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        conn.exec_driver_sql(f"CREATE {kind} IF NOT EXISTS {name} ON {table}({cols})")
+        created.append(f"index {name} ON {table}({cols})")
+    return created
+
+
+def migrate(engine: Engine) -> list[str]:
+    """未適用のマイグレーションと不足インデックスを適用し、実施内容を返す。"""
+    applied: list[str] = []
+
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+
+    for version, name, apply in MIGRATIONS:
+        # 1件ずつ別トランザクション。途中で失敗しても適用済みの番号までは残る
+        with engine.begin() as conn:
+            if version <= current_version(conn):
+                continue
+            applied.append(_apply_migration(conn, version, name, apply))
+
+    with engine.begin() as conn:
+        applied += _create_missing_indexes(conn)
+
+    return applied
+
+
+def plan(engine: Engine) -> list[str]:
+    """
+    migrate() が実施する内容を返す。DBは変更しない。
+
+    マイグレーションでテーブルを作り直すと、その上のインデックスも張り直しになる。
+    それも含めて正確に出すため、1トランザクション内で実際に適用してからロールバックする。
+    """
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            _ensure_version_table(conn)
+            steps = [_apply_migration(conn, *m) for m in pending_migrations(conn)]
+            steps += _create_missing_indexes(conn)
+        finally:
+            trans.rollback()
+    return steps
+
+
+# =========================
+# CLI
+# =========================
+def main(argv: list[str] | None = None) -> None:
+    from app.core.db import get_engine
+
+    ap = argparse.ArgumentParser(description="heartful DB のスキーマを最新化する")
+    ap.add_argument("--plan", action="store_true", help="適用予定の内容を表示するだけで変更しない")
+    ap.add_argument("--db", default=None, help="対象DBファイル（省略時は DB_PATH）")
+    args = ap.parse_args(argv)
+
+    engine = get_engine(args.db)
+    with engine.connect() as conn:
+        print(f"[INFO] schema version: {current_version(conn)} (latest: {MIGRATIONS[-1][0]})")
+
+    steps = plan(engine) if args.plan else migrate(engine)
+    prefix = "[PLAN]" if args.plan else "[OK]"
+    if not steps:
+        print("[INFO] スキーマは最新です。")
+    for s in steps:
+        print(f"{prefix} {s}")
+
+
+if __name__ == "__main__":
+    main()
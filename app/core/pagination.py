@@ -0,0 +1,105 @@
+"""
+harvest_fact のキーセット（seek）ページング。
+
+並び順は 日付 → 企業名 → 作物名 で、同じ組は id 順（旧 OFFSET 方式の一覧と同じ）。
+キーは (harvest_date, 企業名, 作物名, id)。
+日付の順はインデックス（harvest_date が先頭）で辿り、名前の順は同じ日付の行の中だけで並べる
+（SQLite の部分ソート「USE TEMP B-TREE FOR RIGHT PART OF ORDER BY」。LIMIT に達した日で止まる）。
+各ページは「前ページ最終行のキーより後ろを page_size 件」で取得するので、
+OFFSET と違ってページ番号が大きくても読む行数は変わらない（1日分の行 + page_size 程度）。
+
+ページ境界のキーは呼び出し側が持つ dict（page -> key）にキャッシュする。
+任意ページへのジャンプは、キャッシュ済みの一番近い境界から必要な分だけ進める。
+"""
+from __future__ import annotations
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.dims import decode_dims
+
+PAGE_KEY = ("harvest_date", "company_name", "crop_name", "id")
+
+_KEY_COLS = "h.harvest_date, c.name, k.name, h.id"
+_KEY_BINDS = ", ".join(f":after_{c}" for c in PAGE_KEY)
+_FROM = """
+    FROM harvest_fact h
+    JOIN company_dim c ON c.company_id = h.company_id
+    JOIN crop_dim    k ON k.crop_id    = h.crop_id
+"""
+
+
+def _seek_where(where: str, params: dict, after: tuple | None) -> tuple[str, dict]:
+    if after is None:
+        return where, dict(params)
+    # 先頭の harvest_date だけ別に範囲条件にしておく（インデックスの範囲読みの起点になる）
+    clause = f"h.harvest_date >= :after_harvest_date AND ({_KEY_COLS}) > ({_KEY_BINDS})"
+    where = f"{where} AND {clause}" if where else f"WHERE {clause}"
+    params = dict(params)
+    params.update({f"after_{c}": v for c, v in zip(PAGE_KEY, after)})
+    return where, params
+
+
+def seek_rows(conn: Connection, where: str, params: dict, after: tuple | None, limit: int) -> pd.DataFrame:
+    """キー after より後ろの行を limit 件（after=None なら先頭から）。PAGE_KEY の列を含む。"""
+    where, params = _seek_where(where, params, after)
+    sql = f"""
+    SELECT h.harvest_date, c.name AS company_name, k.name AS crop_name, h.id,
+           h.company_id, h.crop_id, h.amount_kg
+    {_FROM}
+    {where}
+    ORDER BY {_KEY_COLS}
+    LIMIT :limit
+    """
+    params["limit"] = int(limit)
+    return pd.read_sql_query(text(sql), conn, params=params)
+
+
+def find_boundary(conn: Connection, where: str, params: dict, after: tuple | None, skip: int) -> tuple | None:
+    """after から skip 行進んだ位置の行キー（ページ境界）。範囲外なら None。"""
+    where, params = _seek_where(where, params, after)
+    sql = f"""
+    SELECT {_KEY_COLS}
+    {_FROM}
+    {where}
+    ORDER BY {_KEY_COLS}
+    LIMIT 1 OFFSET :skip
+    """
+    params["skip"] = int(skip) - 1
+    row = conn.execute(text(sql), params).fetchone()
+    return tuple(row) if row is not None else None
+
+
+def keyset_page(
+    conn: Connection,
+    where: str,
+    params: dict,
+    page: int,
+    page_size: int,
+    boundaries: dict[int, tuple | None],
+) -> pd.DataFrame:
+    """
+    page ページ目（1始まり）の行を返す。company / crop は Categorical。
+
+    boundaries は「page -> そのページ直前の行キー」のキャッシュで、この関数が更新する。
+    条件・page_size・データが変わったら呼び出し側で空にすること。
+    """
+    boundaries.setdefault(1, None)
+    if page not in boundaries:
+        known = max(p for p in boundaries if p < page)
+        after = find_boundary(conn, where, params, boundaries[known], (page - known) * page_size)
+        if after is not None:
+            boundaries[page] = after
+
+    if page in boundaries:
+        df = seek_rows(conn, where, params, boundaries[page], page_size)
+    else:
+        df = seek_rows(conn, where, params, None, 0)  # 範囲外のページは空
+
+    if len(df) == page_size:
+        # 次ページの境界もついでに覚えておく（「次 →」が常に seek 1回で済む）
+        boundaries[page + 1] = next(df[list(PAGE_KEY)].tail(1).itertuples(index=False, name=None))
+
+    df["harvest_date"] = pd.to_datetime(df["harvest_date"])
+    return decode_dims(conn, df.drop(columns=["company_name", "crop_name", "id"]))
@@ -0,0 +1,132 @@
+"""
+harvest_fact 向けのクエリ。
+
+期間・企業・作物の条件を build_harvest_where() で WHERE 句に変換し、
+絞り込みと集計は SQL 側で行う（pandas に全件を持ってこない）。
+期間条件は ux_harvest_fact_key(harvest_date, company_id, crop_id, amount_kg) の範囲検索になる。
+
+KPI・ランキング・日別推移は集計テーブル harvest_daily（app.core.rollup が更新）から読む。
+行数ではなく 日数 × 企業数 × 作物数 に比例するコストで済む。
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Iterable
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.dims import DIMS
+
+
+def build_harvest_where(
+    date_start: date | str | None = None,
+    date_end: date | str | None = None,
+    companies: Iterable[str] = (),
+    crops: Iterable[str] = (),
+    date_col: str = "harvest_date",
+) -> tuple[str, dict]:
+    """
+    フィルタ条件を (WHERE 句, バインド変数) に変換する。
+    対象テーブルの別名は h。企業・作物は未指定（空）なら全件。
+    harvest_daily に使う場合は date_col="day" を渡す。
+    """
+    clauses: list[str] = []
+    params: dict[str, object] = {}
+
+    if date_start is not None:
+        clauses.append(f"h.{date_col} >= :date_start")
+        params["date_start"] = str(date_start)
+    if date_end is not None:
+        clauses.append(f"h.{date_col} <= :date_end")
+        params["date_end"] = str(date_end)
+
+    for col, names in (("company", companies), ("crop", crops)):
+        names = [str(n) for n in names]
+        if not names:
+            continue
+        table, key = DIMS[col]
+        binds = [f"{col}_{i}" for i in range(len(names))]
+        placeholders = ", ".join(f":{b}" for b in binds)
+        clauses.append(f"h.{key} IN (SELECT {key} FROM {table} WHERE name IN ({placeholders}))")
+        params.update(zip(binds, names))
+
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+
+def harvest_bounds(conn: Connection) -> tuple[date, date] | None:
+    """harvest_fact の最小日・最大日。データが無ければ None。"""
+    row = conn.execute(
+        text("SELECT MIN(harvest_date), MAX(harvest_date) FROM harvest_fact")
+    ).fetchone()
+    if row is None or row[0] is None:
+        return None
+    return date.fromisoformat(row[0]), date.fromisoformat(row[1])
+
+
+def harvest_options(
+    conn: Connection, col: str, where: str = "", params: dict | None = None, source: str = "harvest_fact"
+) -> list[str]:
+    """条件に該当する企業名（col="company"）または作物名（col="crop"）を名前順で返す。"""
+    table, key = DIMS[col]
+    sql = f"""
+    SELECT name FROM {table}
+    WHERE {key} IN (SELECT DISTINCT h.{key} FROM {source} h {where})
+    ORDER BY name
+    """
+    return [r[0] for r in conn.execute(text(sql), params or {})]
+
+
+def harvest_count(conn: Connection, where: str = "", params: dict | None = None) -> int:
+    """条件に該当する harvest_fact の行数。"""
+    sql = f"SELECT COUNT(*) FROM harvest_fact h {where}"
+    return int(conn.execute(text(sql), params or {}).scalar_one())
+
+
+# =========================
+# harvest_daily（日次集計）
+# =========================
+# where は build_harvest_where(..., date_col="day") で作ったものを渡す
+def daily_kpis(conn: Connection, where: str = "", params: dict | None = None) -> dict:
+    """件数・累計収量・日数・企業数・作物数。"""
+    sql = f"""
+    SELECT
+        COALESCE(SUM(h.row_count), 0)    AS row_count,
+        COALESCE(SUM(h.kg_sum), 0.0)     AS total_kg,
+        COUNT(DISTINCT h.day)            AS days,
+        COUNT(DISTINCT h.company_id)     AS companies,
+        COUNT(DISTINCT h.crop_id)        AS crops
+    FROM harvest_daily h
+    {where}
+    """
+    return dict(conn.execute(text(sql), params or {}).mappings().one())
+
+
+def daily_ranking(conn: Connection, col: str, where: str = "", params: dict | None = None) -> pd.DataFrame:
+    """企業別（col="company"）または作物別（col="crop"）の収量合計（降順）。"""
+    table, key = DIMS[col]
+    sql = f"""
+    SELECT d.name AS {col}, SUM(h.kg_sum) AS amount_kg
+    FROM harvest_daily h
+    JOIN {table} d ON d.{key} = h.{key}
+    {where}
+    GROUP BY h.{key}
+    ORDER BY amount_kg DESC
+    """
+    return pd.read_sql_query(text(sql), conn, params=params or {})
+
+
+def daily_totals(conn: Connection, where: str = "", params: dict | None = None) -> pd.DataFrame:
+    """日別の収量合計（harvest_day, amount_kg）。"""
+    sql = f"""
+    SELECT h.day AS harvest_day, SUM(h.kg_sum) AS amount_kg
+    FROM harvest_daily h
+    {where}
+    GROUP BY h.day
+    ORDER BY h.day
+    """
+    df = pd.read_sql_query(text(sql), conn, params=params or {})
+    df["harvest_day"] = pd.to_datetime(df["harvest_day"]).dt.date
+    return df
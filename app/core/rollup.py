@@ -0,0 +1,77 @@
+"""
+harvest_daily（日 × 企業 × 作物 の集計テーブル）の更新。
+
+harvest_fact に行を追加したら、同じトランザクション内で refresh_harvest_daily(conn, days) を呼ぶ。
+INSERT OR IGNORE では実際に入った行が分からないため、差分を足し込むのではなく
+「触った日」を harvest_fact から集計し直す（日付は ux_harvest_fact_key の先頭列なので範囲検索で済む）。
+
+    python -m app.core.rollup --rebuild   # 全件作り直し
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Iterable
+
+from sqlalchemy.engine import Connection
+
+_ROLLUP_SELECT = """
+SELECT harvest_date, company_id, crop_id, SUM(amount_kg), COUNT(*)
+FROM harvest_fact
+{where}
+GROUP BY harvest_date, company_id, crop_id
+"""
+
+
+def refresh_harvest_daily(conn: Connection, days: Iterable[str] | None = None) -> int:
+    """
+    days（YYYY-MM-DD）の集計を harvest_fact から作り直し、書き込んだ集計行数を返す。
+    days=None なら全件作り直す。
+    """
+    if days is None:
+        conn.exec_driver_sql("DELETE FROM harvest_daily")
+        cur = conn.exec_driver_sql(
+            "INSERT INTO harvest_daily (day, company_id, crop_id, kg_sum, row_count)"
+            + _ROLLUP_SELECT.format(where="")
+        )
+        return cur.rowcount
+
+    days = sorted({str(d) for d in days})
+    if not days:
+        return 0
+    # 日付のリストは JSON 1個で渡す（バインド変数の上限を気にしなくてよい）
+    in_days = "IN (SELECT value FROM json_each(?))"
+    payload = json.dumps(days)
+    conn.exec_driver_sql(f"DELETE FROM harvest_daily WHERE day {in_days}", (payload,))
+    cur = conn.exec_driver_sql(
+        "INSERT INTO harvest_daily (day, company_id, crop_id, kg_sum, row_count)"
+        + _ROLLUP_SELECT.format(where=f"WHERE harvest_date {in_days}"),
+        (payload,),
+    )
+    return cur.rowcount
+
+
+# =========================
+# CLI
+# =========================
+def main(argv: list[str] | None = None) -> None:
+    from app.core.db import get_engine, init_db
+    from app.core.versions import bump_versions
+
+    ap = argparse.ArgumentParser(description="harvest_daily（収量の日次集計）を更新する")
+    ap.add_argument("--rebuild", action="store_true", help="harvest_fact から全件作り直す")
+    args = ap.parse_args(argv)
+
+    if not args.rebuild:
+        ap.print_help()
+        return
+
+    init_db()
+    with get_engine().begin() as conn:
+        n = refresh_harvest_daily(conn)
+        bump_versions(conn, "harvest_daily")
+    print(f"[OK] harvest_daily rebuilt: {n} rows")
+
+
+if __name__ == "__main__":
+    main()
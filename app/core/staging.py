@@ -0,0 +1,211 @@
+"""
+harvest_fact への一括登録（ステージング経由）。
+
+1行ずつ dict を作って INSERT OR IGNORE する代わりに、
+1) 列の配列をタプルにして sqlite3 の executemany でステージング用テーブルに流し込み
+2) INSERT ... SELECT ... ON CONFLICT DO NOTHING の1文で harvest_fact にマージする
+（追加件数は 2) の rowcount なので、COUNT(*) を取り直さなくても正確に分かる）
+
+- ETL: insert_harvest_rows(conn, keyed)   TEMP テーブル経由でそのまま登録
+- Upload: stage_upload() → classify_upload()（プレビュー）→ commit_upload()
+  upload_stage テーブルに upload_id ごとに置き、重複判定を見せてから新規行だけを登録する
+"""
+from __future__ import annotations
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+STAGE_TABLE = "temp.harvest_stage"
+# ステージング・マージする列（source_file は ETL のみ。無ければ NULL）
+STAGE_COLUMNS = ("harvest_date", "company_id", "crop_id", "amount_kg", "source_file")
+
+# upload_stage.status -> 表示名
+UPLOAD_STATUSES: dict[str, str] = {
+    "new": "新規",
+    "dup_db": "登録済み（DBに同じ行あり）",
+    "dup_file": "ファイル内の重複",
+    "invalid": "不正（日付・企業・作物・収量のいずれかが空か変換できない）",
+}
+UPLOAD_COLUMNS = ("row_no", "harvest_date", "company", "crop", "amount_kg", "raw")
+# プレビュー途中で放置されたアップロードを消すまでの時間
+UPLOAD_STAGE_TTL = "-1 day"
+
+
+def _column_values(s: pd.Series) -> list:
+    """sqlite3 に渡せる値のリスト。数値列の NaN はそのまま（SQLite が NULL にする）、それ以外の欠損は None。"""
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_extension_array_dtype(s):
+        return s.tolist()
+    values = s.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+
+def _insert_columns(conn: Connection, table: str, df: pd.DataFrame, columns: tuple[str, ...]) -> int:
+    """df の columns（無い列は NULL）を table に executemany で流し込み、行数を返す。"""
+    # 列ごとに Python の値のリストにしてからタプルに組む（行ごとの dict を作らない）
+    n = len(df)
+    cols = [_column_values(df[c]) if c in df.columns else [None] * n for c in columns]
+    # SQLAlchemy の text() を通さず、同じ接続（= 同じトランザクション）の sqlite3 カーソルで流し込む
+    cur = conn.connection.driver_connection.cursor()
+    try:
+        cur.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", zip(*cols)
+        )
+    finally:
+        cur.close()
+    return n
+
+
+# =========================
+# ETL: TEMP ステージング
+# =========================
+def _stage(conn: Connection, df: pd.DataFrame) -> int:
+    """df を TEMP テーブルに入れ直し、入れた行数を返す。"""
+    conn.exec_driver_sql(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS harvest_stage (
+            harvest_date TEXT, company_id INTEGER, crop_id INTEGER, amount_kg REAL, source_file TEXT
+        )
+        """
+    )
+    conn.exec_driver_sql(f"DELETE FROM {STAGE_TABLE}")
+    return _insert_columns(conn, STAGE_TABLE, df, STAGE_COLUMNS)
+
+
+def insert_harvest_rows(conn: Connection, df: pd.DataFrame) -> tuple[int, int]:
+    """
+    df（harvest_date, company_id, crop_id, amount_kg[, source_file]）を harvest_fact に登録し、
+    (追加件数, スキップ件数) を返す。スキップ = 既存行またはファイル内の重複（ux_harvest_fact_key）。
+    呼び出し側のトランザクション内で実行する。
+    """
+    if df.empty:
+        return 0, 0
+    staged = _stage(conn, df)
+    cols = ", ".join(STAGE_COLUMNS)
+    # "WHERE true" は SELECT の後ろの ON CONFLICT を JOIN の ON と区別させるため（SQLite の構文上必要）
+    inserted = conn.exec_driver_sql(
+        f"INSERT INTO harvest_fact ({cols}) SELECT {cols} FROM {STAGE_TABLE} WHERE true ON CONFLICT DO NOTHING"
+    ).rowcount
+    conn.exec_driver_sql(f"DELETE FROM {STAGE_TABLE}")
+    return inserted, staged - inserted
+
+
+# =========================
+# Upload: プレビュー付きステージング
+# =========================
+def stage_upload(conn: Connection, upload_id: str, df: pd.DataFrame) -> int:
+    """
+    解析済みの行（row_no, harvest_date, company, crop, amount_kg, raw）を upload_stage に追加する。
+    変換できなかった値は None / NaN のまま渡す（classify_upload() で invalid になる）。
+    """
+    conn.exec_driver_sql("DELETE FROM upload_stage WHERE staged_at < datetime('now', ?)", (UPLOAD_STAGE_TTL,))
+    return _insert_columns(conn, "upload_stage", df.assign(upload_id=upload_id), ("upload_id", *UPLOAD_COLUMNS))
+
+
+def classify_upload(conn: Connection, upload_id: str) -> dict[str, int]:
+    """
+    upload_stage の行を new / dup_db / dup_file / invalid に振り分け、状態ごとの件数を返す。
+    登録済みかどうかは harvest_fact の重複判定キー（ux_harvest_fact_key）を1行ずつ引く（全件は読まない）。
+    """
+    params = {"upload_id": upload_id}
+    conn.exec_driver_sql("UPDATE upload_stage SET status = NULL WHERE upload_id = :upload_id", params)
+    conn.exec_driver_sql(
+        """
+        UPDATE upload_stage SET status = 'invalid'
+        WHERE upload_id = :upload_id
+          AND (harvest_date IS NULL OR company IS NULL OR company = ''
+               OR crop IS NULL OR crop = '' OR amount_kg IS NULL)
+        """,
+        params,
+    )
+    # 同じキーの2行目以降
+    conn.exec_driver_sql(
+        """
+        UPDATE upload_stage SET status = 'dup_file'
+        WHERE upload_id = :upload_id AND row_no IN (
+            SELECT row_no FROM (
+                SELECT row_no, ROW_NUMBER() OVER (
+                    PARTITION BY harvest_date, company, crop, amount_kg ORDER BY row_no
+                ) AS n
+                FROM upload_stage
+                WHERE upload_id = :upload_id AND status IS NULL
+            )
+            WHERE n > 1
+        )
+        """,
+        params,
+    )
+    # 辞書に無い名前はキーが NULL になるので一致しない（= 未登録）
+    conn.exec_driver_sql(
+        """
+        UPDATE upload_stage SET status = 'dup_db'
+        WHERE upload_id = :upload_id AND status IS NULL AND EXISTS (
+            SELECT 1 FROM harvest_fact h
+            WHERE h.harvest_date = upload_stage.harvest_date
+              AND h.company_id = (SELECT company_id FROM company_dim WHERE name = upload_stage.company)
+              AND h.crop_id    = (SELECT crop_id    FROM crop_dim    WHERE name = upload_stage.crop)
+              AND h.amount_kg  = upload_stage.amount_kg
+        )
+        """,
+        params,
+    )
+    conn.exec_driver_sql(
+        "UPDATE upload_stage SET status = 'new' WHERE upload_id = :upload_id AND status IS NULL", params
+    )
+    counts = dict(conn.exec_driver_sql(
+        "SELECT status, COUNT(*) FROM upload_stage WHERE upload_id = :upload_id GROUP BY status", params
+    ).fetchall())
+    return {status: int(counts.get(status, 0)) for status in UPLOAD_STATUSES}
+
+
+def upload_rows(conn: Connection, upload_id: str, status: str, limit: int = 30) -> pd.DataFrame:
+    """upload_stage の status の行を行番号順に limit 件返す（プレビュー表示用）。"""
+    sql = f"""
+    SELECT {', '.join(UPLOAD_COLUMNS)} FROM upload_stage
+    WHERE upload_id = :upload_id AND status = :status
+    ORDER BY row_no
+    LIMIT :limit
+    """
+    return pd.read_sql_query(text(sql), conn, params={"upload_id": upload_id, "status": status, "limit": limit})
+
+
+def commit_upload(conn: Connection, upload_id: str) -> tuple[int, int, list[str]]:
+    """
+    upload_stage の new の行だけを harvest_fact に登録し、ステージングを片付ける。
+    戻り値: (追加件数, スキップ件数, 追加した行の日付)。
+    スキップはプレビュー後に他の取り込みで同じ行が入った場合だけ発生する。
+    """
+    params = {"upload_id": upload_id}
+    for table, col in (("company_dim", "company"), ("crop_dim", "crop")):
+        conn.exec_driver_sql(
+            f"""
+            INSERT OR IGNORE INTO {table}(name)
+            SELECT DISTINCT {col} FROM upload_stage WHERE upload_id = :upload_id AND status = 'new'
+            """,
+            params,
+        )
+    days = [r[0] for r in conn.exec_driver_sql(
+        "SELECT DISTINCT harvest_date FROM upload_stage WHERE upload_id = :upload_id AND status = 'new'", params
+    )]
+    n_new = conn.exec_driver_sql(
+        "SELECT COUNT(*) FROM upload_stage WHERE upload_id = :upload_id AND status = 'new'", params
+    ).scalar_one()
+    inserted = conn.exec_driver_sql(
+        """
+        INSERT INTO harvest_fact (harvest_date, company_id, crop_id, amount_kg)
+        SELECT s.harvest_date, c.company_id, k.crop_id, s.amount_kg
+        FROM upload_stage s
+        JOIN company_dim c ON c.name = s.company
+        JOIN crop_dim    k ON k.name = s.crop
+        WHERE s.upload_id = :upload_id AND s.status = 'new'
+        ON CONFLICT DO NOTHING
+        """,
+        params,
+    ).rowcount
+    discard_upload(conn, upload_id)
+    return inserted, n_new - inserted, days
+
+
+def discard_upload(conn: Connection, upload_id: str) -> None:
+    conn.exec_driver_sql("DELETE FROM upload_stage WHERE upload_id = ?", (upload_id,))
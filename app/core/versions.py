@@ -0,0 +1,40 @@
+"""
+テーブルごとの更新カウンタ（table_versions）。
+
+- 書き込み側: データを変えたのと同じトランザクション内で bump_versions() を呼ぶ
+- 読み込み側: get_versions() の結果をキャッシュキーに含める（app.core.cache）
+
+DBファイルの更新時刻と違い、関係ないテーブル（env_raw や取り込みログ）への書き込みでは変わらず、
+WAL でメインファイルが更新されないケースでも確実に変わる。
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy.engine import Connection
+
+
+def bump_versions(conn: Connection, *tables: str) -> None:
+    """tables の更新カウンタを +1 する（未登録なら 1 から）。"""
+    conn.exec_driver_sql(
+        """
+        INSERT INTO table_versions(table_name, version) VALUES (?, 1)
+        ON CONFLICT(table_name) DO UPDATE SET version = version + 1
+        """,
+        [(t,) for t in tables],
+    )
+
+
+def get_versions(conn: Connection, tables: Iterable[str]) -> tuple[int, ...]:
+    """tables の更新カウンタを同じ順で返す（未登録は 0）。"""
+    tables = list(tables)
+    if not tables:
+        return ()
+    placeholders = ", ".join("?" for _ in tables)
+    rows = dict(
+        conn.exec_driver_sql(
+            f"SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders})",
+            tuple(tables),
+        ).fetchall()
+    )
+    return tuple(int(rows.get(t, 0)) for t in tables)
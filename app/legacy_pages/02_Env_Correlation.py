@@ -4,6 +4,8 @@ import statsmodels.api as sm
 import plotly.express as px
 
 from db_config import get_engine
+from app.core.env_rollup import DEFAULT_POINTS, env_series
+from app.core.env_store import ENV_VALUE_COLUMNS
 
 st.set_page_config(page_title="環境相関", layout="wide")
 st.title("環境データ × 収量")
@@ -19,13 +21,15 @@ def months():
     return pd.read_sql(q, engine)["month"].tolist()
 
 @st.cache_data(ttl=60)
-def env_rows_in_month(month: str):
-    q = """
-        SELECT *
-        FROM env_rows
-        WHERE substr(ts, 1, 7) = :m
-    """
-    return pd.read_sql(q, engine, params={"m": month})
+def env_farms():
+    return pd.read_sql("SELECT name FROM farm_dim ORDER BY name", engine)["name"].tolist()
+
+@st.cache_data(ttl=60)
+def env_series_in_month(farm: str, month: str, channel: str):
+    # 1か月なら時間ごとの集計を読み、DEFAULT_POINTS 点を超える分は LTTB で間引く（生データは読まない）
+    start = pd.Timestamp(f"{month}-01")
+    with engine.connect() as conn:
+        return env_series(conn, farm, start, start + pd.offsets.MonthBegin(1), channel)
 
 @st.cache_data(ttl=60)
 def harvest_in_month(month: str):
@@ -46,7 +50,7 @@ if not m:
     st.stop()
 
 sel_month = st.selectbox("月を選択 (YYYY-MM)", m, index=len(m)-1)
-env = env_rows_in_month(sel_month)
+farms = env_farms()
 har = harvest_in_month(sel_month)
 
 left, right = st.columns(2)
@@ -56,28 +60,30 @@ with left:
 
 with right:
     st.subheader(f"環境データ ({sel_month})")
-    if env.empty:
-        st.info("この月の env_rows はありません。")
+    if not farms:
+        st.info("環境データがありません。")
     else:
-        # 任意の列を選んで時系列表示 (c2..c10 あたりを候補に)
-        cols = [c for c in env.columns if c.startswith("c")]
-
-        options = cols[:10]
-        default = cols[:2] if len(cols) >= 2 else cols
+        sel_farm = st.selectbox("ファーム", farms, key="env_farm")
 
+        # 任意の測定値の列を選んで時系列表示
         pick = st.multiselect(
             "プロットする列（複数可）",
-            options,
-            default=default,
+            ENV_VALUE_COLUMNS,
+            default=ENV_VALUE_COLUMNS[:2],
             key="env_cols",
         )
 
         if pick:
-            ts = env[["ts"] + pick].copy()
-            ts["ts"] = pd.to_datetime(ts["ts"], errors="coerce")
-            ts = ts.dropna(subset=["ts"]).sort_values("ts")
+            # 列ごとに間引く点が違うので、縦持ちにして列ごとの線で描く
+            parts = []
+            for ch in pick:
+                resolution, series = env_series_in_month(sel_farm, sel_month, ch)
+                parts.append(series[["ts", ch]].rename(columns={ch: "value"}).assign(channel=ch))
+            ts = pd.concat(parts, ignore_index=True)
             if not ts.empty:
-                st.line_chart(ts.set_index("ts"))
+                fig_env = px.line(ts, x="ts", y="value", color="channel")
+                st.plotly_chart(fig_env, width="stretch")
+                st.caption(f"解像度: {resolution}（列ごとに最大 {DEFAULT_POINTS} 点）")
             else:
                 st.info("この月の時系列データがありません。")
         else:
@@ -194,54 +200,3 @@ if not filtered.empty:
     st.dataframe(filtered, width="stretch", hide_index=True)
 else:
     st.info("該当データがありません。")
-import numpy as np
-import statsmodels.api as sm
-import plotly.express as px
-import streamlit as st
-import pandas as pd
-from db_config import get_engine
-
-st.set_page_config(page_title="環境相関", layout="wide")
-st.title("環境データ　×　収量")
-
-engine = get_engine()
-
-@st.cache_data(ttl=60)
-def months():
-    return pd.read_sql("select distinct month from harvest_monthly order by month", engine)["month"].tolist()
-
-@st.cache_data(ttl=60)
-def env_rows_in_month(month: str):
-    q = """
-    select * from env_rows
-    where substr(ts,1,7)=:m
-    """
-    return pd.read_sql(q, engine, params={"m": month})
-
-@st.cache_data(ttl=60)
-def harvest_in_month(month: str):
-    q = """
-    select farm, total_kg
-    from harvest_monthly
-    where month=:m
-    order by total_kg desc
-    """
-    return pd.read_sql(q, engine, params={"m": month})
-
-m = months()
-if not m:
-    st.info("harvest_monthly が空です。")
-    st.stop()
-
-sel_month = st.selectbox("月を選択(YYYY-MM)", m, index=len(m)-1)
-env = env_rows_in_month(sel_month)
-har = harvest_in_month(sel_month)
-
-left, right = st.columns(2)
-with left:
-    st.subheader(f"収量ランキング({sel_month})")
-    st.dataframe(har, width="stretch", hide_index=True)
-
-with right:
-    st.subheader(f"環境データ({sel_month})")
-
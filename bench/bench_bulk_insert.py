@@ -0,0 +1,110 @@
+"""
+harvest_fact への一括登録を、旧方式（to_dict("records") + text() の INSERT OR IGNORE）と
+TEMP ステージング方式（app.core.staging.insert_harvest_rows）で比較する。
+
+両方式とも同じ既存データ（--existing 行）の入った一時DBに、--rows 行（一部は既存行・ファイル内の重複）を登録し、
+追加件数と登録後の harvest_fact が一致することを確認する（違えば終了コード 1）。
+
+    python bench/bench_bulk_insert.py --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+from app.core.migrations import migrate
+from app.core.staging import insert_harvest_rows
+
+
+def make_rows(n: int, seed: int) -> pd.DataFrame:
+    """resolve_keys() 後と同じ形（整数キー）の行。amount_kg は g を 1000 で割った値。"""
+    rng = random.Random(seed)
+    d0 = date(2020, 1, 1)
+    return pd.DataFrame({
+        "harvest_date": [(d0 + timedelta(days=rng.randrange(730))).isoformat() for _ in range(n)],
+        "company_id": [rng.randint(1, 15) for _ in range(n)],
+        "crop_id": [rng.randint(1, 10) for _ in range(n)],
+        "amount_kg": [rng.randrange(1, 20000) / 1000.0 for _ in range(n)],
+        "source_file": "bench.csv",
+    })
+
+
+def legacy_insert(conn, df: pd.DataFrame) -> tuple[int, int]:
+    # 旧 pages/3_csv_upload.py / etl/import_harvest_csv.py の登録処理
+    sql = text("""
+    INSERT OR IGNORE INTO harvest_fact(harvest_date, company_id, crop_id, amount_kg, source_file)
+    VALUES(:harvest_date, :company_id, :crop_id, :amount_kg, :source_file)
+    """)
+    before_n = conn.execute(text("SELECT COUNT(*) FROM harvest_fact")).scalar_one()
+    rows = df.to_dict("records")
+    conn.execute(sql, rows)
+    after_n = conn.execute(text("SELECT COUNT(*) FROM harvest_fact")).scalar_one()
+    inserted = after_n - before_n
+    return inserted, len(rows) - inserted
+
+
+def build_db(path: Path, existing: pd.DataFrame):
+    engine = get_engine(path)
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO company_dim(name) VALUES (?)", [(f"企業{i:02d}",) for i in range(15)])
+        conn.exec_driver_sql("INSERT INTO crop_dim(name) VALUES (?)", [(f"作物{i:02d}",) for i in range(10)])
+        insert_harvest_rows(conn, existing)
+    return engine
+
+
+def fingerprint(engine) -> tuple:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT COUNT(*), SUM(amount_kg), SUM(company_id * crop_id), MIN(harvest_date), MAX(harvest_date) FROM harvest_fact"
+        ).one()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000, help="1回で登録する行数")
+    ap.add_argument("--existing", type=int, default=200_000, help="登録前から harvest_fact にある行数")
+    args = ap.parse_args()
+
+    existing = make_rows(args.existing, seed=1)
+    # 新規行 + 既存行の再登録（1割）+ ファイル内の重複（1割）
+    fresh = make_rows(args.rows - args.rows // 5, seed=2)
+    batch = pd.concat(
+        [fresh, existing.sample(args.rows // 10, replace=True, random_state=0), fresh.head(args.rows // 10)],
+        ignore_index=True,
+    )
+    print(f"existing={len(existing):,} rows  batch={len(batch):,} rows")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn in {"legacy": legacy_insert, "staging": insert_harvest_rows}.items():
+            engine = build_db(Path(tmp) / f"{name}.db", existing)
+            t0 = time.perf_counter()
+            with engine.begin() as conn:
+                inserted, skipped = fn(conn, batch)
+            elapsed = time.perf_counter() - t0
+            results[name] = (inserted, skipped, fingerprint(engine))
+            print(f"{name:<8} {elapsed:8.2f} s  ({len(batch) / elapsed:,.0f} rows/s)  inserted={inserted:,} skipped={skipped:,}")
+        dispose_engines()
+
+    if results["legacy"] != results["staging"]:
+        print(f"[parity] mismatch: {results}")
+        sys.exit(1)
+    print("[parity] inserted / skipped / harvest_fact match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compass 読み込み経路のクエリ遅延を「毎回 create_engine」と「共有プール Engine」で比較する。
+
+    python bench/bench_engine.py --rows 50000 --repeat 30
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+
+COMPASS_SQL = """
+SELECT harvest_date, company, crop, amount_kg
+FROM harvest_fact
+ORDER BY harvest_date, company, crop
+"""
+LOOKUP_SQL = "SELECT 1 FROM harvest_fact WHERE harvest_date = '2025-08-01' LIMIT 1"
+
+
+def build_db(path: Path, rows: int) -> None:
+    rng = random.Random(0)
+    companies = [f"企業{i:02d}" for i in range(30)]
+    crops = [f"作物{i:02d}" for i in range(20)]
+    d0 = date(2023, 1, 1)
+    df = pd.DataFrame(
+        {
+            "harvest_date": [(d0 + timedelta(days=rng.randrange(1000))).isoformat() for _ in range(rows)],
+            "company": [rng.choice(companies) for _ in range(rows)],
+            "crop": [rng.choice(crops) for _ in range(rows)],
+            "amount_kg": [rng.randrange(1, 100000) / 1000 for _ in range(rows)],
+        }
+    )
+    eng = create_engine(f"sqlite:///{path}")
+    with eng.begin() as conn:
+        df.to_sql("harvest_fact", conn, index=False)
+    eng.dispose()
+
+
+def timed(fn, repeat: int) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def report(label: str, ms: list[float]) -> None:
+    ms = sorted(ms)
+    p95 = ms[max(0, int(len(ms) * 0.95) - 1)]
+    print(f"{label:<28} mean={statistics.mean(ms):8.2f}ms  p50={statistics.median(ms):8.2f}ms  p95={p95:8.2f}ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=30)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "bench.db"
+        build_db(db, args.rows)
+        print(f"rows={args.rows} repeat={args.repeat}")
+
+        def legacy(sql):
+            def run():
+                eng = create_engine(f"sqlite:///{db}", future=True)
+                pd.read_sql_query(sql, eng)
+            return run
+
+        def pooled(sql):
+            def run():
+                pd.read_sql_query(sql, get_engine(db))
+            return run
+
+        pooled(LOOKUP_SQL)()  # プール作成・PRAGMA 適用を計測から外す
+        report("lookup / create_engine", timed(legacy(LOOKUP_SQL), args.repeat))
+        report("lookup / pooled", timed(pooled(LOOKUP_SQL), args.repeat))
+        report("compass / create_engine", timed(legacy(COMPASS_SQL), args.repeat))
+        report("compass / pooled", timed(pooled(COMPASS_SQL), args.repeat))
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+env_daily の更新: 全件作り直し（rebuild_env_daily_and_views）と、取り込んだ日だけの作り直し（refresh_env_daily）の比較。
+
+一時DBに --days 日分の 10分間隔データ（既定は1年 = 52,560 行 / farm）を入れて env_daily を作った状態から、
+新しく --new-days 日分（既定は1週間）を取り込み、env_daily を更新する時間を比べる。
+取り込んだ日だけ作り直した結果が、全件作り直した結果と一致することも確認する（違えば終了コード 1）。
+
+    python bench/bench_env_daily.py --days 365 --new-days 7 --farms 1
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+from app.core.env_store import insert_env_samples
+from app.core.migrations import migrate
+from etl import import_env_csv
+from etl.import_env_csv import mark_env_partitions, rebuild_env_daily_and_views, refresh_env_daily, split_env_overlap
+
+
+def env_rows(farms: int, start: str, days: int, seed: int) -> pd.DataFrame:
+    """farm ごとに 10分間隔の env_raw 形式のデータを作る。"""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range(start, periods=days * 144, freq="10min")
+    frames = []
+    for f in range(farms):
+        n = len(ts)
+        frames.append(pd.DataFrame({
+            "farm": f"farm{f:02d}",
+            "ts": ts,
+            "air_temp_c": rng.normal(25, 5, n).round(3),
+            "rh_percent": rng.uniform(30, 95, n).round(3),
+            "sand_temp_c": rng.normal(27, 4, n).round(3),
+            "water_content": rng.uniform(5, 45, n).round(2),
+            "irradiance_wm2": rng.uniform(0, 900, n).round(1),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def load(engine, df: pd.DataFrame) -> None:
+    """write_env_file() と同じく env_sample に書いて触った日を記録する。"""
+    with engine.begin() as conn:
+        df, _ = split_env_overlap(conn, df)
+        insert_env_samples(conn, df)
+        mark_env_partitions(conn, df)
+
+
+def env_daily(engine) -> pd.DataFrame:
+    with engine.connect() as conn:
+        return pd.read_sql("SELECT * FROM env_daily ORDER BY farm, date", conn)
+
+
+def timed(label: str, fn, repeat: int, setup=None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        # 集計関数のログは出さない
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+    print(f"{label:<28} {best * 1000:9.1f} ms")
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=365, help="既存データの日数")
+    ap.add_argument("--new-days", type=int, default=7, help="新しく取り込む日数")
+    ap.add_argument("--farms", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = get_engine(Path(tmp) / "bench_env_daily.db")
+        migrate(engine)
+        import_env_csv.engine = engine
+
+        old = env_rows(args.farms, "2024-01-01", args.days, seed=0)
+        # 新しいデータは既存の最終日に重なるところから始める（日の途中から続きが届いた場合）
+        new = env_rows(args.farms, old["ts"].iloc[-1] + pd.Timedelta(minutes=5), args.new_days, seed=1)
+        load(engine, old)
+        with contextlib.redirect_stdout(io.StringIO()):
+            rebuild_env_daily_and_views()
+        load(engine, new)
+        print(f"env_raw={len(old) + len(new):,} rows ({args.farms} farm x {args.days}+{args.new_days} days)")
+
+        with engine.connect() as conn:
+            dirty = conn.exec_driver_sql("SELECT COUNT(*) FROM env_daily_dirty").scalar_one()
+        # 1回目で dirty が消えるので、測るたびに新しい日の分を記録し直す
+        def mark_new():
+            with engine.begin() as conn:
+                mark_env_partitions(conn, new)
+
+        t_part = timed(f"refresh ({dirty} partitions)", refresh_env_daily, args.repeat, setup=mark_new)
+        partial_result = env_daily(engine)
+        t_full = timed("full rebuild", rebuild_env_daily_and_views, args.repeat)
+        full_result = env_daily(engine)
+        print(f"  speedup x{t_full / t_part:.1f}")
+        dispose_engines()
+
+    try:
+        pd.testing.assert_frame_equal(partial_result, full_result)
+        print(f"[parity] env_daily {len(full_result):,} rows match")
+    except AssertionError as e:
+        print(f"[parity] env_daily mismatch: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
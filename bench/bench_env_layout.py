@@ -0,0 +1,155 @@
+"""
+環境ログの格納レイアウトの比較: 旧 env_raw（rowid テーブル、ts は TEXT）と env_sample（migration 012。
+(farm_id, epoch) でクラスタ化した WITHOUT ROWID テーブル）。
+
+--years 年 × --farms farm の 10分間隔データ（既定 5年 × 10 farm = 約263万行）で
+- 格納サイズ（VACUUM 後のファイルサイズ）
+- 1 farm × 1か月 の範囲検索の時間
+    旧: ts の範囲（ux_env_raw_farm_ts）/ substr(ts, 1, 7) = 月（全件走査）
+    新: env_sample の epoch 範囲（主キー）/ 互換 VIEW env_raw の ts 範囲（式になるので全件走査）
+- 旧テーブルからの移行（migration 012）の時間
+を測る。範囲検索の結果（行数・合計値）が全方式で一致することも確認する（違えば終了コード 1）。
+
+    python bench/bench_env_layout.py --years 5 --farms 10
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+from app.core.env_store import read_env_samples
+from app.core.migrations import _m012_env_sample
+
+# migration 001 の env_raw + migration 011 の一意インデックス
+OLD_DDL = """
+CREATE TABLE env_raw (
+  id               INTEGER PRIMARY KEY,
+  farm             TEXT NOT NULL,
+  ts               TEXT NOT NULL,
+  air_temp_c       REAL,
+  rh_percent       REAL,
+  sand_temp_c      REAL,
+  water_content    REAL,
+  irradiance_wm2   REAL
+);
+CREATE UNIQUE INDEX ux_env_raw_farm_ts ON env_raw(farm, ts);
+"""
+START = datetime(2020, 1, 1)
+
+
+def build_old(path: Path, years: int, farms: int) -> int:
+    n = years * 365 * 144
+    ts = [(START + timedelta(minutes=10 * i)).strftime("%Y-%m-%d %H:%M:%S") for i in range(n)]
+    rng = np.random.default_rng(0)
+    con = sqlite3.connect(path)
+    con.executescript(OLD_DDL)
+    for f in range(farms):
+        vals = [
+            rng.normal(25, 5, n).round(3), rng.uniform(30, 95, n).round(3), rng.normal(27, 4, n).round(3),
+            rng.uniform(5, 45, n).round(2), rng.uniform(0, 900, n).round(1),
+        ]
+        # ロガーごとにファイルを取り込んだ順（farm ごとにまとまって入る）
+        con.executemany(
+            "INSERT INTO env_raw(farm, ts, air_temp_c, rh_percent, sand_temp_c, water_content, irradiance_wm2) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            zip([f"farm{f:02d}"] * n, ts, *(v.tolist() for v in vals)),
+        )
+    con.commit()
+    con.execute("VACUUM")
+    con.close()
+    return n * farms
+
+
+def timed(label: str, fn, repeat: int) -> tuple:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"{label:<36} {best * 1000:9.2f} ms  rows={result[0]}")
+    return result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--farms", type=int, default=10)
+    ap.add_argument("--month", default="2023-06", help="範囲検索する月")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    farm = f"farm{args.farms // 2:02d}"
+    lo = f"{args.month}-01 00:00:00"
+    hi = (datetime.strptime(args.month, "%Y-%m") + timedelta(days=32)).strftime("%Y-%m-01 00:00:00")
+    agg = "COUNT(*), ROUND(SUM(air_temp_c), 3)"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_db, new_db = Path(tmp) / "old.db", Path(tmp) / "new.db"
+        t0 = time.perf_counter()
+        rows = build_old(old_db, args.years, args.farms)
+        print(f"env_raw {rows:,} rows ({args.years} years x {args.farms} farms, 10 min) built in {time.perf_counter() - t0:.1f}s")
+
+        shutil.copy(old_db, new_db)
+        engine = get_engine(new_db)
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            _m012_env_sample(conn)
+        print(f"migration 012 (env_raw -> env_sample)   {time.perf_counter() - t0:.1f}s")
+        dispose_engines()
+        con = sqlite3.connect(new_db)
+        con.execute("VACUUM")
+        con.close()
+
+        size_old, size_new = os.path.getsize(old_db), os.path.getsize(new_db)
+        print(f"size: env_raw {size_old / 2**20:7.1f} MiB  ->  env_sample {size_new / 2**20:7.1f} MiB  (x{size_old / size_new:.2f} smaller)")
+
+        print(f"range query: {farm}, {args.month}")
+        old = sqlite3.connect(old_db)
+        new = sqlite3.connect(new_db)
+        results = [
+            timed("old: ts range (ux_env_raw_farm_ts)", lambda: old.execute(
+                f"SELECT {agg} FROM env_raw WHERE farm = ? AND ts >= ? AND ts < ?", (farm, lo, hi)).fetchone(), args.repeat),
+            timed("old: substr(ts, 1, 7) = month", lambda: old.execute(
+                f"SELECT {agg} FROM env_raw WHERE farm = ? AND substr(ts, 1, 7) = ?", (farm, args.month)).fetchone(), args.repeat),
+            timed("new: env_sample epoch range (PK)", lambda: new.execute(
+                f"""
+                SELECT {agg} FROM env_sample
+                WHERE farm_id = (SELECT farm_id FROM farm_dim WHERE name = ?)
+                  AND epoch >= CAST(strftime('%s', ?) AS INTEGER) AND epoch < CAST(strftime('%s', ?) AS INTEGER)
+                """, (farm, lo, hi)).fetchone(), args.repeat),
+            timed("new: compat VIEW env_raw ts range", lambda: new.execute(
+                f"SELECT {agg} FROM env_raw WHERE farm = ? AND ts >= ? AND ts < ?", (farm, lo, hi)).fetchone(), args.repeat),
+        ]
+        old.close()
+        new.close()
+
+        # 取り込み・集計側が使う読み方（pandas まで）
+        engine = get_engine(new_db)
+        with engine.connect() as conn:
+            t0 = time.perf_counter()
+            df = read_env_samples(conn, farm, lo, hi)
+            print(f"{'new: read_env_samples() -> DataFrame':<36} {(time.perf_counter() - t0) * 1000:9.2f} ms  rows={len(df)}")
+        dispose_engines()
+
+    if len(set(results)) != 1:
+        print(f"[parity] range query results differ: {results}")
+        sys.exit(1)
+    print(f"[parity] all range queries returned {results[0]}")
+
+
+if __name__ == "__main__":
+    main()
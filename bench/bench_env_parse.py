@@ -0,0 +1,106 @@
+"""
+GL240 CSV の読み込み（etl.import_env_csv）: C エンジンの高速経路と python エンジンの比較。
+
+data/inbox/env の全ファイルで
+- 一致確認: _read_gl240_fast() と _read_gl240_python()（従来の読み方。フォールバックとして残している）の結果
+- 速度: 1ファイルずつ読んだ合計時間（判定 sniff_file はキャッシュ済みの状態で、読み込みだけを測る）
+を比べる。--scale N で各ファイルのデータ行を N 倍にしたコピーでも測る（長期間のログ相当）。
+
+    python bench/bench_env_parse.py --repeat 5 --scale 20
+
+高速経路で読めなかったファイル・一致しないファイルがあれば一覧を出して終了コード 1 で終わる。
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.common.sniff import sniff_file
+from etl.import_env_csv import _read_gl240_fast, _read_gl240_python
+
+ENV_DIR = BASE_DIR / "data" / "inbox" / "env"
+
+
+def scaled_copy(p: Path, dest: Path, scale: int) -> Path:
+    """ヘッダー・単位行はそのままで、データ行を scale 回繰り返したコピーを作る。"""
+    info = sniff_file(p)
+    raw = p.read_bytes()
+    lines = raw.splitlines(keepends=True)
+    head, body = lines[: info["header_row"] + 2], lines[info["header_row"] + 2:]
+    dest.write_bytes(b"".join(head) + b"".join(body) * scale)
+    return dest
+
+
+def timed(label: str, fn, paths: list[Path], repeat: int) -> float:
+    infos = {p: sniff_file(p) for p in paths}
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in paths:
+            fn(p, infos[p])
+        best = min(best, time.perf_counter() - t0)
+    print(f"{label:<24} {best * 1000:9.1f} ms  ({len(paths)} files)")
+    return best
+
+
+def check(paths: list[Path]) -> list[str]:
+    diffs = []
+    for p in paths:
+        info = sniff_file(p)
+        fast = _read_gl240_fast(p, info)
+        if fast is None:
+            diffs.append(f"{p.name}: fast path fell back")
+            continue
+        try:
+            pd.testing.assert_frame_equal(
+                fast.reset_index(drop=True), _read_gl240_python(p, info).reset_index(drop=True), check_dtype=False
+            )
+        except AssertionError as e:
+            diffs.append(f"{p.name}: {str(e).splitlines()[0]}")
+    return diffs
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--scale", type=int, default=20)
+    args = ap.parse_args()
+    # python エンジン側の時刻の形式推定の警告は出さない
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    env = sorted(ENV_DIR.glob("*.csv"))
+    n_rows = sum(len(_read_gl240_python(p, sniff_file(p))) for p in env)
+    diffs = check(env)
+    print(f"[parity] {len(env)} files / {n_rows:,} rows, {len(diffs)} mismatches")
+
+    t_fast = timed("C engine (fast path)", _read_gl240_fast, env, args.repeat)
+    t_py = timed("python engine", _read_gl240_python, env, args.repeat)
+    print(f"  speedup x{t_py / t_fast:.1f}")
+
+    if args.scale > 1:
+        with tempfile.TemporaryDirectory() as tmp:
+            big = [scaled_copy(p, Path(tmp) / p.name, args.scale) for p in env]
+            diffs += check(big)
+            print(f"[scale x{args.scale}] {n_rows * args.scale:,} rows")
+            t_fast = timed("C engine (fast path)", _read_gl240_fast, big, args.repeat)
+            t_py = timed("python engine", _read_gl240_python, big, args.repeat)
+            print(f"  speedup x{t_py / t_fast:.1f}")
+
+    for d in diffs:
+        print(f"  {d}")
+    if diffs:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+グラフ用の環境ログの読み込み: 生データをそのまま読む場合と env_series()（集計テーブル + LTTB）の比較。
+
+一時DBに --years 年分の 10分間隔データ（既定 5年 = 約26万行 / farm）を入れ、集計を作った状態で
+1週間 / 1か月 / 3か月 / 1年 / 全期間 のそれぞれについて
+- グラフに送る点数（行数）
+- 読み込みの時間
+を測る。あわせて
+- 集計テーブル（取り込み時の refresh_env_rollups）が、全件から pandas で集計し直した結果と一致すること
+- 取り込みで触った月だけ作り直した結果が、全件作り直した結果と一致すること
+を確認する（違えば終了コード 1）。
+
+    python bench/bench_env_rollup.py --years 5 --points 500
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+from app.core.env_archive import read_env
+from app.core.env_rollup import RESOLUTIONS, env_series, rebuild_env_rollups, refresh_env_rollups, rollup_frame
+from app.core.env_store import insert_env_samples
+from app.core.migrations import migrate
+from etl.import_env_csv import mark_env_partitions
+
+FARM = "farm00"
+CHANNEL = "air_temp_c"
+
+
+def env_rows(start: str, days: int, seed: int) -> pd.DataFrame:
+    """10分間隔の env_raw 形式のデータ（日周変動 + ノイズ、ところどころ欠測）を作る。"""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range(start, periods=days * 144, freq="10min")
+    n = len(ts)
+    hour = ts.hour.to_numpy() + ts.minute.to_numpy() / 60
+    df = pd.DataFrame({
+        "farm": FARM,
+        "ts": ts,
+        "air_temp_c": (22 + 8 * np.sin((hour - 9) / 24 * 2 * np.pi) + rng.normal(0, 1, n)).round(3),
+        "rh_percent": rng.uniform(30, 95, n).round(3),
+        "sand_temp_c": rng.normal(27, 4, n).round(3),
+        "water_content": rng.uniform(5, 45, n).round(2),
+        "irradiance_wm2": rng.uniform(0, 900, n).round(1),
+    })
+    df.loc[rng.random(n) < 0.01, "air_temp_c"] = np.nan
+    return df
+
+
+def rollups(conn) -> dict[str, pd.DataFrame]:
+    return {
+        r: pd.read_sql(f"SELECT * FROM env_rollup_{r} ORDER BY farm_id, bucket", conn)
+        for r in RESOLUTIONS
+    }
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--points", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = get_engine(Path(tmp) / "bench_env_rollup.db")
+        migrate(engine)
+
+        days = args.years * 365
+        old = env_rows("2020-01-01", days - 10, seed=0)
+        new = env_rows(str(old["ts"].iloc[-1] + pd.Timedelta(minutes=10)), 10, seed=1)
+        with engine.begin() as conn:
+            insert_env_samples(conn, old)
+            t0 = time.perf_counter()
+            rebuild_env_rollups(conn, read_env(conn))
+            print(f"env_sample {len(old):,} rows: rebuild_env_rollups {time.perf_counter() - t0:.2f}s")
+
+        # 続きの10日分を取り込み、触った月だけ作り直す
+        with engine.begin() as conn:
+            insert_env_samples(conn, new)
+            mark_env_partitions(conn, new)
+            dirty = pd.read_sql("SELECT farm, date FROM env_daily_dirty", conn, parse_dates=["date"])
+            t0 = time.perf_counter()
+            months = refresh_env_rollups(conn, dirty)
+            print(f"import {len(new):,} rows: refresh_env_rollups ({months} farm-months) {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        with engine.connect() as conn:
+            partial = rollups(conn)
+            raw = read_env(conn)
+        with engine.begin() as conn:
+            rebuild_env_rollups(conn, raw)
+        with engine.connect() as conn:
+            full = rollups(conn)
+
+        for r in RESOLUTIONS:
+            try:
+                pd.testing.assert_frame_equal(partial[r], full[r])
+                expect = rollup_frame(raw, r)
+                np.testing.assert_allclose(full[r][f"{CHANNEL}_mean"], expect[f"{CHANNEL}_mean"])
+                np.testing.assert_allclose(full[r][f"{CHANNEL}_std"], expect[f"{CHANNEL}_std"])
+                np.testing.assert_array_equal(full[r][f"{CHANNEL}_n"], expect[f"{CHANNEL}_n"])
+            except AssertionError as e:
+                print(f"[parity] env_rollup_{r} mismatch: {e}")
+                ok = False
+        if ok:
+            print("[parity] refresh == rebuild == pandas for " + ", ".join(f"{r}({len(full[r])})" for r in RESOLUTIONS))
+
+        end = raw["ts"].max().normalize() + pd.Timedelta(days=1)
+        windows = {
+            "1 week": pd.Timedelta(days=7),
+            "1 month": pd.Timedelta(days=30),
+            "3 months": pd.Timedelta(days=91),
+            "1 year": pd.Timedelta(days=365),
+            f"{args.years} years": end - raw["ts"].min().normalize(),
+        }
+        print(f"{'window':<10} {'raw rows':>9} {'raw ms':>8}   {'resolution':<10} {'points':>6} {'ms':>7}")
+        with engine.connect() as conn:
+            for label, span in windows.items():
+                start = end - span
+                t_raw, df_raw = timed(lambda: read_env(conn, [FARM], start, end, [CHANNEL]), args.repeat)
+                t_env, (res, df) = timed(
+                    lambda: env_series(conn, FARM, start, end, CHANNEL, args.points), args.repeat
+                )
+                print(f"{label:<10} {len(df_raw):>9,} {t_raw * 1000:8.1f}   {res:<10} {len(df):>6} {t_env * 1000:7.1f}")
+                if len(df) > args.points:
+                    print(f"[payload] {label}: {len(df)} points > {args.points}")
+                    ok = False
+        dispose_engines()
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+検索結果エクスポートのピークメモリを比較する。
+
+- legacy : 全件を DataFrame に読み、to_csv() した文字列を encode（従来の Search/List）
+- stream : app.core.export でカーソルからチャンク書き出し（csv / csv.gz / parquet）
+
+    python bench/bench_export.py --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+from app.core.dims import decode_dims
+from app.core.export import export_harvest
+from app.core.migrations import migrate
+from app.core.queries import build_harvest_where
+
+
+# =========================
+# 全件読み（比較用。Search/List の書き出しは app.core.export）
+# =========================
+def harvest_rows(conn: Connection, where: str, params: dict) -> pd.DataFrame:
+    """旧 Search/List の書き出し元。条件に該当する明細を全件 DataFrame で読む。"""
+    sql = f"""
+    SELECT h.harvest_date, h.company_id, h.crop_id, h.amount_kg
+    FROM harvest_fact h
+    JOIN company_dim c ON c.company_id = h.company_id
+    JOIN crop_dim    k ON k.crop_id    = h.crop_id
+    {where}
+    ORDER BY h.harvest_date, c.name, k.name
+    """
+    df = pd.read_sql_query(text(sql), conn, params=params)
+    df["harvest_date"] = pd.to_datetime(df["harvest_date"])
+    return decode_dims(conn, df)
+
+
+def build_db(path: Path, rows: int) -> None:
+    engine = get_engine(path)
+    migrate(engine)
+    rng = random.Random(0)
+    d0 = date(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO company_dim(name) VALUES (?)", [(f"企業{i:02d}",) for i in range(30)])
+        conn.exec_driver_sql("INSERT INTO crop_dim(name) VALUES (?)", [(f"作物{i:02d}",) for i in range(20)])
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO harvest_fact(harvest_date, company_id, crop_id, amount_kg) VALUES (?, ?, ?, ?)",
+            [
+                ((d0 + timedelta(days=rng.randrange(2000))).isoformat(), rng.randint(1, 30), rng.randint(1, 20), rng.randrange(1, 100000) / 1000)
+                for _ in range(rows)
+            ],
+        )
+
+
+def measure(label: str, fn) -> None:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} peak={peak / 2**20:8.1f}MiB  time={elapsed:6.2f}s  output={size / 2**20:7.1f}MiB")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "bench.db"
+        build_db(db, args.rows)
+        engine = get_engine(db)
+        where, params = build_harvest_where()
+        print(f"rows={args.rows}")
+
+        def legacy() -> int:
+            with engine.connect() as conn:
+                df = harvest_rows(conn, where, params)
+            return len(df.to_csv(index=False).encode("utf-8-sig"))
+
+        def stream(fmt: str):
+            def run() -> int:
+                with export_harvest(engine, fmt, where, params) as f:
+                    return f.seek(0, 2)
+            return run
+
+        measure("legacy", legacy)
+        for fmt in ("csv", "csv.gz", "parquet"):
+            measure(fmt, stream(fmt))
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
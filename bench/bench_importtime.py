@@ -0,0 +1,111 @@
+"""
+Home.py と各ページの import コストを `python -X importtime` で計測する。
+
+各スクリプトのトップレベル import 文だけを抜き出して新しいプロセスで実行し、
+累積時間の合計と重いモジュール上位を表示する。あわせて、import だけで
+DBディレクトリ（db/）にファイルが作られていないかも確認する。
+
+    python bench/bench_importtime.py
+    python bench/bench_importtime.py --save bench_output.json      # 基準値を保存
+    python bench/bench_importtime.py --compare bench_output.json   # 基準値との差分
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DB_DIR = BASE_DIR / "db"
+
+TARGETS = [
+    BASE_DIR / "Home.py",
+    BASE_DIR / "main.py",
+    *sorted(p for p in (BASE_DIR / "pages").glob("*.py") if p.name != "__init__.py"),
+]
+
+
+def import_lines(script: Path) -> list[str]:
+    tree = ast.parse(script.read_text(encoding="utf-8"))
+    lines = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+                continue
+            lines.append(ast.unparse(node))
+    return lines
+
+
+def db_snapshot() -> dict[str, int]:
+    if not DB_DIR.exists():
+        return {}
+    return {p.name: p.stat().st_mtime_ns for p in DB_DIR.iterdir()}
+
+
+def measure(script: Path | None) -> dict:
+    # script=None はインタプリタ起動分（site など）の基準値
+    code = "\n".join(import_lines(script)) if script else "pass"
+    env = dict(os.environ, PYTHONPATH=str(BASE_DIR))
+    before = db_snapshot()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    touched = db_snapshot() != before
+    if proc.returncode != 0:
+        raise RuntimeError(f"{script}: import failed\n{proc.stderr[-2000:]}")
+
+    modules = []
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cum_us, raw_name = line.replace("import time:", "|").split("|")
+        name = raw_name.strip()
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        modules.append((name, int(self_us), int(cum_us)))
+        if depth == 0:
+            total_us += int(cum_us)
+    top = sorted(modules, key=lambda m: m[2], reverse=True)[:8]
+    return {"total_ms": total_us / 1000, "top": top, "db_touched": touched}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--save", type=Path, default=None)
+    ap.add_argument("--compare", type=Path, default=None)
+    args = ap.parse_args()
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else {}
+    startup_ms = measure(None)["total_ms"]
+    print(f"(interpreter startup {startup_ms:.1f}ms is excluded)")
+
+    results = {}
+    for script in TARGETS:
+        name = str(script.relative_to(BASE_DIR))
+        r = measure(script)
+        total_ms = r["total_ms"] - startup_ms
+        results[name] = total_ms
+
+        delta = ""
+        if name in baseline:
+            delta = f"  (Δ {total_ms - baseline[name]:+.1f}ms)"
+        flag = "  [WARN] db/ touched on import" if r["db_touched"] else ""
+        print(f"{name:<28} {total_ms:8.1f}ms{delta}{flag}")
+        for mod, self_us, cum_us in r["top"][:5]:
+            print(f"    {cum_us / 1000:8.1f}ms cumulative  {self_us / 1000:7.1f}ms self  {mod}")
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"[OK] saved: {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+環境CSVの取り込み（パース → env_sample 書き込み）を並列数 --jobs ごとに比較する。
+
+data/inbox/env の実ファイルを --copies 回ずつ使い、一時DBに取り込む。
+並列にするのはパースだけで、書き込みは1トランザクション（app.core.ingest）。
+
+    python bench/bench_ingest.py --copies 8 --jobs 1 2 4
+
+各 jobs で env_sample の行数が同じになることも確認する（違えば終了コード 1）。
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+from app.core.ingest import default_jobs, ingest_files
+from app.core.ledger import file_signature
+from app.core.migrations import migrate
+from etl.import_env_csv import read_gl240_csv, write_env_file
+
+INBOX_DIR = BASE_DIR / "data" / "inbox" / "env"
+
+
+def make_entries(paths: list[Path], copies: int) -> list[dict]:
+    """台帳のハッシュ判定を通さず、同じファイルを別の取り込み対象として並べる。"""
+    entries = []
+    for i in range(copies):
+        for p in paths:
+            size, mtime_ns = file_signature(p)
+            entries.append({
+                "kind": "env", "path": str(p), "size": size, "mtime_ns": mtime_ns,
+                "content_hash": f"bench-{i}-{p.name}",
+            })
+    return entries
+
+
+def run_once(db: Path, entries: list[dict], jobs: int) -> tuple[float, int]:
+    engine = get_engine(db)
+    migrate(engine)
+    t0 = time.perf_counter()
+    ok, errors = ingest_files(engine, entries, partial(read_gl240_csv, farm="bench"), write_env_file, jobs=jobs)
+    elapsed = time.perf_counter() - t0
+    for path, err in errors:
+        print(f"  [ERROR] {Path(path).name}: {err}")
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT COUNT(*) FROM env_sample").scalar_one()
+    return elapsed, rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--copies", type=int, default=8, help="inbox のファイルを何回ずつ取り込むか")
+    ap.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    args = ap.parse_args()
+
+    paths = sorted(INBOX_DIR.glob("*.csv"))
+    if not paths:
+        sys.exit(f"{INBOX_DIR} に CSV がありません")
+    entries = make_entries(paths, args.copies)
+    print(f"files={len(entries)}  cpu={default_jobs()}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for jobs in args.jobs:
+            elapsed, rows = run_once(Path(tmp) / f"bench_j{jobs}.db", entries, jobs)
+            results[jobs] = rows
+            print(f"jobs={jobs:<3} {elapsed:8.2f} s  ({len(entries) / elapsed:6.1f} files/s, env_sample={rows} rows)")
+        dispose_engines()
+
+    if len(set(results.values())) != 1:
+        print(f"[parity] env_sample の行数が jobs ごとに違います: {results}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
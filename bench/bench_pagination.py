@@ -0,0 +1,108 @@
+"""
+ページ送りの遅延を OFFSET 方式とキーセット方式で比較する（深いページほど差が出る）。
+
+    python bench/bench_pagination.py --rows 500000 --page-size 25
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+from app.core.dims import decode_dims
+from app.core.migrations import migrate
+from app.core.pagination import keyset_page
+from app.core.queries import build_harvest_where
+
+
+# =========================
+# OFFSET 方式（比較用。Search/List はキーセット方式）
+# =========================
+def harvest_rows(conn: Connection, where: str, params: dict, limit: int, offset: int) -> pd.DataFrame:
+    """旧 Search/List のページ取得。並びは 日付 → 企業名 → 作物名 → id（keyset_page と同じ）。"""
+    sql = f"""
+    SELECT h.harvest_date, h.company_id, h.crop_id, h.amount_kg
+    FROM harvest_fact h
+    JOIN company_dim c ON c.company_id = h.company_id
+    JOIN crop_dim    k ON k.crop_id    = h.crop_id
+    {where}
+    ORDER BY h.harvest_date, c.name, k.name, h.id
+    LIMIT :limit OFFSET :offset
+    """
+    df = pd.read_sql_query(text(sql), conn, params={**params, "limit": int(limit), "offset": int(offset)})
+    df["harvest_date"] = pd.to_datetime(df["harvest_date"])
+    return decode_dims(conn, df)
+
+
+def build_db(path: Path, rows: int) -> None:
+    engine = get_engine(path)
+    migrate(engine)
+    rng = random.Random(0)
+    d0 = date(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO company_dim(name) VALUES (?)", [(f"企業{i:02d}",) for i in range(30)]
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO crop_dim(name) VALUES (?)", [(f"作物{i:02d}",) for i in range(20)]
+        )
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO harvest_fact(harvest_date, company_id, crop_id, amount_kg) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    (d0 + timedelta(days=rng.randrange(2000))).isoformat(),
+                    rng.randint(1, 30),
+                    rng.randint(1, 20),
+                    rng.randrange(1, 100000) / 1000,
+                )
+                for _ in range(rows)
+            ],
+        )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--page-size", type=int, default=25)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "bench.db"
+        build_db(db, args.rows)
+        engine = get_engine(db)
+        where, params = build_harvest_where()
+        max_page = args.rows // args.page_size
+        print(f"rows={args.rows} page_size={args.page_size}")
+
+        with engine.connect() as conn:
+            for page in (1, max_page // 10, max_page // 2, max_page - 1):
+                t0 = time.perf_counter()
+                harvest_rows(conn, where, params, limit=args.page_size, offset=(page - 1) * args.page_size)
+                t_offset = (time.perf_counter() - t0) * 1000
+
+                # 直前ページまで閲覧済み（境界キャッシュあり）の状態から「次 →」
+                boundaries: dict = {}
+                keyset_page(conn, where, params, page - 1 if page > 1 else 1, args.page_size, boundaries)
+                t0 = time.perf_counter()
+                keyset_page(conn, where, params, page, args.page_size, boundaries)
+                t_keyset = (time.perf_counter() - t0) * 1000
+
+                print(f"page {page:>7}: offset={t_offset:8.2f}ms  keyset(next)={t_keyset:8.2f}ms")
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+取り込みパーサ（app.common.parsers）の一致確認とベンチマーク。
+
+tests/legacy_parsers.py の旧実装（ETL版 / Upload版の 1行ずつ .apply() する関数）とサンプル値を使って、
+- 一致確認: data/inbox/harvest の実データ + 表記ゆれのサンプルで、新実装を旧実装（ETL版・Upload版）それぞれと比べる
+  （収量は列名の単位が g の場合。旧実装は列名を見ずに常に g とみなしていた）。
+  意図して結果を変えた値は INTENDED_*_DIFFS に旧実装ごとに理由付きで挙げる（tests/test_parsers.py も同じ表を使う）
+- 速度: 実データを --scale 倍に複製して、旧実装の .apply() と新実装を比べる
+
+    python bench/bench_parsers.py --scale 100
+
+一致しない値があれば一覧を出して終了コード 1 で終わる。
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.common.parsers import parse_amounts_kg, parse_harvest_dates
+from tests.legacy_parsers import (
+    AMOUNT_SAMPLES,
+    INTENDED_AMOUNT_DIFFS,
+    INTENDED_DATE_DIFFS,
+    SAMPLES,
+    legacy_etl_parse_amount_to_kg,
+    legacy_etl_parse_harvest_date,
+    legacy_upload_parse_amount_to_kg,
+    legacy_upload_parse_harvest_date,
+    load_inbox_column,
+    same,
+)
+
+
+# =========================
+# Parity / Bench
+# =========================
+def check_parity(values: pd.Series, new_fn, legacy_fn, intended: dict) -> list[tuple]:
+    """新実装が旧実装 legacy_fn と一致しない値を (値, 新, 旧) で返す。intended に挙げた値は除く。"""
+    uniq = pd.Series(values.dropna().unique(), dtype=object)
+    new = new_fn(uniq)
+    diffs = []
+    for v, got in zip(uniq, new):
+        old = legacy_fn(v)
+        if not same(got, old) and v not in intended:
+            diffs.append((v, got, old))
+    return diffs
+
+
+def timed(label: str, fn, n_rows: int) -> float:
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<32} {elapsed * 1000:10.1f} ms  ({n_rows / elapsed:,.0f} rows/s)")
+    return elapsed
+
+
+def run(label: str, values: pd.Series, samples: list, new_fn, legacy_fns: dict, intended: dict, scale: int) -> int:
+    values_all = pd.concat([values, pd.Series(samples, dtype=object)], ignore_index=True)
+    n_diffs = 0
+    for name, fn in legacy_fns.items():
+        diffs = check_parity(values_all, new_fn, fn, intended[name])
+        print(
+            f"[parity] {label} vs {name}: {values_all.nunique()} distinct values, "
+            f"{len(diffs)} mismatches ({len(intended[name])} intended differences)"
+        )
+        for v, got, old in diffs:
+            print(f"  {v!r}: new={got!r} {name}={old!r}")
+        n_diffs += len(diffs)
+
+    big = pd.concat([values] * scale, ignore_index=True)
+    print(f"[bench] {label} x{scale}: {len(big):,} rows")
+    t_new = timed("new", lambda: new_fn(big), len(big))
+    for name, fn in legacy_fns.items():
+        t_old = timed(f"legacy {name} .apply()", lambda: big.apply(fn), len(big))
+        print(f"  speedup vs {name}: x{t_old / t_new:.0f}")
+    return n_diffs
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", type=int, default=100, help="実データを何倍に複製するか")
+    args = ap.parse_args()
+
+    n_diffs = run(
+        "dates",
+        load_inbox_column(("収穫日", "日付", "harvest_date", "date")),
+        SAMPLES,
+        parse_harvest_dates,
+        {"etl": legacy_etl_parse_harvest_date, "upload": legacy_upload_parse_harvest_date},
+        INTENDED_DATE_DIFFS,
+        args.scale,
+    )
+    # 実データの収量列は文字列（"1,080"）と数値が混在するので、文字列として読んだ状態で比べる
+    n_diffs += run(
+        "amounts",
+        load_inbox_column(("収穫量（ｇ）", "収穫量")).astype(object),
+        AMOUNT_SAMPLES,
+        lambda v: parse_amounts_kg(v, "g"),
+        {"etl": legacy_etl_parse_amount_to_kg, "upload": legacy_upload_parse_amount_to_kg},
+        INTENDED_AMOUNT_DIFFS,
+        args.scale,
+    )
+
+    # 最悪ケース: 全行が異なる値（ユニーク値の変換が効かない）
+    n = 100_000 * max(1, args.scale // 100)
+    distinct = pd.Series(pd.date_range("2000-01-01", periods=n, freq="min").strftime("%Y/%m/%d %H:%M:%S"))
+    timed("dates, all distinct", lambda: parse_harvest_dates(distinct), n)
+    distinct = pd.Series([f"{i:,}" for i in range(n)], dtype=object)
+    timed("amounts, all distinct", lambda: parse_amounts_kg(distinct, "g"), n)
+
+    if n_diffs:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
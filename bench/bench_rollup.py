@@ -0,0 +1,157 @@
+"""
+Compass の集計（KPI・ランキング2種・日別推移）を harvest_fact と harvest_daily で比較する。
+
+    python bench/bench_rollup.py --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.core.db import dispose_engines, get_engine
+from app.core.dims import DIMS
+from app.core.migrations import migrate
+from app.core.queries import (
+    build_harvest_where,
+    daily_kpis,
+    daily_ranking,
+    daily_totals,
+)
+from app.core.rollup import refresh_harvest_daily
+
+
+# =========================
+# harvest_fact から直接集計する旧クエリ（比較用。Compass は harvest_daily を読む）
+# =========================
+def harvest_kpis(conn: Connection, where: str = "", params: dict | None = None) -> dict:
+    """件数・累計収量・日数・企業数・作物数（daily_kpis() と同じキー）。"""
+    sql = f"""
+    SELECT
+        COUNT(*)                         AS row_count,
+        COALESCE(SUM(h.amount_kg), 0.0)  AS total_kg,
+        COUNT(DISTINCT h.harvest_date)   AS days,
+        COUNT(DISTINCT h.company_id)     AS companies,
+        COUNT(DISTINCT h.crop_id)        AS crops
+    FROM harvest_fact h
+    {where}
+    """
+    return dict(conn.execute(text(sql), params or {}).mappings().one())
+
+
+def harvest_ranking(conn: Connection, col: str, where: str = "", params: dict | None = None) -> pd.DataFrame:
+    """企業別（col="company"）または作物別（col="crop"）の収量合計（降順）。"""
+    table, key = DIMS[col]
+    sql = f"""
+    SELECT d.name AS {col}, SUM(h.amount_kg) AS amount_kg
+    FROM harvest_fact h
+    JOIN {table} d ON d.{key} = h.{key}
+    {where}
+    GROUP BY h.{key}
+    ORDER BY amount_kg DESC
+    """
+    return pd.read_sql_query(text(sql), conn, params=params or {})
+
+
+def harvest_daily_totals(conn: Connection, where: str = "", params: dict | None = None) -> pd.DataFrame:
+    """日別の収量合計（harvest_day, amount_kg）。"""
+    sql = f"""
+    SELECT h.harvest_date AS harvest_day, SUM(h.amount_kg) AS amount_kg
+    FROM harvest_fact h
+    {where}
+    GROUP BY h.harvest_date
+    ORDER BY h.harvest_date
+    """
+    df = pd.read_sql_query(text(sql), conn, params=params or {})
+    df["harvest_day"] = pd.to_datetime(df["harvest_day"]).dt.date
+    return df
+
+
+def build_db(path: Path, rows: int, days: int) -> None:
+    engine = get_engine(path)
+    migrate(engine)
+    rng = random.Random(0)
+    d0 = date(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO company_dim(name) VALUES (?)", [(f"企業{i:02d}",) for i in range(15)])
+        conn.exec_driver_sql("INSERT INTO crop_dim(name) VALUES (?)", [(f"作物{i:02d}",) for i in range(10)])
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO harvest_fact(harvest_date, company_id, crop_id, amount_kg) VALUES (?, ?, ?, ?)",
+            [
+                ((d0 + timedelta(days=rng.randrange(days))).isoformat(), rng.randint(1, 15), rng.randint(1, 10), rng.randrange(1, 100000) / 1000)
+                for _ in range(rows)
+            ],
+        )
+        refresh_harvest_daily(conn)
+
+
+def timed(label: str, fn, repeat: int = 3) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"{label:<24} {best * 1000:9.1f} ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--days", type=int, default=730, help="データの日数（集計行数は 日数 × 15社 × 10品目 まで）")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "bench.db"
+        build_db(db, args.rows, args.days)
+        engine = get_engine(db)
+        with engine.connect() as conn:
+            n_daily = conn.exec_driver_sql("SELECT COUNT(*) FROM harvest_daily").scalar_one()
+        print(f"harvest_fact={args.rows} rows  harvest_daily={n_daily} rows")
+
+        cases = {
+            "all": ((), {}),
+            "6 months": (("2021-01-01", "2021-06-30"), {}),
+            "6 months x 3 companies": (("2021-01-01", "2021-06-30"), {"companies": ["企業01", "企業02", "企業03"]}),
+        }
+        for name, (dates, kw) in cases.items():
+            where, params = build_harvest_where(*dates, **kw)
+            where_d, params_d = build_harvest_where(*dates, **kw, date_col="day")
+
+            def from_fact():
+                with engine.connect() as conn:
+                    harvest_kpis(conn, where, params)
+                    harvest_ranking(conn, "company", where, params)
+                    harvest_ranking(conn, "crop", where, params)
+                    harvest_daily_totals(conn, where, params)
+
+            def from_daily():
+                with engine.connect() as conn:
+                    daily_kpis(conn, where_d, params_d)
+                    daily_ranking(conn, "company", where_d, params_d)
+                    daily_ranking(conn, "crop", where_d, params_d)
+                    daily_totals(conn, where_d, params_d)
+
+            print(f"-- {name}")
+            timed("harvest_fact", from_fact)
+            timed("harvest_daily", from_daily)
+
+        # 取り込み1回分（数日分）の増分更新コスト
+        with engine.begin() as conn:
+            timed("refresh 7 days", lambda: refresh_harvest_daily(conn, [f"2021-01-0{i}" for i in range(1, 8)]))
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+CSV の判定（app.common.sniff）に載せ替えた読み込みの一致確認とベンチマーク。
+
+旧実装（文字コード候補ごとにファイル全体を読み直す / 行ごとに正規表現で CH 行を探す）を
+このファイルに残しておき、data/inbox の全ファイルで
+- 一致確認: 収量ETL（parse_harvest_file）・GL240（read_gl240_csv）の結果、CSV Upload の列の割り当て
+- 速度: 判定 + 読み込みの所要時間（判定はキャッシュなしの初回）
+を比べる。
+
+    python bench/bench_sniff.py --repeat 5
+
+一致しないファイルがあれば一覧を出して終了コード 1 で終わる。
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import re
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.common.parsers import unit_from_header
+from app.common.sniff import _sniff_path, sniff_bytes
+from etl.import_env_csv import read_gl240_csv
+from etl.import_harvest_csv import parse_harvest_file
+
+HARVEST_DIR = BASE_DIR / "data" / "inbox" / "harvest"
+ENV_DIR = BASE_DIR / "data" / "inbox" / "env"
+
+
+# =========================
+# 旧実装（比較用。取り込み側からは削除済み）
+# =========================
+def legacy_parse_harvest_file(path: str) -> pd.DataFrame:
+    # etl/import_harvest_csv.py の旧 read_csv_with_fallback + detect_columns
+    p = Path(path)
+    df = None
+    for enc in ["utf-8-sig", "utf-8", "cp932", "utf-16le"]:
+        try:
+            df = pd.read_csv(p, encoding=enc)
+            break
+        except UnicodeDecodeError:
+            continue
+    df.columns = [str(c).strip() for c in df.columns]
+    col_date = col_company = col_crop = col_amount = None
+    for c in df.columns:
+        name = str(c)
+        if ("収穫日" in name) or ("日付" in name):
+            col_date = c
+        if ("企業名" in name) or ("会社名" in name):
+            col_company = c
+        if ("収穫野菜名" in name) or ("品目" in name) or ("作物" in name):
+            col_crop = c
+        if ("収穫量" in name) or ("ｇ" in name) or ("g" in name) or name.endswith("g") or ("量" in name):
+            col_amount = c
+    out = df[[col_date, col_company, col_crop, col_amount]].copy()
+    out.columns = ["c1", "c2", "c3", "c4"]
+    out["source_file"] = p.name
+    out["amount_unit"] = unit_from_header(col_amount)
+    return out.dropna(subset=["c1", "c2", "c3", "c4"])
+
+
+# etl/import_env_csv.py の旧 read_gl240_csv（そのまま）
+def legacy_read_gl240_csv(path: str, farm: str) -> pd.DataFrame:
+    """
+    GL240 の CSV を読み込み、env_raw 形式の DataFrame を返す。
+
+    - 文字コードを自動判別（utf-8-sig → utf-8 → utf-16le → cp932)
+    - 「CH1, CH2, …」を含む行をヘッダー行として採用
+    - 次行の No./単位行は読み込まれても後段で除去
+    """
+    p = Path(path)
+
+    # 1) エンコーディングとヘッダー行（CH行）を検出
+    enc_candidates = ["utf-8-sig", "utf-8", "utf-16le", "cp932"]
+    chosen_enc = None
+    ch_header_row = None
+
+    for enc in enc_candidates:
+        try:
+            with p.open(encoding=enc, errors="strict") as f:
+                for i, line in enumerate(f):
+                    # タブ・カンマをすべてカンマに正規化
+                    s = re.sub(r"[\t,]+", ",", line.strip(), flags=re.ASCII)
+                    if (
+                        re.search(r"\bCH\s*0*1\b", s, flags=re.IGNORECASE)
+                        and re.search(r"\bCH\s*0*2\b", s, flags=re.IGNORECASE)
+                    ):
+                        chosen_enc = enc
+                        ch_header_row = i
+                        break
+            if chosen_enc is not None:
+                break
+        except UnicodeDecodeError:
+            continue
+
+    if chosen_enc is None or ch_header_row is None:
+        raise ValueError(
+            "ヘッダー行（CH1, CH2 を含む行）が見つからないか、文字コード判定に失敗しました。"
+        )
+
+    # 2) 読み込み（カンマ/タブ両対応）
+    df = pd.read_csv(
+        p,
+        encoding=chosen_enc,
+        header=ch_header_row,
+        engine="python",
+        sep=r"[,\t]+",
+    )
+
+    # 3) 列名を正規化（空白・全角空白除去、 "CH 1"→"CH1")
+    df.columns = (
+        df.columns.astype(str)
+        .str.replace(r"\s+", "", regex=True)
+        .str.replace("　", "")   # 全角スペースも一応消しておく
+    )
+
+    # 4) 時刻列の特定
+    col_time = None
+
+    # 4-1) よくある英語・日本語パターンで探す
+    for c in df.columns:
+        lc = c.lower()
+        if lc in ("time", "時刻", "datetime", "日付時刻"):
+            col_time = c
+            break
+
+    # 4-2) "time" を含む列名を探す (Time, LogTime など)
+    if col_time is None:
+        for c in df.columns:
+            if "time" in c.lower():
+                col_time = c
+                break
+
+    # 4-3) 日本語パターン："日付" または "日時" または "時間" を含むもの
+    if col_time is None:
+        for c in df.columns:
+            if ("日付" in c) or ("日時" in c) or ("時間" in c):
+                col_time = c
+                break
+
+    # 4-4) それでも見つからない場合は「2列目を時刻扱い」にフォールバック
+    if col_time is None and len(df.columns) >= 2:
+        col_time = df.columns[1]
+
+    if col_time is None:
+        raise ValueError(f"時刻列が特定できません。列名:{list(df.columns)}")
+
+    # 5) CH1 ~ CH5 の列名を柔軟に特定
+    def find_ch(colnames, n: int):
+        pat1 = re.compile(rf"^ch[_\-]*0*{n}$", re.IGNORECASE)
+        pat2 = re.compile(rf"^ch[_\-]*0*{n}\b", re.IGNORECASE)
+        for name in colnames:
+            if pat1.match(name):
+                return name
+        for name in colnames:
+            if pat2.match(name):
+                return name
+        return None
+
+    ch1 = find_ch(df.columns, 1)
+    ch2 = find_ch(df.columns, 2)
+    ch3 = find_ch(df.columns, 3)
+    ch4 = find_ch(df.columns, 4)
+    ch5 = find_ch(df.columns, 5)
+
+    required = {"CH1": ch1, "CH2": ch2, "CH3": ch3, "CH4": ch4, "CH5": ch5}
+    if any(v is None for v in required.values()):
+        raise ValueError(f"CH1~CH5 の列が特定できません: {required}")
+
+    # 6) 必要列のみ抽出し、型を整える（単位行は NaT/NaN になり後で除去）
+    df = df[[col_time, ch1, ch2, ch3, ch4, ch5]].copy()
+    df[col_time] = pd.to_datetime(df[col_time], errors="coerce")
+    for c in [ch1, ch2, ch3, ch4, ch5]:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    # 7) 単位行などを除去
+    df = df.dropna(subset=[col_time])
+
+    # 8) 列名を標準化し、farm を付与
+    df = df.rename(
+        columns={
+            col_time: "ts",
+            ch1: "air_temp_c",
+            ch2: "rh_percent",
+            ch3: "sand_temp_c",
+            ch4: "water_content",
+            ch5: "irradiance_wm2",
+        }
+    )
+    df["farm"] = farm
+
+    # 9) 列順を整える
+    df = df[
+        [
+            "farm",
+            "ts",
+            "air_temp_c",
+            "rh_percent",
+            "sand_temp_c",
+            "water_content",
+            "irradiance_wm2",
+        ]
+    ]
+    return df
+
+
+LEGACY_UPLOAD_COL_MAP = {
+    "収穫日": "date", "日付": "date", "harvest_date": "date", "date": "date",
+    "企業名": "company", "会社名": "company", "企業": "company", "会社": "company", "company": "company",
+    "作物名": "crop", "収穫野菜名": "crop", "品目": "crop", "crop": "crop",
+    "収穫量（ｇ）": "amount", "収穫量(ｇ)": "amount", "収穫量": "amount", "量": "amount",
+    "収量(㎏)": "amount", "収量(kg)": "amount", "amount_g": "amount", "amount_kg": "amount",
+}
+
+
+def legacy_upload_roles(b: bytes) -> dict[str, str]:
+    # pages/3_csv_upload.py の旧 read_csv_bytes + COL_MAP（役割 -> 列名）
+    for params in (dict(encoding="utf-8-sig", sep=","), dict(encoding="cp932", sep=","), dict(encoding="cp932", sep=None, engine="python")):
+        try:
+            df = pd.read_csv(io.BytesIO(b), **params)
+            break
+        except Exception:
+            continue
+    roles = {}
+    for c in df.columns:
+        key = str(c).replace("﻿", "").replace("　", " ").strip()
+        mapped = LEGACY_UPLOAD_COL_MAP.get(key.lower()) or LEGACY_UPLOAD_COL_MAP.get(key)
+        if mapped:
+            roles[mapped] = key
+    return roles
+
+
+def upload_roles(b: bytes) -> dict[str, str]:
+    info = sniff_bytes(b[:64 * 1024])
+    return {r: info["columns"][i].strip() for r, i in info["roles"].items() if r in LEGACY_UPLOAD_COL_MAP.values()}
+
+
+# =========================
+# Parity / Bench
+# =========================
+def same_frame(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    try:
+        pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True), check_dtype=False)
+        return True
+    except AssertionError:
+        return False
+
+
+def timed(label: str, fn, paths: list[Path], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        _sniff_path.cache_clear()
+        t0 = time.perf_counter()
+        for p in paths:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    print(f"{label:<28} {best * 1000:9.1f} ms  ({len(paths)} files)")
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    # GL240 の時刻列の形式推定の警告（新旧とも同じ）は出さない
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    harvest = sorted(HARVEST_DIR.glob("*.csv"))
+    env = sorted(ENV_DIR.glob("*.csv"))
+    diffs = []
+    for p in harvest:
+        if not same_frame(parse_harvest_file(str(p)), legacy_parse_harvest_file(str(p))):
+            diffs.append(("harvest ETL", p.name))
+        new, old = upload_roles(p.read_bytes()), legacy_upload_roles(p.read_bytes())
+        if new != old:
+            diffs.append(("upload roles", f"{p.name}: new={new} legacy={old}"))
+    for p in env:
+        if not same_frame(read_gl240_csv(str(p), "bench"), legacy_read_gl240_csv(str(p), "bench")):
+            diffs.append(("GL240", p.name))
+    print(f"[parity] harvest={len(harvest)} env={len(env)} files, {len(diffs)} mismatches")
+    for kind, name in diffs:
+        print(f"  {kind}: {name}")
+
+    # 文字コードが utf-8 でないファイル（旧実装は utf-8 で全体を読んで失敗してから読み直す）
+    with tempfile.TemporaryDirectory() as tmp:
+        sjis = []
+        for p in harvest + env:
+            q = Path(tmp) / p.parent.name / p.name
+            q.parent.mkdir(exist_ok=True)
+            try:
+                q.write_bytes(p.read_text(encoding="utf-8-sig").encode("cp932", errors="replace"))
+            except UnicodeDecodeError:
+                q.write_bytes(p.read_bytes())  # 元から cp932
+            sjis.append(q)
+        h_sjis = [q for q in sjis if q.parent.name == "harvest"]
+        e_sjis = [q for q in sjis if q.parent.name == "env"]
+        for q in h_sjis:
+            if not same_frame(parse_harvest_file(str(q)), legacy_parse_harvest_file(str(q))):
+                diffs.append(("harvest ETL cp932", q.name))
+        for q in e_sjis:
+            if not same_frame(read_gl240_csv(str(q), "bench"), legacy_read_gl240_csv(str(q), "bench")):
+                diffs.append(("GL240 cp932", q.name))
+        print(f"[parity] cp932 copies: {len(diffs)} mismatches in total")
+        timings = [
+            ("harvest ETL", harvest, lambda p: parse_harvest_file(str(p)), lambda p: legacy_parse_harvest_file(str(p))),
+            ("harvest ETL cp932", h_sjis, lambda p: parse_harvest_file(str(p)), lambda p: legacy_parse_harvest_file(str(p))),
+            ("GL240", env, lambda p: read_gl240_csv(str(p), "bench"), lambda p: legacy_read_gl240_csv(str(p), "bench")),
+            ("GL240 cp932", e_sjis, lambda p: read_gl240_csv(str(p), "bench"), lambda p: legacy_read_gl240_csv(str(p), "bench")),
+        ]
+        for label, paths, new_fn, old_fn in timings:
+            t_new = timed(f"{label} (sniff)", new_fn, paths, args.repeat)
+            t_old = timed(f"{label} (legacy)", old_fn, paths, args.repeat)
+            print(f"  speedup x{t_old / t_new:.1f}")
+
+    if diffs:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,236 +1,239 @@
 from pathlib import Path
+import argparse
+import csv
+import itertools
 import sys
-import re
+import time
+from datetime import datetime
+from functools import partial
 import pandas as pd
 import numpy as np
-from sqlalchemy import text
 
 # ここでプロジェクトルートを import パスに追加
 BASE_DIR = Path(__file__).resolve().parents[1]
 if str(BASE_DIR) not in sys.path:
     sys.path.insert(0, str(BASE_DIR))
 
-from app.core.db import get_engine
+from app.common.sniff import column_roles, retry_encodings, sniff_file
+from app.core.db import get_engine, init_db
+from app.core.env_archive import read_env
+from app.core.env_rollup import ENV_ROLLUP_TABLES, rebuild_env_rollups, refresh_env_rollups
+from app.core.env_store import ENV_VALUE_COLUMNS, insert_env_samples, to_epoch
+from app.core.ingest import ingest_files
+from app.core.ledger import record_import, scan_inbox
+from app.core.versions import bump_versions
 engine = get_engine()
 
 DB_PATH = BASE_DIR / "db" / "heartful_dev.db"
 inbox_dir = BASE_DIR / "data" / "inbox" / "env"
 
-# ========= テーブル保証系 =========
-def ensure_env_raw_table() -> None:
-    """env_raw テーブルが無ければ作る（安全に再実行可）。"""
-    ddl = """
-    CREATE TABLE IF NOT EXISTS env_raw (
-      id               INTEGER PRIMARY KEY,
-      farm             TEXT NOT NULL,
-      ts               TEXT NOT NULL,        -- 'YYYY-MM-DD HH:MM[:SS]'
-      air_temp_c       REAL,                 -- CH1: 気温
-      rh_percent       REAL,                 -- CH2: 相対湿度(%)
-      sand_temp_c      REAL,                 -- CH3: 砂温
-      water_content    REAL,                 -- CH4: 含水率
-      irradiance_wm2   REAL                  -- CH5: 日射量(W/m2)
-    );
-    """
-    with engine.begin() as conn:
-        conn.exec_driver_sql(ddl)
+# ========= GL240 CSV → env_raw DataFrame =========
+# env_raw の列名（時刻, CH1 ~ CH5 の順）
+ENV_COLUMNS = ["ts", *ENV_VALUE_COLUMNS]
+# GL240 が書く時刻の書式（ロガーの設定・変換ソフトで2通りある）
+GL240_TS_FORMATS = ("%Y/%m/%d %H:%M", "%Y-%m-%d %H:%M:%S")
+
+
+def _gl240_positions(columns, roles: dict) -> list[int]:
+    """時刻列・CH1 ~ CH5 の列位置（ENV_COLUMNS の順）。"""
+    # 時刻列が見つからなければ2列目を時刻扱い
+    pos_time = roles.get("time", roles.get("date", 1))
+    if pos_time >= len(columns):
+        raise ValueError(f"時刻列が特定できません。列名:{list(columns)}")
+    required = {f"CH{n}": roles.get(f"ch{n}") for n in range(1, 6)}
+    if any(v is None for v in required.values()):
+        raise ValueError(f"CH1~CH5 の列が特定できません: {required}")
+    return [pos_time, *required.values()]
 
 
-def ensure_env_import_log_table() -> None:
-    """env_import_log テーブルが無ければ作る。"""
-    ddl = """
-    CREATE TABLE IF NOT EXISTS env_import_log (
-      id          INTEGER PRIMARY KEY,
-      path        TEXT NOT NULL UNIQUE,
-      imported_at TEXT NOT NULL              -- ISO8601 文字列
-    );
+def _gl240_data_start(p: Path, info: dict, pos_time: int) -> tuple[int, str] | None:
     """
-    with engine.begin() as conn:
-        conn.exec_driver_sql(ddl)
+    ヘッダー行の次の2行を見て (データの先頭行, 時刻の書式) を返す。
+    次行が No./単位行ならその次から。時刻が GL240_TS_FORMATS のどれでもなければ None。
+    """
+    first = info["header_row"] + 1
+    with open(p, encoding=info["encoding"], newline="") as f:
+        rows = list(itertools.islice(csv.reader(f, delimiter=info["delimiter"]), first, first + 2))
+    for offset, row in enumerate(rows):
+        if len(row) <= pos_time:
+            continue
+        for fmt in GL240_TS_FORMATS:
+            try:
+                datetime.strptime(row[pos_time].strip(), fmt)
+                return first + offset, fmt
+            except ValueError:
+                continue
+    return None
 
 
-def has_been_imported(path: Path) -> bool:
-    """指定パスのファイルが既に取り込まれているかを判定する。"""
-    sql = "SELECT 1 FROM env_import_log WHERE path = :path LIMIT 1;"
-    with engine.begin() as conn:
-        row = conn.execute(text(sql), {"path": str(path)}).fetchone()
-    return row is not None
+def _read_gl240_fast(p: Path, info: dict) -> pd.DataFrame | None:
+    """
+    C エンジンで必要な6列だけを読む。区切り文字・ヘッダー行・列位置は sniff の結果をそのまま使い、
+    単位行は位置で飛ばす。時刻の書式が想定外、または数値でない値があれば None（python エンジンで読み直す）。
+    """
+    positions = _gl240_positions(info["columns"], info["roles"])
+    start = _gl240_data_start(p, info, positions[0])
+    if start is None:
+        return None
+    data_row, ts_format = start
+
+    try:
+        df = pd.read_csv(
+            p,
+            encoding=info["encoding"],
+            sep=info["delimiter"],
+            engine="c",
+            header=None,
+            skiprows=data_row,
+            usecols=positions,
+            dtype={pos: ("str" if pos == positions[0] else "float64") for pos in positions},
+        )
+        # usecols は元の列順で返るので ENV_COLUMNS の順に並べ直す
+        df = df[positions].set_axis(ENV_COLUMNS, axis=1)
+        df["ts"] = pd.to_datetime(df["ts"].str.strip(), format=ts_format)
+    except (ValueError, pd.errors.ParserError):
+        return None
+    return df
 
 
-def mark_imported(path: Path) -> None:
-    """指定パスをインポート済みとしてログに記録する。"""
-    sql = """
-    INSERT OR IGNORE INTO env_import_log(path, imported_at)
-    VALUES(:path, datetime('now'));
+def _read_gl240_python(p: Path, info: dict) -> pd.DataFrame:
     """
-    with engine.begin() as conn:
-        # ★ ここは dict なので {"path": str(path)} が正しい
-        conn.execute(text(sql), {"path": str(path)})
+    python エンジン（カンマ/タブの連続を1つの区切りとみなす）で全列を読む。
+    時刻の書式が違う・数値でないセルがあるなど、_read_gl240_fast() で読めないファイル用。
+    """
+    df = pd.read_csv(
+        p,
+        encoding=info["encoding"],
+        header=info["header_row"],
+        engine="python",
+        sep=r"[,\t]+",
+    )
+
+    # 区切りの連続は1つに畳まれるので、列の位置は読み込んだ列名から取り直す
+    positions = _gl240_positions(df.columns, column_roles(df.columns))
+
+    # 必要列のみ抽出し、型を整える（単位行は NaT/NaN になり後で除去）
+    df = df.iloc[:, positions].set_axis(ENV_COLUMNS, axis=1)
+    df["ts"] = pd.to_datetime(df["ts"], errors="coerce")
+    for c in ENV_COLUMNS[1:]:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    # 単位行などを除去
+    return df.dropna(subset=["ts"])
 
 
-# ========= GL240 CSV → env_raw DataFrame =========
 def read_gl240_csv(path: str, farm: str) -> pd.DataFrame:
     """
     GL240 の CSV を読み込み、env_raw 形式の DataFrame を返す。
 
-    - 文字コードを自動判別（utf-8-sig → utf-8 → utf-16le → cp932)
-    - 「CH1, CH2, …」を含む行をヘッダー行として採用
-    - 次行の No./単位行は読み込まれても後段で除去
+    - 文字コード・区切り文字・ヘッダー行（CH1, CH2 を含む行）・列の役割は先頭だけ読んで判定（app.common.sniff）
+    - 通常は C エンジンで必要な6列だけを型指定で読む。読めなければ python エンジンで全列を読み直す
     """
     p = Path(path)
 
-    # 1) エンコーディングとヘッダー行（CH行）を検出
-    enc_candidates = ["utf-8-sig", "utf-8", "utf-16le", "cp932"]
-    chosen_enc = None
-    ch_header_row = None
-
-    for enc in enc_candidates:
-        try:
-            with p.open(encoding=enc, errors="strict") as f:
-                for i, line in enumerate(f):
-                    # タブ・カンマをすべてカンマに正規化
-                    s = re.sub(r"[\t,]+", ",", line.strip(), flags=re.ASCII)
-                    if (
-                        re.search(r"\bCH\s*0*1\b", s, flags=re.IGNORECASE)
-                        and re.search(r"\bCH\s*0*2\b", s, flags=re.IGNORECASE)
-                    ):
-                        chosen_enc = enc
-                        ch_header_row = i
-                        break
-            if chosen_enc is not None:
-                break
-        except UnicodeDecodeError:
-            continue
-
-    if chosen_enc is None or ch_header_row is None:
+    info = sniff_file(p)
+    if info["layout"] != "gl240":
         raise ValueError(
             "ヘッダー行（CH1, CH2 を含む行）が見つからないか、文字コード判定に失敗しました。"
         )
 
-    # 2) 読み込み（カンマ/タブ両対応）
-    df = pd.read_csv(
-        p,
-        encoding=chosen_enc,
-        header=ch_header_row,
-        engine="python",
-        sep=r"[,\t]+",
-    )
-
-    # 3) 列名を正規化（空白・全角空白除去、 "CH 1"→"CH1")
-    df.columns = (
-        df.columns.astype(str)
-        .str.replace(r"\s+", "", regex=True)
-        .str.replace("　", "")   # 全角スペースも一応消しておく
-    )
-
-    # 4) 時刻列の特定
-    col_time = None
-
-    # 4-1) よくある英語・日本語パターンで探す
-    for c in df.columns:
-        lc = c.lower()
-        if lc in ("time", "時刻", "datetime", "日付時刻"):
-            col_time = c
-            break
-
-    # 4-2) "time" を含む列名を探す (Time, LogTime など)
-    if col_time is None:
-        for c in df.columns:
-            if "time" in c.lower():
-                col_time = c
-                break
-
-    # 4-3) 日本語パターン："日付" または "日時" または "時間" を含むもの
-    if col_time is None:
-        for c in df.columns:
-            if ("日付" in c) or ("日時" in c) or ("時間" in c):
-                col_time = c
-                break
-
-    # 4-4) それでも見つからない場合は「2列目を時刻扱い」にフォールバック
-    if col_time is None and len(df.columns) >= 2:
-        col_time = df.columns[1]
-
-    if col_time is None:
-        raise ValueError(f"時刻列が特定できません。列名:{list(df.columns)}")
-
-    # 5) CH1 ~ CH5 の列名を柔軟に特定
-    def find_ch(colnames, n: int):
-        pat1 = re.compile(rf"^ch[_\-]*0*{n}$", re.IGNORECASE)
-        pat2 = re.compile(rf"^ch[_\-]*0*{n}\b", re.IGNORECASE)
-        for name in colnames:
-            if pat1.match(name):
-                return name
-        for name in colnames:
-            if pat2.match(name):
-                return name
-        return None
-
-    ch1 = find_ch(df.columns, 1)
-    ch2 = find_ch(df.columns, 2)
-    ch3 = find_ch(df.columns, 3)
-    ch4 = find_ch(df.columns, 4)
-    ch5 = find_ch(df.columns, 5)
+    def read(info: dict) -> pd.DataFrame:
+        df = _read_gl240_fast(p, info)
+        return df if df is not None else _read_gl240_python(p, info)
 
-    required = {"CH1": ch1, "CH2": ch2, "CH3": ch3, "CH4": ch4, "CH5": ch5}
-    if any(v is None for v in required.values()):
-        raise ValueError(f"CH1~CH5 の列が特定できません: {required}")
+    # 先頭だけでは文字コードを決めきれず途中で読めなくなったら、次の候補で判定し直して読み直す
+    info, df = retry_encodings(info, partial(sniff_file, p), read)
 
-    # 6) 必要列のみ抽出し、型を整える（単位行は NaT/NaN になり後で除去）
-    df = df[[col_time, ch1, ch2, ch3, ch4, ch5]].copy()
-    df[col_time] = pd.to_datetime(df[col_time], errors="coerce")
-    for c in [ch1, ch2, ch3, ch4, ch5]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
+    # farm を付与し、列順を整える
+    df.insert(0, "farm", farm)
+    return df
 
-    # 7) 単位行などを除去
-    df = df.dropna(subset=[col_time])
-
-    # 8) 列名を標準化し、farm を付与
-    df = df.rename(
-        columns={
-            col_time: "ts",
-            ch1: "air_temp_c",
-            ch2: "rh_percent",
-            ch3: "sand_temp_c",
-            ch4: "water_content",
-            ch5: "irradiance_wm2",
-        }
-    )
-    df["farm"] = farm
 
-    # 9) 列順を整える
-    df = df[
+# ========= CSV → env_raw 取り込み =========
+def split_env_overlap(conn, df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, int]]:
+    """
+    df のうち env_sample にまだ無い (farm, ts) の行と、件数 {new, overlap, conflict} を返す。
+    既存行はファイルの期間（farm ごとの最初〜最後の時刻）だけを読む（env_sample は主キーの範囲、アーカイブは該当月だけ）。
+    - overlap : 同じ時刻の行が既にあり、値も同じ（ファイル内の重複を含む）
+    - conflict: 同じ時刻の行が既にあるが値が違う（既存の行を残す）
+    """
+    df = df.dropna(subset=["ts"])
+    if df.empty:
+        return df, {"new": 0, "overlap": 0, "conflict": 0}
+    # 秒未満は env_sample に持たないので、突き合わせも秒単位
+    df = df.assign(epoch=to_epoch(df["ts"]).to_numpy())
+    spans = df.groupby("farm")["epoch"].agg(["min", "max"])
+    # 締めた月はアーカイブ（Parquet）にあるので、両方を合わせて読む
+    existing = pd.concat(
         [
-            "farm",
-            "ts",
-            "air_temp_c",
-            "rh_percent",
-            "sand_temp_c",
-            "water_content",
-            "irradiance_wm2",
-        ]
-    ]
-    return df
+            read_env(conn, [farm], pd.to_datetime(lo, unit="s"), pd.to_datetime(hi + 1, unit="s"))
+            for farm, (lo, hi) in spans.iterrows()
+        ],
+        ignore_index=True,
+    )
+    existing = existing.assign(epoch=to_epoch(existing["ts"]).to_numpy()).drop(columns="ts")
+
+    key = ["farm", "epoch"]
+    # (farm, epoch) ごとに残る行（既存があれば既存、無ければファイル内で最初の行）
+    kept = pd.concat([existing, df], ignore_index=True).drop_duplicates(key).set_index(key)
+    is_new = ~df.duplicated(key) & ~df.set_index(key).index.isin(existing.set_index(key).index)
+
+    rest = df[~is_new]
+    a = rest[ENV_VALUE_COLUMNS].to_numpy(dtype=float)
+    b = kept.loc[pd.MultiIndex.from_frame(rest[key]), ENV_VALUE_COLUMNS].to_numpy(dtype=float)
+    same = ((a == b) | (np.isnan(a) & np.isnan(b))).all(axis=1)
+
+    counts = {"new": int(is_new.sum()), "overlap": int(same.sum()), "conflict": int((~same).sum())}
+    return df[is_new].drop(columns="epoch"), counts
+
+
+def write_env_file(conn, entry: dict, df: pd.DataFrame, t0: float) -> None:
+    """パース済みの1ファイルのうち新しい時刻の行だけを env_sample に書き、台帳に記録する（書き込みは1本）。"""
+    df, counts = split_env_overlap(conn, df)
+    insert_env_samples(conn, df)
+    mark_env_partitions(conn, df)
+    record_import(conn, entry, len(df), time.perf_counter() - t0)
+    bump_versions(conn, "env_raw", "import_ledger")
+    print(
+        f"[OK] env_raw: 新規 {counts['new']} 行 / 重複 {counts['overlap']} 行 / "
+        f"値の食い違い {counts['conflict']} 行（既存を優先）: {Path(entry['path']).name}"
+    )
 
 
-# ========= CSV → env_raw 取り込み =========
-def import_env_csv(path: str, farm: str) -> None:
-    """CSV を env_raw に取り込み、ログも記録する。"""
-    ensure_env_raw_table()
-    ensure_env_import_log_table()
+def mark_env_partitions(conn, df: pd.DataFrame) -> None:
+    """df が触った (farm, 日付) を env_daily_dirty に記録する（refresh_env_daily() でその日だけ集計し直す）。"""
+    parts = df[["farm"]].assign(date=df["ts"].dt.strftime("%Y-%m-%d")).drop_duplicates()
+    if not parts.empty:
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO env_daily_dirty(farm, date) VALUES (?, ?)",
+            list(parts.itertuples(index=False, name=None)),
+        )
 
-    p = Path(path)
 
-    if has_been_imported(p):
-        print(f"[SKIP] すでに取り込み済み: {p}")
-        return
+def import_env_files(paths: list, farm: str, jobs: int = 1) -> list[tuple[str, str]]:
+    """
+    CSV 群を env_raw に取り込み、失敗したファイルの [(パス, エラー)] を返す。
 
-    df = read_gl240_csv(str(p), farm)
+    - 取り込み済みかどうかは内容ハッシュでまとめて判定する（app.core.ledger）
+    - jobs > 1 ならパースをプロセスプールで並列に行う（app.core.ingest）
+    - 書き込みは1トランザクション。ファイルごとに SAVEPOINT を切り、失敗したファイルだけ巻き戻す
+    """
+    init_db()
 
     with engine.begin() as conn:
-        df.to_sql("env_raw", conn, if_exists="append", index=False)
+        todo, skipped = scan_inbox(conn, "env", [Path(p) for p in paths])
+    for entry in skipped:
+        print(f"[SKIP] すでに取り込み済み: {entry['path']} ({entry['reason']})")
+
+    _, errors = ingest_files(engine, todo, partial(read_gl240_csv, farm=farm), write_env_file, jobs=jobs)
+    for path, err in errors:
+        print(f"[ERROR] {Path(path).name}: {err}")
+    return errors
 
-    mark_imported(p)
-    print(f"[OK] {len(df)} 行を env_raw に追加しました: {p.name}")
+
+def import_env_csv(path: str, farm: str) -> None:
+    """CSV を1つ env_raw に取り込む。"""
+    import_env_files([path], farm)
 
 
 # ========= VPD + 集計 / VIEW 再構築 =========
@@ -255,30 +258,10 @@ def add_vpd_column(
     return df
 
 
-def rebuild_env_daily_and_views() -> None:
-    """
-    env_raw から env_daily を再作成し、
-    env_monthly / v_harvest_env の VIEW を張り直す。
-    """
-    print("[INFO] env_daily / env_monthly / v_harvest_env を再構築する。")
-
-    with engine.begin() as conn:
-        # env_raw -> pandas
-        df_raw = pd.read_sql(
-            """
-            SELECT farm, ts, air_temp_c, rh_percent, sand_temp_c, water_content, irradiance_wm2
-            FROM env_raw;
-            """,
-            conn,
-            parse_dates=["ts"],
-        )
-
-    if df_raw.empty:
-        print("[WARN] env_raw にデータがありません。集計をスキップします。")
-        return
-
+def aggregate_env_daily(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """env_raw の行を (farm, 日付) ごとに平均し、VPD 列を付けて env_daily の形にする。"""
     # 日付列を作成
-    df_raw["date"] = df_raw["ts"].dt.date
+    df_raw = df_raw.assign(date=df_raw["ts"].dt.date)
 
     # 日単位集計
     df_daily = (
@@ -293,15 +276,69 @@ def rebuild_env_daily_and_views() -> None:
     )
 
     # VPD 列を追加
-    df_daily = add_vpd_column(
+    return add_vpd_column(
         df_daily,
         temp_col="mean_temp",
         rh_col="mean_humidity",
         vpd_col="vpd_kpa",
     )
 
-    # env_daily テーブルとして保存（毎回作り直し）
+
+def refresh_env_daily() -> int:
+    """
+    env_daily_dirty に記録された (farm, 日付) だけを env_sample / アーカイブから集計し直し、
+    env_daily のその日の行を置き換える（1トランザクション）。集計し直した日数を返す。
+    env_daily がまだ無ければ rebuild_env_daily_and_views() で全件作る（戻り値はその日数）。
+    """
+    with engine.begin() as conn:
+        row = conn.exec_driver_sql("SELECT type FROM sqlite_master WHERE name='env_daily';").fetchone()
+        if row is not None and row[0] == "table":
+            dirty = conn.exec_driver_sql("SELECT COUNT(*) FROM env_daily_dirty").scalar_one()
+            if dirty == 0:
+                print("[INFO] env_daily: 集計し直す日はありません。")
+                return 0
+
+            # 触った日を含む期間だけを farm ごとに読む（アーカイブ済みの月に遅れて届いた行があれば Parquet 側も）
+            dirty_days = pd.read_sql("SELECT farm, date FROM env_daily_dirty", conn, parse_dates=["date"])
+            frames = []
+            for farm, days in dirty_days.groupby("farm")["date"]:
+                df = read_env(conn, [farm], days.min(), days.max() + pd.Timedelta(days=1))
+                frames.append(df[df["ts"].dt.normalize().isin(days)])
+            df_raw = pd.concat(frames, ignore_index=True)
+            conn.exec_driver_sql(
+                "DELETE FROM env_daily WHERE (farm, date) IN (SELECT farm, date FROM env_daily_dirty);"
+            )
+            if not df_raw.empty:
+                aggregate_env_daily(df_raw).to_sql("env_daily", conn, if_exists="append", index=False)
+            # グラフ用の時間・日・月の集計は、触った日を含む月ごと作り直す
+            refresh_env_rollups(conn, dirty_days)
+            conn.exec_driver_sql("DELETE FROM env_daily_dirty;")
+            bump_versions(conn, "env_daily", *ENV_ROLLUP_TABLES)
+            print(f"[OK] env_daily: {dirty} 日分を集計し直しました。")
+            return dirty
+
+    return rebuild_env_daily_and_views()
+
+
+def rebuild_env_daily_and_views() -> int:
+    """
+    env_sample とアーカイブから env_daily を全件作り直し、
+    env_monthly / v_harvest_env の VIEW を張り直す。env_daily の行数を返す。
+    """
+    print("[INFO] env_daily / env_monthly / v_harvest_env を再構築する。")
+
+    # 読み込みから書き込みまで1トランザクション（途中で取り込まれた日の dirty を消さないため）
     with engine.begin() as conn:
+        # env_sample（当月）+ アーカイブ（締めた月の Parquet）-> pandas
+        df_raw = read_env(conn)
+
+        if df_raw.empty:
+            print("[WARN] env_raw にデータがありません。集計をスキップします。")
+            return 0
+
+        df_daily = aggregate_env_daily(df_raw)
+
+        # env_daily テーブルとして保存（毎回作り直し）
         # まず env_daily が view か table かを確認してから drop
         row = conn.exec_driver_sql(
             "SELECT type FROM sqlite_master WHERE name='env_daily';"
@@ -316,6 +353,9 @@ def rebuild_env_daily_and_views() -> None:
 
         # 改めて「テーブル」として作成
         df_daily.to_sql("env_daily", conn, if_exists="replace", index=False)
+        rebuild_env_rollups(conn, df_raw)
+        conn.exec_driver_sql("DELETE FROM env_daily_dirty;")
+        bump_versions(conn, "env_daily", *ENV_ROLLUP_TABLES)
 
         # env_monthly VIEW を再作成
         conn.exec_driver_sql("DROP VIEW IF EXISTS env_monthly;")
@@ -359,10 +399,16 @@ def rebuild_env_daily_and_views() -> None:
         )
 
     print("[OK] env_daily / env_monthly / v_harvest_env の再構築が完了しました。")
+    return len(df_daily)
 
 
 # ========= メイン処理 =========
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="GL240 の環境CSV（data/inbox/env）を env_raw に取り込む")
+    ap.add_argument("--jobs", type=int, default=1, help="CSV パースの並列数（プロセス数）")
+    ap.add_argument("--full", action="store_true", help="env_daily を取り込んだ日だけでなく全件作り直す")
+    args = ap.parse_args()
+
     if not inbox_dir.exists():
         raise FileNotFoundError(f"inbox ディレクトリがありません: {inbox_dir}")
 
@@ -379,15 +425,13 @@ if __name__ == "__main__":
     if not targets:
         raise FileNotFoundError(f"{inbox_dir} に対象となる CSV が見つかりません。")
 
-    print(f"{len(targets)} ファイルを取り込みます。")
+    print(f"{len(targets)} ファイルを確認します。")
 
-    for path in targets:
-        print(f"=== {path.name} ===")
-        try:
-            import_env_csv(str(path), "愛川C1")
-        except Exception as e:
-            print(f"[ERROR] {path.name}: {e}")
+    import_env_files(targets, "愛川C1", jobs=args.jobs)
 
-    # 取り込み後に集計と VIEW 再構築
-    rebuild_env_daily_and_views()
+    # 取り込み後に集計（通常は取り込んだ日だけ。--full なら全件と VIEW を作り直す）
+    if args.full:
+        rebuild_env_daily_and_views()
+    else:
+        refresh_env_daily()
 
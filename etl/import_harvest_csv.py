@@ -1,8 +1,9 @@
 from pathlib import Path
+import argparse
 import sys
-import re
+import time
+from functools import partial
 import pandas as pd
-from datetime import datetime, timedelta
 from sqlalchemy import text
 
 # --------------------
@@ -12,191 +13,83 @@ BASE_DIR = Path(__file__).resolve().parents[1]
 if str(BASE_DIR) not in sys.path:
     sys.path.insert(0, str(BASE_DIR))
 
-from app.core.db import get_engine
+from app.common.parsers import parse_amounts_kg, parse_harvest_dates, unit_from_header
+from app.common.sniff import retry_encodings, sniff_file
+from app.core.db import get_engine, init_db
+from app.core.dims import resolve_keys
+from app.core.ingest import ingest_files
+from app.core.ledger import record_import, scan_inbox
+from app.core.rollup import refresh_harvest_daily
+from app.core.staging import insert_harvest_rows
+from app.core.versions import bump_versions
 engine = get_engine()
 
 INBOX_DIR = BASE_DIR / "data" / "inbox" / "harvest"
-EXCEL_EPOCH = datetime(1899, 12, 30)
-
-df = df.dropna(subset=["harvest_date", "company", "crop", "amount_kg"])
-
-rows = [
-    r for r in df[[
-        "harvest_date", "company", "crop", "amount_kg", "source_file"
-    ]].to_dict("records")
-    if r.get("harvest_date") is not None
-]
 
 # --------------------
-# Schema
+# Import
 # --------------------
-def ensure_raw_csv_table():
-    sql = """
-    CREATE TABLE IF NOT EXISTS raw_csv (
-        c1 TEXT,         -- date raw
-        c2 TEXT,         -- company raw
-        c3 TEXT,         -- crop raw
-        c4 TEXT,         -- amount raw
-        source_file TEXT -- file name
-    );
+HARVEST_ROLES = ("date", "company", "crop", "amount")
+
+def parse_harvest_file(path: str) -> pd.DataFrame:
+    """収量CSVを1つ読み、raw_csv 形式（c1〜c4, source_file, amount_unit）で返す。ワーカープロセスで実行される。"""
+    p = Path(path)
+    # 文字コード・ヘッダー行・列の役割は先頭だけ読んで判定する（app.common.sniff）
+    info = sniff_file(p)
+    if info["layout"] != "harvest":
+        raise ValueError(f"header not detected: columns={info['columns']}")
+
+    def read(info: dict) -> pd.DataFrame:
+        return pd.read_csv(
+            p,
+            encoding=info["encoding"],
+            sep=info["delimiter"],
+            header=info["header_row"],
+            usecols=[info["roles"][r] for r in HARVEST_ROLES],
+        )
+
+    # 先頭だけでは文字コードを決めきれず途中で読めなくなったら、次の候補で判定し直して読み直す
+    info, df = retry_encodings(info, partial(sniff_file, p), read)
+    positions = [info["roles"][r] for r in HARVEST_ROLES]
+    # usecols は元の列順で返るので、役割の順に並べ直す
+    out = df[[df.columns[sorted(positions).index(i)] for i in positions]]
+    col_amount = out.columns[3]
+    out.columns = ["c1", "c2", "c3", "c4"]
+    out = out.assign(source_file=p.name, amount_unit=unit_from_header(col_amount))
+    return out.dropna(subset=["c1", "c2", "c3", "c4"])
+
+def write_raw_batch(c, entry: dict, out: pd.DataFrame, t0: float) -> None:
+    """パース済みの1ファイルを raw_csv に1バッチとして書き、台帳に記録する（書き込みは1本）。"""
+    name = Path(entry["path"]).name
+    # 1ファイル = 1バッチ。promote はウォーターマークより後ろのバッチだけを読む
+    out["batch_id"] = c.exec_driver_sql(
+        "INSERT INTO raw_csv_batch(source_file, row_count) VALUES (?, ?)", (name, len(out))
+    ).lastrowid
+    out.to_sql("raw_csv", c, if_exists="append", index=False)
+    record_import(c, entry, len(out), time.perf_counter() - t0)
+    bump_versions(c, "raw_csv", "raw_csv_batch", "import_ledger")
+    print(f"[OK] raw_csv loaded: {name} ({len(out)} rows)")
+
+def import_harvest_files(paths: list, jobs: int = 1) -> list[tuple[str, str]]:
     """
-    with engine.begin() as c:
-        c.execute(text(sql))
-
-def ensure_harvest_fact_table():
-    sql = """
-    CREATE TABLE IF NOT EXISTS harvest_fact (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        harvest_date TEXT NOT NULL,  -- YYYY-MM-DD
-        company      TEXT NOT NULL,
-        crop         TEXT NOT NULL,
-        amount_kg    REAL NOT NULL,
-        source_file  TEXT,
-        UNIQUE(harvest_date, company, crop, amount_kg, source_file)
-    );
+    CSV 群を raw_csv に読み込み、失敗したファイルの [(パス, エラー)] を返す。
+    jobs > 1 ならパースをプロセスプールで並列に行う（書き込みは1トランザクション + ファイルごとの SAVEPOINT）。
     """
-    with engine.begin() as c:
-        c.execute(text(sql))
+    init_db()
 
-def ensure_harvest_import_log_table():
-    sql = """
-    CREATE TABLE IF NOT EXISTS harvest_import_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        path TEXT NOT NULL UNIQUE,
-        imported_at TEXT NOT NULL
-    );
-    """
+    # 取り込み済み判定は内容ハッシュの台帳でまとめて行う（app.core.ledger）
     with engine.begin() as c:
-        c.execute(text(sql))
-
-def has_been_imported(path: Path) -> bool:
-    sql = "SELECT 1 FROM harvest_import_log WHERE path = :path LIMIT 1;"
-    with engine.begin() as c:
-        row = c.execute(text(sql), {"path": str(path)}).fetchone()
-    return row is not None
-
-def mark_imported(path: Path) -> None:
-    sql = """
-    INSERT OR IGNORE INTO harvest_import_log(path, imported_at)
-    VALUES(:path, datetime('now'));
-    """
-    with engine.begin() as c:
-        c.execute(text(sql), {"path": str(path)})
-
-# --------------------
-# Utils
-# --------------------
-ZEN_NUM  = str.maketrans("０１２３４５６７８９．，", "0123456789.,")
-ZEN_DATE = str.maketrans("０１２３４５６７８９／－", "0123456789/-")
-
-def parse_amount_to_kg(val) -> float | None:
-    """
-    量の正規化:
-    - "1,234" / "1234g" / "1234 g" -> 1.234 (kg)
-    - "1.2kg" -> 1.2 (kg)
-    - 全角数字/カンマ対応
-    """
-    if val is None:
-        return None
-    s = str(val).strip()
-    if not s:
-        return None
-
-    s = s.translate(ZEN_NUM)
-    s = re.sub(r"\s+", "", s)
-    s = s.replace(",", "")
-    s_low = s.lower()
-
-    # kg表記
-    if "kg" in s_low:
-        m = re.search(r"[-+]?\d*\.?\d+", s_low)
-        return float(m.group()) if m else None
-
-    # g表記 or 数字のみ
-    m = re.search(r"[-+]?\d*\.?\d+", s_low)
-    if not m:
-        return None
-    grams = float(m.group())
-    return grams / 1000.0
-
-def parse_harvest_date(val) -> str | None:
-    """
-    日付の正規化:
-    - "2025/8/18" "2025/08/18" "2025-8-18" "2025-08-18"
-    - 全角対応
-    - Excelシリアル(30000~60000程度)
-    """
-    if val is None:
-        return None
-    s = str(val).strip()
-    if not s:
-        return None
-
-    s = s.translate(ZEN_DATE)
-    s = re.sub(r"\s+", "", s)
-
-    # Excelシリアル
-    if s.isdigit():
-        n = int(s)
-        if 30000 <= n <= 60000:
-            return (EXCEL_EPOCH + timedelta(days=n)).date().isoformat()
-        return None
-
-    s2 = s.replace("/", "-")
-
-    # strict first
-    try:
-        return datetime.strptime(s2, "%Y-%m-%d").date().isoformat()
-    except ValueError:
-        pass
-
-    # pandas fallback
-    try:
-        dt = pd.to_datetime(s2, errors="raise")
-        return dt.date().isoformat()
-    except Exception:
-        return None
-
-# --------------------
-# CSV read + detect columns
-# --------------------
-ENC_CANDIDATES = ["utf-8-sig", "utf-8", "cp932", "utf-16le"]
-
-def read_csv_with_fallback(path: Path) -> pd.DataFrame:
-    last_err = None
-    for enc in ENC_CANDIDATES:
-        try:
-            return pd.read_csv(path, encoding=enc)
-        except UnicodeDecodeError as e:
-            last_err = e
-            continue
-    raise UnicodeDecodeError("unknown", b"", 0, 1, f"{path.name}: decode failed. last_err={last_err}")
-
-def detect_columns(df: pd.DataFrame):
-    df.columns = [str(c).strip() for c in df.columns]
-
-    col_date = col_company = col_crop = col_amount = None
-    for c in df.columns:
-        name = str(c)
-
-        if ("収穫日" in name) or ("日付" in name):
-            col_date = c
-        if ("企業名" in name) or ("会社名" in name):
-            col_company = c
-        if ("収穫野菜名" in name) or ("品目" in name) or ("作物" in name):
-            col_crop = c
-        if ("収穫量" in name) or ("ｇ" in name) or ("g" in name) or name.endswith("g") or ("量" in name):
-            col_amount = c
-
-    if any(v is None for v in [col_date, col_company, col_crop, col_amount]):
-        return None
-    return col_date, col_company, col_crop, col_amount
+        todo, skipped = scan_inbox(c, "harvest", [Path(p) for p in paths])
+    for entry in skipped:
+        print(f"[SKIP] already imported: {Path(entry['path']).name} ({entry['reason']})")
 
+    _, errors = ingest_files(engine, todo, parse_harvest_file, write_raw_batch, jobs=jobs)
+    for path, err in errors:
+        print(f"[ERROR] {Path(path).name}: {err}")
+    return errors
 
-# --------------------
-# Import
-# --------------------
-def import_all_csv():
+def import_all_csv(jobs: int = 1) -> list[tuple[str, str]]:
+    """inbox の未取り込みファイルを raw_csv に読み込み、失敗したファイルの [(パス, エラー)] を返す。"""
     if not INBOX_DIR.exists():
         raise FileNotFoundError(f"{INBOX_DIR} not found")
 
@@ -207,46 +100,65 @@ def import_all_csv():
     if not targets:
         raise FileNotFoundError("No CSV files found")
 
-    ensure_raw_csv_table()
-    ensure_harvest_import_log_table()
-
-    for p in targets:
-        if has_been_imported(p):
-            print(f"[SKIP] already imported: {p.name}")
-            continue
-
-        df = read_csv_with_fallback(p)
-        cols = detect_columns(df)
-        if cols is None:
-            raise ValueError(f"[ERROR] header not detected: {p.name} columns={list(df.columns)}")
-
-        col_date, col_company, col_crop, col_amount = cols
-
-        out = df[[col_date, col_company, col_crop, col_amount]].copy()
-        out = out.rename(columns={
-            col_date: "c1",
-            col_company: "c2",
-            col_crop: "c3",
-            col_amount: "c4",
-        })
-        out["source_file"] = p.name
-        out = out.dropna(subset=["c1", "c2", "c3", "c4"])
+    return import_harvest_files(targets, jobs=jobs)
 
-        with engine.begin() as c:
-            out.to_sql("raw_csv", c, if_exists="append", index=False)
-
-        mark_imported(p)
-        print(f"[OK] raw_csv loaded: {p.name} ({len(out)} rows)")
-
-def upsert_raw_to_harvest_fact() -> int:
-    ensure_harvest_fact_table()
-
-    df = pd.read_sql("SELECT c1,c2,c3,c4,source_file FROM raw_csv", engine)
+# --------------------
+# Promote (raw_csv -> harvest_fact)
+# --------------------
+WATERMARK_NAME = "raw_csv->harvest_fact"
+
+def get_watermark(c) -> int:
+    """harvest_fact に反映済みの最後の batch_id（未反映なら 0）。"""
+    row = c.exec_driver_sql("SELECT value FROM etl_watermark WHERE name = ?", (WATERMARK_NAME,)).fetchone()
+    return int(row[0]) if row else 0
+
+def set_watermark(c, batch_id: int) -> None:
+    c.exec_driver_sql(
+        """
+        INSERT INTO etl_watermark(name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value
+        """,
+        (WATERMARK_NAME, int(batch_id)),
+    )
 
-    df["harvest_date"] = df["c1"].apply(parse_harvest_date)
+def upsert_raw_to_harvest_fact(full: bool = False) -> int:
+    """
+    raw_csv の未反映バッチを harvest_fact に反映し、追加した行数を返す。
+    full=True ならウォーターマークを無視して raw_csv 全件を反映し直す
+    （harvest_fact は消さない。Upload 画面から登録した行があるため）。
+    """
+    init_db()
+
+    with engine.connect() as c:
+        after = 0 if full else get_watermark(c)
+        # 読み込み中に追加されたバッチは次回に回す
+        upto = c.exec_driver_sql("SELECT COALESCE(MAX(batch_id), 0) FROM raw_csv_batch").scalar_one()
+        if upto <= after:
+            print(f"[INFO] no new raw_csv batches (watermark={after})")
+            return 0
+        df = pd.read_sql(
+            text("""
+            SELECT c1,c2,c3,c4,source_file,amount_unit FROM raw_csv
+            WHERE batch_id > :after AND batch_id <= :upto
+            """),
+            c,
+            params={"after": after, "upto": upto},
+        )
+    print(f"[INFO] promoting raw_csv batches {after + 1}..{upto} ({len(df)} rows)")
+
+    df["harvest_date"] = parse_harvest_dates(df["c1"])
     df["company"] = df["c2"].astype(str).str.strip()
     df["crop"] = df["c3"].astype(str).str.strip()
-    df["amount_kg"] = df["c4"].apply(parse_amount_to_kg)
+
+    # 収量は取り込み時の列名の単位ごとにまとめて kg に変換（単位不明の旧データは g）
+    df["amount_unit"] = df["amount_unit"].fillna("g")
+    df["amount_kg"] = float("nan")
+    for unit, idx in df.groupby("amount_unit").groups.items():
+        df.loc[idx, "amount_kg"] = parse_amounts_kg(df.loc[idx, "c4"], unit)
+
+    unparsed = (df["c4"].notna() & df["amount_kg"].isna()).groupby(df["source_file"]).sum()
+    for name, n in unparsed[unparsed > 0].items():
+        print(f"[WARN] amount not parsed: {name} ({n} cells)")
 
     before = len(df)
     df = df.dropna(subset=["harvest_date", "company", "crop", "amount_kg"])
@@ -259,25 +171,35 @@ def upsert_raw_to_harvest_fact() -> int:
     if dropped:
         print(f"[WARN] dropped rows: {dropped}")
 
-    rows = df[["harvest_date", "company", "crop", "amount_kg", "source_file"]].to_dict("records")
-
-    sql = text("""
-    INSERT OR IGNORE INTO harvest_fact(harvest_date, company, crop, amount_kg, source_file)
-    VALUES(:harvest_date, :company, :crop, :amount_kg, :source_file)
-    """)
     with engine.begin() as c:
-        c.execute(sql, rows)
-
-    return len(rows)
+        inserted = skipped = 0
+        if not df.empty:
+            # company / crop を辞書キーに一括変換し、TEMP ステージング経由でまとめて登録
+            keyed = resolve_keys(c, df[["harvest_date", "company", "crop", "amount_kg", "source_file"]])
+            inserted, skipped = insert_harvest_rows(c, keyed)
+            if inserted:
+                # 触った日の日次集計を作り直し、参照側のキャッシュを無効化する
+                refresh_harvest_daily(c, keyed["harvest_date"])
+                bump_versions(c, "harvest_fact", "harvest_daily", "company_dim", "crop_dim")
+        # 反映とウォーターマーク更新は同じトランザクション（途中で落ちたら次回やり直し）
+        set_watermark(c, upto)
+
+    print(f"[OK] harvest_fact inserted: {inserted} rows, skipped (already present): {skipped} rows")
+    return inserted
 
 # --------------------
 # Main
 # --------------------
-def run():
-    import_all_csv()
-    added = upsert_raw_to_harvest_fact()
-    print(f"[OK] harvest_fact inserted (attempted): {added} rows")
+def run(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="収量CSV（data/inbox/harvest）を取り込み harvest_fact に反映する")
+    ap.add_argument("--full", action="store_true", help="反映済みのバッチも含め raw_csv 全件を反映し直す")
+    ap.add_argument("--jobs", type=int, default=1, help="CSV パースの並列数（プロセス数）")
+    args = ap.parse_args(argv)
+
+    errors = import_all_csv(jobs=args.jobs)
+    upsert_raw_to_harvest_fact(full=args.full)
+    if errors:
+        print(f"[WARN] {len(errors)} file(s) failed; fix them and run again")
 
 if __name__ == "__main__":
     run()
-
@@ -0,0 +1,184 @@
+"""
+inbox の監視（常駐）。data/inbox/harvest と data/inbox/env に置かれた CSV を数秒で取り込む。
+
+- 監視: interval 秒ごとに stat だけでファイル一覧を取り、サイズ・更新時刻が settle 秒変わらなければ「置き終わった」とみなす
+- 取り込み: 置き終わったファイルを最大 batch 個ずつ（マイクロバッチ）、各 ETL の取り込み関数で取り込む
+- 集計: 取り込んだ種類の集計だけを更新する
+    harvest -> raw_csv から harvest_fact へ反映（harvest_daily は触った日だけ作り直す）
+    env     -> 取り込んだ (farm, 日付) の env_daily だけ作り直す
+- 片付け: 取り込んだ（または取り込み済みだった）ファイルは data/archive/raw/<kind>/<yyyy-mm>/ に移し、
+  台帳のパスも付け替える。失敗したファイルは inbox に残し、中身が変わるまで再試行しない
+  （取り込み・集計で例外が出たバッチも同じ。ログに出して監視は続ける）
+
+    python etl/watch_inbox.py                 # 常駐（Ctrl+C で終了）
+    python etl/watch_inbox.py --once          # 今ある分だけ取り込んで終了（cron 用）
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.common.constants import RAW_ARCHIVE_DIR
+from app.core.db import init_db
+from app.core.ledger import file_signature, relocate
+from etl import import_env_csv, import_harvest_csv
+
+INBOX_DIR = BASE_DIR / "data" / "inbox"
+ARCHIVE_DIR = RAW_ARCHIVE_DIR
+KINDS = ("harvest", "env")
+DEFAULT_FARM = "愛川C1"
+ETL_MODULES = {"harvest": import_harvest_csv, "env": import_env_csv}
+
+
+# --------------------
+# Scan
+# --------------------
+def list_inbox(kind: str) -> list[Path]:
+    d = INBOX_DIR / kind
+    if not d.exists():
+        return []
+    return sorted(p for p in d.glob("*.csv") if p.is_file() and not p.name.endswith(":Zone.Identifier"))
+
+
+def ready_files(kind: str, seen: dict, failed: dict, settle: float) -> list[Path]:
+    """
+    置き終わったファイルを返す。seen: パス -> (サイズ, 更新時刻) を前回の一覧として更新する。
+    前回と同じサイズ・更新時刻で、更新から settle 秒たったものを「置き終わった」とみなす。
+    """
+    now_ns = time.time_ns()
+    ready = []
+    current = {}
+    for p in list_inbox(kind):
+        try:
+            sig = file_signature(p)
+        except FileNotFoundError:
+            continue  # 一覧を取った後に消えた
+        current[p] = sig
+        if failed.get(p) == sig:
+            continue  # 失敗したファイルは中身が変わるまで再試行しない
+        if seen.get(p) == sig and now_ns - sig[1] >= settle * 1e9:
+            ready.append(p)
+    seen.clear()
+    seen.update(current)
+    return ready
+
+
+# --------------------
+# Archive
+# --------------------
+def archive_path(kind: str, p: Path, today: date) -> Path:
+    """data/archive/raw/<kind>/<yyyy-mm>/<ファイル名>。同名があれば _1, _2 … を付ける。"""
+    d = ARCHIVE_DIR / kind / today.strftime("%Y-%m")
+    dest = d / p.name
+    n = 1
+    while dest.exists():
+        dest = d / f"{p.stem}_{n}{p.suffix}"
+        n += 1
+    return dest
+
+
+def archive(kind: str, paths: list[Path]) -> None:
+    today = date.today()
+    moves = []
+    for p in paths:
+        dest = archive_path(kind, p, today)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(p), dest)   # 同じファイルシステムなら rename（更新時刻も変わらない）
+        moves.append((p, dest))
+    if moves:
+        # 台帳のパスを移動先にしておくと、同じファイルが再び置かれても読まずに判定できる
+        with ETL_MODULES[kind].engine.begin() as conn:
+            relocate(conn, kind, moves)
+        print(f"[OK] archived {len(moves)} {kind} file(s) -> {moves[0][1].parent}")
+
+
+# --------------------
+# Ingest
+# --------------------
+def ingest(kind: str, paths: list[Path], jobs: int, farm: str) -> list[tuple[str, str]]:
+    """paths を取り込み、その種類の集計を更新する。失敗した [(パス, エラー)] を返す。"""
+    if kind == "harvest":
+        errors = import_harvest_csv.import_harvest_files(paths, jobs=jobs)
+        # 反映済みより後ろのバッチだけを harvest_fact へ（harvest_daily は触った日だけ）
+        import_harvest_csv.upsert_raw_to_harvest_fact()
+        return errors
+
+    errors = import_env_csv.import_env_files(paths, farm, jobs=jobs)
+    # 取り込んだ日の env_daily だけ作り直す（取り込み済みのファイルだけなら何もしない）
+    import_env_csv.refresh_env_daily()
+    return errors
+
+
+def poll_once(state: dict, args) -> int:
+    """1回分の監視。取り込みを試みたファイル数を返す。"""
+    n = 0
+    for kind in KINDS:
+        ready = ready_files(kind, state["seen"][kind], state["failed"][kind], args.settle)
+        for i in range(0, len(ready), args.batch):
+            batch = ready[i:i + args.batch]
+            t0 = time.perf_counter()
+            print(f"[INFO] {kind}: {len(batch)} file(s) ready")
+            try:
+                errors = dict(ingest(kind, batch, args.jobs, args.farm))
+            except Exception as e:
+                # 集計などで落ちても監視は止めない。バッチのファイルは inbox に残し、中身が変わるまで再試行しない
+                # （取り込めた分は台帳・raw_csv / env_daily_dirty に残っているので、次のバッチの集計で反映される）
+                print(f"[ERROR] {kind}: batch failed: {type(e).__name__}: {e}")
+                errors = {str(p.resolve()): f"{type(e).__name__}: {e}" for p in batch}
+            for p in batch:
+                if str(p.resolve()) in errors:
+                    try:
+                        state["failed"][kind][p] = file_signature(p)
+                    except OSError:
+                        # 取り込み中に消された・移されたファイルは覚えない（置き直されれば改めて取り込む）
+                        state["failed"][kind].pop(p, None)
+            try:
+                archive(kind, [p for p in batch if str(p.resolve()) not in errors])
+            except Exception as e:
+                # 移せなかったファイルは inbox に残る。次の監視で取り込み済みと判定され、移し直す
+                print(f"[ERROR] {kind}: archive failed: {type(e).__name__}: {e}")
+            print(f"[OK] {kind}: batch done in {time.perf_counter() - t0:.1f}s ({len(errors)} failed)")
+            n += len(batch)
+    return n
+
+
+def run(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="data/inbox を監視して CSV を取り込み、data/archive に移す")
+    ap.add_argument("--interval", type=float, default=1.0, help="監視間隔（秒）")
+    ap.add_argument("--settle", type=float, default=2.0, help="この秒数サイズ・更新時刻が変わらなければ置き終わったとみなす")
+    ap.add_argument("--batch", type=int, default=20, help="1回に取り込む最大ファイル数")
+    ap.add_argument("--jobs", type=int, default=1, help="CSV パースの並列数（プロセス数）")
+    ap.add_argument("--farm", default=DEFAULT_FARM, help="環境CSVの farm")
+    ap.add_argument("--once", action="store_true", help="今ある分だけ取り込んで終了する")
+    args = ap.parse_args(argv)
+
+    init_db()
+    state = {"seen": {k: {} for k in KINDS}, "failed": {k: {} for k in KINDS}}
+    print(f"[INFO] watching {INBOX_DIR}/{{{','.join(KINDS)}}} (interval={args.interval}s, settle={args.settle}s)")
+
+    if args.once:
+        # 置き終わり判定に2回分の一覧が要るので、settle 秒あけてもう一度見る
+        for kind in KINDS:
+            ready_files(kind, state["seen"][kind], state["failed"][kind], args.settle)
+        time.sleep(args.settle)
+        poll_once(state, args)
+        return
+
+    try:
+        while True:
+            poll_once(state, args)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("[INFO] stopped")
+
+
+if __name__ == "__main__":
+    run()
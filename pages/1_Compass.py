@@ -4,11 +4,21 @@ from __future__ import annotations
 from datetime import date
 import pandas as pd
 import streamlit as st
-from sqlalchemy.exc import SQLAlchemyError
 
 from app.core.auth import require_login
 from app.common.constants import DB_PATH
+from app.core.cache import cached, data_version
 from app.core.db import get_engine, init_db
+from app.core.queries import (
+    build_harvest_where,
+    daily_kpis,
+    daily_ranking,
+    daily_totals,
+    harvest_bounds,
+    harvest_options,
+)
+from app.core.layout import cache_caption, pager
+from app.core.pagination import keyset_page
 
 
 # =========================
@@ -21,51 +31,58 @@ st.caption("収量の全体傾向をざっくりつかむダッシュボード")
 # ログイン必須（UIは出しつつ、未ログインならここで止める）
 require_login()
 
-# DB初期化（CREATE TABLE IF NOT EXISTS までやる想定）
+# DB初期化（マイグレーション適用。プロセス内で初回のみ実行される）
 init_db()
 
 
 # =========================
 # Helpers
 # =========================
-def get_db_mtime() -> float:
-    return DB_PATH.stat().st_mtime if DB_PATH.exists() else 0.0
+# 各クエリは 条件 + 参照テーブルの更新カウンタ をキーに共有キャッシュする（app.core.cache）。
+# 絞り込み・集計は SQL 側（app.core.queries）で行う。
+# 生データ表以外は日次集計 harvest_daily を読む（行数に比例しない）。
+@cached("harvest_fact")
+def load_bounds():
+    with get_engine().connect() as conn:
+        return harvest_bounds(conn)
+
+
+@cached("harvest_daily", "company_dim", "crop_dim")
+def load_options(date_start: date, date_end: date) -> tuple[list[str], list[str]]:
+    where, params = build_harvest_where(date_start, date_end, date_col="day")
+    with get_engine().connect() as conn:
+        return (
+            harvest_options(conn, "company", where, params, source="harvest_daily"),
+            harvest_options(conn, "crop", where, params, source="harvest_daily"),
+        )
 
 
-@st.cache_data(show_spinner=False)
-def load_harvest_df(db_mtime: float) -> pd.DataFrame:
-    """DB更新時刻(db_mtime)をキーにキャッシュ無効化する"""
-    engine = get_engine()
-    sql = """
-    SELECT
-        harvest_date,
-        company,
-        crop,
-        amount_kg
-    FROM harvest_fact
-    ORDER BY harvest_date, company, crop
-    """
-    df = pd.read_sql_query(sql, engine)
+@cached("harvest_daily", "company_dim", "crop_dim")
+def load_summary(date_start: date, date_end: date, companies: tuple, crops: tuple):
+    """KPI・ランキング・日別推移をまとめて取得する"""
+    where, params = build_harvest_where(date_start, date_end, companies, crops, date_col="day")
+    with get_engine().connect() as conn:
+        return (
+            daily_kpis(conn, where, params),
+            daily_ranking(conn, "company", where, params),
+            daily_ranking(conn, "crop", where, params),
+            daily_totals(conn, where, params),
+        )
 
-    # normalize
-    df["harvest_date"] = pd.to_datetime(df["harvest_date"], errors="coerce")
-    df["amount_kg"] = pd.to_numeric(df["amount_kg"], errors="coerce")
-    df["company"] = df["company"].astype(str).str.strip()
-    df["crop"] = df["crop"].astype(str).str.strip()
 
-    df = df.dropna(subset=["harvest_date", "amount_kg", "company", "crop"])
-    df = df[(df["company"] != "") & (df["crop"] != "")]
-    return df
+def load_page(date_start: date, date_end: date, companies: tuple, crops: tuple, page: int, page_size: int, boundaries: dict) -> pd.DataFrame:
+    # キーセットページングは1ページ分しか読まないのでキャッシュしない
+    where, params = build_harvest_where(date_start, date_end, companies, crops)
+    with get_engine().connect() as conn:
+        return keyset_page(conn, where, params, page, page_size, boundaries)
 
 
 # =========================
 # Load
 # =========================
-mtime = get_db_mtime()
-
 try:
     with st.spinner("収量データを読み込んでいます..."):
-        df = load_harvest_df(mtime)
+        bounds = load_bounds()
 except Exception as e:
     # テーブル未作成/DBパス不整合/SQLエラーなどはここに来る
     st.info("まず CSV Upload でデータを登録してください。")
@@ -73,7 +90,7 @@ except Exception as e:
     st.exception(e)
     st.stop()
 
-if df.empty:
+if bounds is None:
     st.info("harvest_fact にデータがありません。CSV Upload で登録してください。")
     st.stop()
 
@@ -81,9 +98,7 @@ if df.empty:
 # =========================
 # Derived columns
 # =========================
-df["harvest_day"] = df["harvest_date"].dt.date
-df_min = df["harvest_day"].min()
-df_max = df["harvest_day"].max()
+df_min, df_max = bounds
 st.caption(f"DBデータ範囲: {df_min} ~ {df_max}")
 
 
@@ -107,8 +122,8 @@ if date_start > date_end:
     st.error("開始日が終了日より後になっています。")
     st.stop()
 
-df_period = df[(df["harvest_day"] >= date_start) & (df["harvest_day"] <= date_end)].copy()
-if df_period.empty:
+all_companies, all_crops = load_options(date_start, date_end)
+if not all_companies:
     st.info("この期間にはデータがありません。別の期間を選んでください。")
     st.stop()
 
@@ -118,22 +133,16 @@ if df_period.empty:
 # =========================
 st.subheader("企業・作物フィルタ")
 
-all_companies = sorted(df_period["company"].unique().tolist())
-all_crops = sorted(df_period["crop"].unique().tolist())
-
 c1, c2 = st.columns(2)
 with c1:
     selected_companies = st.multiselect("企業（未選択＝全件）", options=all_companies, default=[])
 with c2:
     selected_crops = st.multiselect("作物（未選択＝全件）", options=all_crops, default=[])
 
-filtered = df_period
-if selected_companies:
-    filtered = filtered[filtered["company"].isin(selected_companies)]
-if selected_crops:
-    filtered = filtered[filtered["crop"].isin(selected_crops)]
+filter_key = (date_start, date_end, tuple(selected_companies), tuple(selected_crops))
+kpi, df_company, df_crop, df_daily = load_summary(*filter_key)
 
-if filtered.empty:
+if kpi["row_count"] == 0:
     st.warning("選択された条件に該当するデータがありません。フィルターを調整してください。")
     st.stop()
 
@@ -143,10 +152,10 @@ if filtered.empty:
 # =========================
 st.subheader("🚀 KPI概要")
 
-total_kg = float(filtered["amount_kg"].sum())
-days = int(filtered["harvest_day"].nunique())
-companies = int(filtered["company"].nunique())
-crops = int(filtered["crop"].nunique())
+total_kg = float(kpi["total_kg"])
+days = int(kpi["days"])
+companies = int(kpi["companies"])
+crops = int(kpi["crops"])
 avg_per_day = total_kg / days if days else 0.0
 
 k1, k2, k3 = st.columns(3)
@@ -159,20 +168,10 @@ k3.metric("企業数 / 作物数", f"{companies} 社 / {crops} 品目")
 # Rankings
 # =========================
 st.subheader("企業別収量ランキング")
-df_company = (
-    filtered.groupby("company", as_index=False)["amount_kg"]
-    .sum()
-    .sort_values("amount_kg", ascending=False)
-)
 top_n_company = st.slider("表示する企業数（TopN）", 5, 50, 10, 5)
 st.dataframe(df_company.head(top_n_company), use_container_width=True)
 
 st.subheader("作物別収量ランキング")
-df_crop = (
-    filtered.groupby("crop", as_index=False)["amount_kg"]
-    .sum()
-    .sort_values("amount_kg", ascending=False)
-)
 top_n_crop = st.slider("表示する作物数（TopN）", 5, 50, 10, 5)
 st.dataframe(df_crop.head(top_n_crop), use_container_width=True)
 
@@ -181,11 +180,6 @@ st.dataframe(df_crop.head(top_n_crop), use_container_width=True)
 # Charts
 # =========================
 st.subheader("日別収量の推移")
-df_daily = (
-    filtered.groupby("harvest_day", as_index=False)["amount_kg"]
-    .sum()
-    .sort_values("harvest_day")
-)
 st.line_chart(df_daily, x="harvest_day", y="amount_kg")
 
 st.subheader("企業別収量（合計）")
@@ -199,24 +193,12 @@ st.subheader("生データ（harvest_fact）")
 show_cols = ["harvest_day", "company", "crop", "amount_kg"]
 
 page_size = st.selectbox("生データの表示件数", [25, 50, 100, 200], index=0)
-max_page = max(1, (len(filtered) + page_size - 1) // page_size)
-
-if "compass_page" not in st.session_state:
-    st.session_state["compass_page"] = 1
-
-p1, p2, p3 = st.columns([1, 2, 1])
-with p1:
-    if st.button("← 前", use_container_width=True) and st.session_state["compass_page"] > 1:
-        st.session_state["compass_page"] -= 1
-with p2:
-    st.write(f"ページ {st.session_state['compass_page']} / {max_page}")
-with p3:
-    if st.button("次 →", use_container_width=True) and st.session_state["compass_page"] < max_page:
-        st.session_state["compass_page"] += 1
 
-start = (st.session_state["compass_page"] - 1) * page_size
-end = start + page_size
+sig = f"{data_version('harvest_fact')}|{filter_key}|{page_size}"
+page, boundaries = pager("compass", int(kpi["row_count"]), page_size, sig)
 
-view = filtered[show_cols].sort_values(["harvest_day", "company", "crop"]).iloc[start:end]
-st.dataframe(view, use_container_width=True)
+view = load_page(*filter_key, page, page_size, boundaries)
+view["harvest_day"] = view["harvest_date"].dt.date
+st.dataframe(view[show_cols], use_container_width=True)
 
+cache_caption()
@@ -1,13 +1,19 @@
 # pages/2_Search_list.py
 from __future__ import annotations
 
+from functools import partial
+
 import pandas as pd
 import streamlit as st
-from sqlalchemy.exc import SQLAlchemyError
 
 from app.core.auth import require_login
 from app.common.constants import DB_PATH
+from app.core.cache import cached, data_version
 from app.core.db import get_engine, init_db
+from app.core.layout import cache_caption, pager
+from app.core.pagination import keyset_page
+from app.core.export import EXPORT_FORMATS, EXPORT_MAX_ROWS, export_harvest
+from app.core.queries import build_harvest_where, harvest_bounds, harvest_count, harvest_options
 
 
 # =========================
@@ -24,50 +30,53 @@ init_db()
 # =========================
 # Helpers
 # =========================
-def get_db_mtime() -> float:
-    return DB_PATH.stat().st_mtime if DB_PATH.exists() else 0.0
-
-
-@st.cache_data(show_spinner=False)
-def load_harvest_df(db_mtime: float) -> pd.DataFrame:
-    engine = get_engine()
-    sql = """
-    SELECT
-        harvest_date,
-        company,
-        crop,
-        amount_kg
-    FROM harvest_fact
-    ORDER BY harvest_date, company, crop
-    """
-    df = pd.read_sql_query(sql, engine)
-
-    # normalize
-    df["harvest_date"] = pd.to_datetime(df["harvest_date"], errors="coerce")
-    df["amount_kg"] = pd.to_numeric(df["amount_kg"], errors="coerce")
-    df["company"] = df["company"].astype(str).str.strip()
-    df["crop"] = df["crop"].astype(str).str.strip()
-
-    df = df.dropna(subset=["harvest_date", "amount_kg", "company", "crop"])
-    df = df[(df["company"] != "") & (df["crop"] != "")]
-    return df
+# 絞り込みは SQL 側（app.core.queries）で行い、該当行だけを取得する
+# 件数・選択肢は参照テーブルの更新カウンタをキーに共有キャッシュする（app.core.cache）
+@cached("harvest_fact", "company_dim", "crop_dim")
+def load_filters():
+    with get_engine().connect() as conn:
+        return (
+            harvest_bounds(conn),
+            harvest_options(conn, "company"),
+            harvest_options(conn, "crop"),
+        )
+
+
+@cached("harvest_fact", "company_dim", "crop_dim")
+def load_hit_count(date_start, date_end, companies: tuple, crops: tuple) -> int:
+    where, params = build_harvest_where(date_start, date_end, companies, crops)
+    with get_engine().connect() as conn:
+        return harvest_count(conn, where, params)
+
+
+def load_page(date_start, date_end, companies: tuple, crops: tuple, page: int, page_size: int, boundaries: dict) -> pd.DataFrame:
+    # キーセットページングは1ページ分しか読まないのでキャッシュしない
+    where, params = build_harvest_where(date_start, date_end, companies, crops)
+    with get_engine().connect() as conn:
+        return keyset_page(conn, where, params, page, page_size, boundaries)
+
+
+def build_export(fmt: str, date_start, date_end, companies: tuple, crops: tuple) -> bytes:
+    # ダウンロードボタンが押されたときだけ呼ばれる（DBカーソルからチャンクで書き出す）
+    # st.download_button はファイルを渡しても bytes に読み切って保持するので、行数の上限で大きさを抑える
+    where, params = build_harvest_where(date_start, date_end, companies, crops)
+    with export_harvest(get_engine(), fmt, where, params, limit=EXPORT_MAX_ROWS) as f:
+        return f.read()
 
 
 # =========================
 # Load
 # =========================
-mtime = get_db_mtime()
-
 try:
     with st.spinner("収量データを読み込んでいます..."):
-        df = load_harvest_df(mtime)
+        bounds, all_companies, all_crops = load_filters()
 except Exception as e:
     st.info("まだデータがありません。CSV Upload から登録してください。")
     st.caption(f"DB_PATH={DB_PATH} exists={DB_PATH.exists()}")
     st.exception(e)
     st.stop()
 
-if df.empty:
+if bounds is None:
     st.info("まだデータがありません。CSV Upload から登録してください。")
     st.stop()
 
@@ -77,8 +86,7 @@ if df.empty:
 # =========================
 st.subheader("検索条件")
 
-min_date = df["harvest_date"].min().date()
-max_date = df["harvest_date"].max().date()
+min_date, max_date = bounds
 
 date_start, date_end = st.date_input(
     "対象期間",
@@ -87,9 +95,6 @@ date_start, date_end = st.date_input(
     max_value=max_date,
 )
 
-all_companies = sorted(df["company"].unique().tolist())
-all_crops = sorted(df["crop"].unique().tolist())
-
 c1, c2 = st.columns(2)
 with c1:
     company_filter = st.multiselect("企業（未選択なら全件）", options=all_companies, default=[])
@@ -100,17 +105,8 @@ with c2:
 # =========================
 # Apply filters
 # =========================
-filtered = df[
-    (df["harvest_date"].dt.date >= date_start)
-    & (df["harvest_date"].dt.date <= date_end)
-].copy()
-
-if company_filter:
-    filtered = filtered[filtered["company"].isin(company_filter)]
-if crop_filter:
-    filtered = filtered[filtered["crop"].isin(crop_filter)]
-
-hit_count = len(filtered)
+filter_key = (date_start, date_end, tuple(company_filter), tuple(crop_filter))
+hit_count = load_hit_count(*filter_key)
 
 st.markdown("### 🔍 検索結果")
 st.write(f"ヒット件数: **{hit_count} 件**")
@@ -125,52 +121,32 @@ if hit_count == 0:
 # =========================
 page_size = st.selectbox("表示件数", [25, 50, 100, 200], index=0)
 
-if "page" not in st.session_state:
-    st.session_state["page"] = 1
+# フィルタ条件・表示件数・DBが変わったらページを1に戻す
+sig = f"{data_version('harvest_fact')}|{filter_key}|{page_size}"
+page, boundaries = pager("search", hit_count, page_size, sig)
 
-# フィルタ条件が変わったらページを1に戻す
-sig = (
-    f"{date_start}|{date_end}|"
-    + "|".join(company_filter)
-    + "|"
-    + "|".join(crop_filter)
-    + f"|{page_size}|{hit_count}"
-)
-if st.session_state.get("_sig") != sig:
-    st.session_state["_sig"] = sig
-    st.session_state["page"] = 1
-
-max_page = max(1, (hit_count + page_size - 1) // page_size)
-
-col_prev, col_mid, col_next = st.columns([1, 2, 1])
-with col_prev:
-    if st.button("← 前", use_container_width=True) and st.session_state["page"] > 1:
-        st.session_state["page"] -= 1
-with col_mid:
-    st.write(f"ページ {st.session_state['page']} / {max_page}")
-with col_next:
-    if st.button("次 →", use_container_width=True) and st.session_state["page"] < max_page:
-        st.session_state["page"] += 1
-
-start = (st.session_state["page"] - 1) * page_size
-end = start + page_size
-
-view = filtered.sort_values(["harvest_date", "company", "crop"]).iloc[start:end]
+view = load_page(*filter_key, page, page_size, boundaries)
 st.dataframe(view, use_container_width=True)
 
 
 # =========================
-# CSV download
+# Download（ボタン押下時にだけ生成）
 # =========================
-csv_bytes = (
-    filtered.sort_values(["harvest_date", "company", "crop"])
-    .to_csv(index=False)
-    .encode("utf-8-sig")
-)
-st.download_button(
-    label="検索結果をCSVでダウンロード",
-    data=csv_bytes,
-    file_name="harvest_search_result.csv",
-    mime="text/csv",
+export_fmt = st.radio(
+    "ダウンロード形式",
+    list(EXPORT_FORMATS),
+    format_func={"csv": "CSV", "csv.gz": "CSV（gzip圧縮）", "parquet": "Parquet"}.get,
+    horizontal=True,
 )
-
+ext, mime = EXPORT_FORMATS[export_fmt]
+if hit_count > EXPORT_MAX_ROWS:
+    st.warning(f"ダウンロードは {EXPORT_MAX_ROWS:,} 件までです。期間・企業・作物で絞り込んでください。")
+else:
+    st.download_button(
+        label="検索結果をダウンロード",
+        data=partial(build_export, export_fmt, *filter_key),
+        file_name=f"harvest_search_result.{ext}",
+        mime=mime,
+    )
+
+cache_caption()
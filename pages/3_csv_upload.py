@@ -1,17 +1,17 @@
 from __future__ import annotations
 
-import io
 import os
-import re
-from datetime import datetime, timedelta
 
 import pandas as pd
 import streamlit as st
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import text
 
+from app.common.parsers import parse_amounts_kg, parse_harvest_dates, unit_from_header
+from app.common.sniff import SNIFF_BYTES, normalize_name, retry_encodings, sniff_bytes
 from app.core.auth import require_login
 from app.core.db import get_engine, init_db
+from app.core.rollup import refresh_harvest_daily
+from app.core.staging import UPLOAD_STATUSES, classify_upload, commit_upload, discard_upload, stage_upload, upload_rows
+from app.core.versions import bump_versions
 from app.common.constants import DB_PATH
 
 st.set_page_config(page_title="CSV Upload", layout="wide")
@@ -32,108 +32,34 @@ st.caption("収量データCSVをアップロードして harvest_fact に登録
 st.caption(f"DB_PATH={DB_PATH} exists={os.path.exists(DB_PATH)}")
 
 # ---------- helpers ----------
-ZEN_NUM = str.maketrans("０１２３４５６７８９．，", "0123456789.,")
-EXCEL_EPOCH = datetime(1899, 12, 30)
-
-def parse_amount_to_kg(val) -> float | None:
-    if val is None:
-        return None
-    s = str(val).strip()
-    if not s:
-        return None
-    s = s.translate(ZEN_NUM).replace(",", "")
-    s_low = s.lower()
-    m = re.search(r"[-+]?\d*\.?\d+", s_low)
-    if not m:
-        return None
-    x = float(m.group())
-    if "kg" in s_low:
-        return x
-    # g想定
-    return x / 1000.0
-
-def parse_harvest_date(val) -> str | None:
-    if val is None:
-        return None
-    s = str(val).strip()
-    if not s:
-        return None
-
-    # Excelシリアル
-    if s.isdigit():
-        n = int(s)
-        if 30000 <= n <= 60000:
-            return (EXCEL_EPOCH + timedelta(days=n)).date().isoformat()
-
-    for fmt in ("%Y/%m/%d", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"):
-        try:
-            return datetime.strptime(s, fmt).date().isoformat()
-        except ValueError:
-            pass
-
-    dt = pd.to_datetime(s, errors="coerce")
-    if pd.isna(dt):
-        return None
-    return dt.date().isoformat()
-
-def read_csv_bytes(b: bytes) -> tuple[pd.DataFrame, str]:
-    candidates = [
-        ("utf-8-sig", dict(encoding="utf-8-sig", sep=",")),
-        ("cp932", dict(encoding="cp932", sep=",")),
-        ("cp932_auto", dict(encoding="cp932", sep=None, engine="python")),
-    ]
-    last = []
-    for label, params in candidates:
-        try:
-            buf = io.BytesIO(b)
-            return pd.read_csv(buf, **params), label
-        except Exception as e:
-            last.append(f"{label}: {e}")
-    raise RuntimeError("CSV decode failed:\n" + "\n".join(last))
-
-def ensure_table():
-    ddl = """
-    CREATE TABLE IF NOT EXISTS harvest_fact (
-        id           INTEGER PRIMARY KEY AUTOINCREMENT,
-        harvest_date TEXT NOT NULL,
-        company      TEXT NOT NULL,
-        crop         TEXT NOT NULL,
-        amount_kg    REAL NOT NULL
-    );
+CHUNK_ROWS = 20_000       # 1回に解析・ステージングする行数（メモリ使用量はこれで決まる）
+ROLE_LABELS = {"date": "収穫日", "company": "企業名", "crop": "作物名", "amount": "収穫量"}
+
+def normalize_chunk(df: pd.DataFrame, amount_unit: str, first_row_no: int) -> pd.DataFrame:
     """
-    eng = get_engine()
-    with eng.begin() as conn:
-        conn.exec_driver_sql(ddl)
-
-def norm_col(x: str) -> str:
-    return str(x).replace("\ufeff", "").replace("　", " ").strip().lower()
-
-COL_MAP = {
-    "収穫日": "harvest_date",
-    "日付": "harvest_date",
-    "harvest_date": "harvest_date",
-    "date": "harvest_date",
-
-    "企業名": "company",
-    "会社名": "company",
-    "企業": "company",
-    "会社": "company",
-    "company": "company",
-
-    "作物名": "crop",
-    "収穫野菜名": "crop",
-    "品目": "crop",
-    "crop": "crop",
-
-    "収穫量（ｇ）": "amount_g",
-    "収穫量(ｇ)": "amount_g",
-    "収穫量": "amount_g",
-    "量": "amount_g",
-    "収量(㎏)": "amount_kg",
-    "収量(kg)": "amount_kg",
-    "amount_g": "amount_g",
-    "amount_kg": "amount_kg",
-}
+    チャンク（列は 収穫日, 企業名, 作物名, 収穫量 の順）を
+    upload_stage の形（row_no, harvest_date, company, crop, amount_kg, raw）にする。
+    """
+    src = df.reset_index(drop=True)
+    df = src.set_axis(["harvest_date", "company", "crop", "amount"], axis=1)
+    staged = pd.DataFrame({
+        "row_no": range(first_row_no, first_row_no + len(df)),
+        "harvest_date": parse_harvest_dates(df["harvest_date"]),
+        # 空欄は "nan" にせず欠損のまま（invalid になる）
+        "company": df["company"].astype("string").str.strip(),
+        "crop": df["crop"].astype("string").str.strip(),
+        # 単位は列名で決まる。セルに g / kg があればそちらを優先
+        "amount_kg": parse_amounts_kg(df["amount"], amount_unit),
+    })
+    # 不正な行だけ元の値を残す（プレビューで理由が分かるように）
+    invalid = (
+        staged[["harvest_date", "company", "crop", "amount_kg"]].isna().any(axis=1)
+        | staged["company"].eq("").fillna(False)
+        | staged["crop"].eq("").fillna(False)
+    )
+    staged["raw"] = None
+    staged.loc[invalid, "raw"] = [" / ".join(map(str, r)) for r in src[invalid].itertuples(index=False)]
+    return staged
 
 # ---------- UI ----------
 uploaded = st.file_uploader("収量CSVを選択", type=["csv"])
@@ -141,83 +67,120 @@ if uploaded is None:
     st.info("CSVを選択してください。")
     st.stop()
 
-raw_df, mode = read_csv_bytes(uploaded.getvalue())
-st.success(f"CSV読み込み成功 (mode={mode})")
-st.write("検出列:", list(raw_df.columns))
-
-# ---------- normalize columns ----------
-rename = {}
-for c in raw_df.columns:
-    key = norm_col(c)
-    mapped = COL_MAP.get(key) or COL_MAP.get(str(c).replace("\ufeff", "").replace("　", " ").strip())
-    if mapped:
-        rename[c] = mapped
-
-df = raw_df.rename(columns=rename)
-
-required = {"harvest_date", "company", "crop"}
-if not required.issubset(df.columns):
-    st.error(f"必須列が不足しています: {required - set(df.columns)}")
-    st.write("正規化後の列:", [norm_col(x) for x in raw_df.columns])
-    st.stop()
-
-# amount_kg 作成
-if "amount_kg" in df.columns:
-    df["amount_kg"] = df["amount_kg"].apply(parse_amount_to_kg)
-elif "amount_g" in df.columns:
-    df["amount_kg"] = df["amount_g"].apply(parse_amount_to_kg)
-else:
-    st.error("収量列が見つかりません（amount_g/amount_kg が必要）")
-    st.stop()
-
-df["harvest_date"] = df["harvest_date"].apply(parse_harvest_date)
-df["company"] = df["company"].astype(str).str.strip()
-df["crop"] = df["crop"].astype(str).str.strip()
-
-df = df.dropna(subset=["harvest_date", "company", "crop", "amount_kg"])
-df = df[(df["company"] != "") & (df["crop"] != "")]
-df = df[["harvest_date", "company", "crop", "amount_kg"]].copy()
-
-st.markdown("### プレビュー（登録対象）")
-st.dataframe(df.head(30), use_container_width=True)
-
-if df.empty:
-    st.warning("有効データがありません。CSV内容を確認してください。")
+eng = get_engine()
+upload_id = uploaded.file_id
+stage = st.session_state.get("upload_stage")
+
+# 解析・ステージングはアップロード1回につき1回だけ（再実行のたびに CSV を読み直さない）
+# ファイルは CHUNK_ROWS 行ずつ読み、解析したチャンクを upload_stage に書いてから次を読む
+if stage is None or stage["upload_id"] != upload_id:
+    # 文字コード・区切り文字・ヘッダー行・列の役割は先頭だけ読んで判定する（app.common.sniff）
+    head = uploaded.read(SNIFF_BYTES)
+    info = sniff_bytes(head)
+    uploaded.seek(0)
+    columns, roles = info["columns"], info["roles"]
+
+    missing = [label for role, label in ROLE_LABELS.items() if role != "amount" and role not in roles]
+    if missing:
+        st.error(f"必須列が不足しています: {missing}")
+        st.write("正規化後の列:", [normalize_name(x) for x in columns])
+        st.stop()
+
+    if "amount" not in roles:
+        st.error("収量列が見つかりません（収穫量 / 収量 / amount_g / amount_kg のいずれかが必要）")
+        st.stop()
+
+    total_bytes = max(uploaded.size, 1)
+    progress = st.progress(0.0, text="CSV を解析しています...")
+
+    def stage_chunks(info: dict) -> int:
+        """
+        info の文字コード・区切りで CSV を CHUNK_ROWS 行ずつ読み、upload_stage に書く。書いた行数を返す。
+        書き込みはチャンクごとの短いトランザクションで行い、読み込み・解析の間は書き込みロックを持たない
+        （大きな CSV でも ETL・inbox 監視の書き込みを待たせない）。
+        """
+        positions = [info["roles"][role] for role in ROLE_LABELS]
+        # 収量の単位は列名で決まる（"収穫量（ｇ）" -> g, "収量(kg)" -> kg。単位なしは g）
+        amount_unit = unit_from_header(info["columns"][info["roles"]["amount"]])
+        # usecols は元の列順で返るので、役割の順に並べ直す
+        order = [sorted(positions).index(i) for i in positions]
+        # 文字コードを変えて読み直すときは、途中まで書いた分を消してから（upload_id ごとに消せる）
+        with eng.begin() as conn:
+            discard_upload(conn, upload_id)
+        uploaded.seek(0)
+        n_rows = 0
+        for chunk in pd.read_csv(
+            uploaded, chunksize=CHUNK_ROWS, encoding=info["encoding"], sep=info["delimiter"],
+            header=info["header_row"], usecols=positions, dtype=str,
+        ):
+            staged = normalize_chunk(chunk.iloc[:, order], amount_unit, n_rows + 1)
+            with eng.begin() as conn:
+                stage_upload(conn, upload_id, staged)
+            n_rows += len(chunk)
+            progress.progress(min(uploaded.tell() / total_bytes, 1.0), text=f"{n_rows:,} 行を解析しました")
+        return n_rows
+
+    if stage is not None:
+        with eng.begin() as conn:
+            discard_upload(conn, stage["upload_id"])
+    try:
+        # 先頭だけでは文字コードを決めきれず途中で読めなくなったら、次の候補で判定し直して読み直す
+        info, _ = retry_encodings(info, lambda enc: sniff_bytes(head, enc), stage_chunks)
+    except Exception:
+        # チャンクごとにコミットしているので、途中まで書いた分はここで消す
+        with eng.begin() as conn:
+            discard_upload(conn, upload_id)
+        raise
+    progress.progress(1.0, text="重複を確認しています...")
+    with eng.begin() as conn:
+        counts = classify_upload(conn, upload_id)
+    progress.empty()
+
+    stage = {"upload_id": upload_id, "mode": f"{info['encoding']}, sep={info['delimiter']!r}", "columns": info["columns"], "counts": counts}
+    st.session_state["upload_stage"] = stage
+
+st.success(f"CSV読み込み成功 (mode={stage['mode']})")
+st.write("検出列:", stage["columns"])
+
+# ---------- preview ----------
+counts = stage["counts"]
+st.markdown("### プレビュー")
+for col, (status, label) in zip(st.columns(len(UPLOAD_STATUSES)), UPLOAD_STATUSES.items()):
+    col.metric(label.split("（")[0], f"{counts[status]} 件")
+
+with eng.connect() as conn:
+    tabs = st.tabs([f"{label}: {counts[status]}" for status, label in UPLOAD_STATUSES.items()])
+    for tab, status in zip(tabs, UPLOAD_STATUSES):
+        with tab:
+            rows = upload_rows(conn, upload_id, status)
+            if status != "invalid":
+                rows = rows.drop(columns=["raw"])
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+            if counts[status] > len(rows):
+                st.caption(f"先頭 {len(rows)} 件を表示しています。")
+
+if counts["new"] == 0:
+    st.warning("新規に登録できる行がありません。CSV内容を確認してください。")
     st.stop()
 
 result_box = st.container()
 
-if st.button("この内容でDBに登録", type="primary"):
-    ensure_table()
-    eng = get_engine()
-
-    rows = df.to_dict(orient="records")
-
-    sql = """
-    INSERT OR IGNORE INTO harvest_fact
-    (harvest_date, company, crop, amount_kg)
-    VALUES (:harvest_date, :company, :crop, :amount_kg)
-    """
-
+if st.button(f"新規 {counts['new']} 件をDBに登録", type="primary"):
     try:
         with eng.begin() as conn:
-            # 登録前件数
-            before_n = conn.execute(text("SELECT COUNT(*) FROM harvest_fact")).scalar_one()
-
-            # 一括登録（重複は無視）
-            conn.execute(text(sql), rows)
-
-            # 登録後件数
-            after_n = conn.execute(text("SELECT COUNT(*) FROM harvest_fact")).scalar_one()
-
-        inserted = after_n - before_n
-        skipped = len(rows) - inserted
+            # 新規の行だけを登録（登録済み・重複・不正な行は登録しない）
+            inserted, skipped, days = commit_upload(conn, upload_id)
+            if inserted:
+                # 触った日の日次集計を作り直し、参照側のキャッシュを無効化する（同じトランザクション内）
+                refresh_harvest_daily(conn, days)
+                bump_versions(conn, "harvest_fact", "harvest_daily", "company_dim", "crop_dim")
+        del st.session_state["upload_stage"]
 
         with result_box:
-            st.success(f"登録処理が完了しました。追加: {inserted}件 / スキップ: {skipped}件（重複など）")
+            st.success(f"登録処理が完了しました。追加: {inserted}件")
 
             if skipped > 0:
-                st.info("スキップ理由：同一キー（harvest_date, company, crop, amount_kg）が既にDBに存在するためです。")
+                st.info(f"プレビューの後に同じ行が登録されていたため {skipped}件をスキップしました。")
 
             st.info(
                 "🔄 登録内容を確認するには、左メニューから **Compass** または **Search / List** ページを開き直してください。\n"
@@ -228,4 +191,3 @@ if st.button("この内容でDBに登録", type="primary"):
         with result_box:
             st.error("DB登録に失敗しました。")
             st.exception(e)
-
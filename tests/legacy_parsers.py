@@ -0,0 +1,193 @@
+"""
+取り込みパーサの旧実装（ETL版 / Upload版の 1行ずつ .apply() する関数）と、一致確認に使うサンプル値。
+
+app.common.parsers に置き換える前の実装をそのまま残してある（取り込み側からは削除済み）。
+tests/test_parsers.py の一致確認と、bench/bench_parsers.py の一致確認・速度比較の両方がこのモジュールを使う。
+意図して結果を変えた値は INTENDED_*_DIFFS に旧実装ごとに理由付きで挙げる。
+"""
+from __future__ import annotations
+
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+INBOX_DIR = BASE_DIR / "data" / "inbox" / "harvest"
+ENC_CANDIDATES = ["utf-8-sig", "utf-8", "cp932", "utf-16le"]
+
+
+# =========================
+# 旧実装
+# =========================
+EXCEL_EPOCH = datetime(1899, 12, 30)
+ZEN_DATE = str.maketrans("０１２３４５６７８９／－", "0123456789/-")
+ZEN_NUM = str.maketrans("０１２３４５６７８９．，", "0123456789.,")
+
+
+def legacy_etl_parse_harvest_date(val) -> str | None:
+    # etl/import_harvest_csv.py の旧 parse_harvest_date
+    if val is None:
+        return None
+    s = str(val).strip()
+    if not s:
+        return None
+
+    s = s.translate(ZEN_DATE)
+    s = re.sub(r"\s+", "", s)
+
+    if s.isdigit():
+        n = int(s)
+        if 30000 <= n <= 60000:
+            return (EXCEL_EPOCH + timedelta(days=n)).date().isoformat()
+        return None
+
+    s2 = s.replace("/", "-")
+
+    try:
+        return datetime.strptime(s2, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        pass
+
+    try:
+        dt = pd.to_datetime(s2, errors="raise")
+        return dt.date().isoformat()
+    except Exception:
+        return None
+
+
+def legacy_upload_parse_harvest_date(val) -> str | None:
+    # pages/3_csv_upload.py の旧 parse_harvest_date
+    if val is None:
+        return None
+    s = str(val).strip()
+    if not s:
+        return None
+
+    if s.isdigit():
+        n = int(s)
+        if 30000 <= n <= 60000:
+            return (EXCEL_EPOCH + timedelta(days=n)).date().isoformat()
+
+    for fmt in ("%Y/%m/%d", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            pass
+
+    dt = pd.to_datetime(s, errors="coerce")
+    if pd.isna(dt):
+        return None
+    return dt.date().isoformat()
+
+
+def legacy_etl_parse_amount_to_kg(val) -> float | None:
+    # etl/import_harvest_csv.py の旧 parse_amount_to_kg
+    if val is None:
+        return None
+    s = str(val).strip()
+    if not s:
+        return None
+
+    s = s.translate(ZEN_NUM)
+    s = re.sub(r"\s+", "", s)
+    s = s.replace(",", "")
+    s_low = s.lower()
+
+    if "kg" in s_low:
+        m = re.search(r"[-+]?\d*\.?\d+", s_low)
+        return float(m.group()) if m else None
+
+    m = re.search(r"[-+]?\d*\.?\d+", s_low)
+    if not m:
+        return None
+    grams = float(m.group())
+    return grams / 1000.0
+
+
+def legacy_upload_parse_amount_to_kg(val) -> float | None:
+    # pages/3_csv_upload.py の旧 parse_amount_to_kg
+    if val is None:
+        return None
+    s = str(val).strip()
+    if not s:
+        return None
+    s = s.translate(ZEN_NUM).replace(",", "")
+    s_low = s.lower()
+    m = re.search(r"[-+]?\d*\.?\d+", s_low)
+    if not m:
+        return None
+    x = float(m.group())
+    if "kg" in s_low:
+        return x
+    return x / 1000.0
+
+
+# =========================
+# Data
+# =========================
+# 旧実装が対応していた表記と、境界の値
+SAMPLES = [
+    "2025/8/18", "2025/08/18", "2025-8-18", "2025-08-18", " 2025/8/18 ",
+    "２０２５／８／１８", "２０２５－０８－１８",
+    "2025/08/18 10:30:00", "2025-08-18 10:30:00", "2025/8/18 7:05",
+    "2025-08-18 00:00:00+09:00", "20250818", "Aug 18 2025",
+    "2025/8/18 25:00", "2025/8/18 10:61", "2025/08/18 23:59:60",
+    "45933", "30000", "60000", "29999", "60001", "12345", "20251301",
+    "2025/2/30", "2025/13/1", "abc", "", "  ",
+]
+AMOUNT_SAMPLES = [
+    "1,234", "1234", "1234g", "1234 g", "1.2kg", "1.2 KG", "１，２３４", "１２０ｇ", "１．５kg",
+    "1 234", "-20", "+300", ".5kg", "0", "abc", "", "g",
+]
+
+# 旧実装と結果が違うことを意図している値（旧実装ごと。値 -> 理由）
+INTENDED_DATE_DIFFS = {
+    "etl": {
+        "2025/08/18 10:30:00": "旧ETLは空白を消してから読むので時刻付きを読めなかった",
+        "2025-08-18 10:30:00": "旧ETLは空白を消してから読むので時刻付きを読めなかった",
+        "2025/8/18 7:05": "旧ETLは空白を消してから読むので時刻付きを読めなかった",
+        "2025-08-18 00:00:00+09:00": "旧ETLは空白を消してから読むので時刻付きを読めなかった",
+        "20250818": "旧ETLは8桁を範囲外のシリアルとして捨てていた（旧Upload と同じ YYYYMMDD に揃えた）",
+        "Aug 18 2025": "旧ETLは空白を消して 0001-08-01 と誤読していた",
+    },
+    "upload": {
+        "２０２５／８／１８": "旧Uploadは全角数字を半角にしていなかった",
+        "２０２５－０８－１８": "旧Uploadは全角数字を半角にしていなかった",
+    },
+}
+INTENDED_AMOUNT_DIFFS = {
+    "etl": {},
+    "upload": {
+        "1 234": "旧Uploadは空白の前で数字を切って 0.001kg にしていた（空白は桁区切りとして除く）",
+    },
+}
+
+
+def read_csv_with_fallback(path: Path) -> pd.DataFrame:
+    for enc in ENC_CANDIDATES:
+        try:
+            return pd.read_csv(path, encoding=enc)
+        except UnicodeDecodeError:
+            continue
+    raise UnicodeDecodeError("unknown", b"", 0, 1, f"{path.name}: decode failed")
+
+
+def load_inbox_column(name_candidates: tuple[str, ...]) -> pd.Series:
+    """data/inbox/harvest の CSV から、name_candidates のどれかに一致する列をつなげて返す。"""
+    parts = []
+    for p in sorted(INBOX_DIR.glob("*.csv")):
+        df = read_csv_with_fallback(p)
+        col = next((c for c in df.columns if str(c).strip() in name_candidates), None)
+        if col is not None:
+            parts.append(df[col])
+    return pd.concat(parts, ignore_index=True)
+
+
+def same(a, b) -> bool:
+    """新旧の結果が同じか（None と NaN は同じとみなす）。"""
+    if a is None or (isinstance(a, float) and pd.isna(a)):
+        return b is None or (isinstance(b, float) and pd.isna(b))
+    # float も完全一致で比べる（amount_kg は重複判定キーに含まれる）
+    return a == b
@@ -0,0 +1,61 @@
+"""app.core.env_archive: farm 名をそのままパスにしないこと（データセットの外に書かない・読み戻せる）。"""
+from __future__ import annotations
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+from app.core.db import dispose_engines, get_engine
+from app.core.env_archive import PART_FILE, archive_env_months, list_partitions, partition_dir, read_env
+from app.core.env_store import ENV_VALUE_COLUMNS, insert_env_samples
+from app.core.migrations import migrate
+
+FARMS = ["愛川C1", "../outside", "a/b", "x=1%2"]
+
+
+def test_partition_dir_stays_under_root(tmp_path):
+    root = tmp_path / "env"
+    for farm in FARMS:
+        d = partition_dir(farm, "2025-08", root)
+        assert d.parent.parent == root
+        assert d.parent.name.startswith("farm=")
+
+
+def test_archive_round_trip_with_unsafe_farm_names(tmp_path):
+    root = tmp_path / "archive" / "env"
+    engine = get_engine(tmp_path / "env.db")
+    migrate(engine)
+    df = pd.DataFrame({
+        "farm": [f for f in FARMS for _ in range(2)],
+        "ts": pd.to_datetime(["2025-08-01 00:00:00", "2025-08-01 00:10:00"] * len(FARMS)),
+        **{c: [float(i) for i in range(2 * len(FARMS))] for c in ENV_VALUE_COLUMNS},
+    })
+    try:
+        with engine.begin() as conn:
+            insert_env_samples(conn, df)
+            done = archive_env_months(conn, "2025-09", root)
+        with engine.connect() as conn:
+            back = read_env(conn, columns=["air_temp_c"], root=root)
+    finally:
+        dispose_engines()
+
+    assert sorted(f for f, _, _ in done) == sorted(FARMS)
+    # 書いたファイルはすべてルートの下
+    assert all(root in path.parents for _, _, path in list_partitions(root=root))
+    assert not (tmp_path / "archive" / "outside").exists()
+    assert sorted(back["farm"].unique()) == sorted(FARMS)
+    assert len(back) == len(df)
+
+    # pyarrow の Hive パーティションとして読んでも farm 名に戻る
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    farms = dataset.to_table(columns=["farm"]).column("farm").to_pylist()
+    assert sorted(set(farms)) == sorted(FARMS)
+
+
+@pytest.mark.parametrize("farm", FARMS)
+def test_list_partitions_filters_by_decoded_name(tmp_path, farm):
+    root = tmp_path / "env"
+    d = partition_dir(farm, "2025-08", root)
+    d.mkdir(parents=True)
+    (d / PART_FILE).write_bytes(b"")
+    assert [(f, m) for f, m, _ in list_partitions([farm], root=root)] == [(farm, "2025-08")]
@@ -0,0 +1,60 @@
+"""app.core.env_rollup: 解像度の選び方（pick_resolution）と LTTB の間引き。"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.env_rollup import DEFAULT_POINTS, RESOLUTIONS, lttb, pick_resolution
+
+START = pd.Timestamp("2025-01-01")
+ONE_SEC = pd.Timedelta(seconds=1)
+
+
+@pytest.mark.parametrize(
+    "resolution, finer",
+    [("month", "day"), ("day", "hour"), ("hour", "raw")],
+)
+@pytest.mark.parametrize("points", [DEFAULT_POINTS, 100])
+def test_pick_resolution_boundary(resolution, finer, points):
+    # 区間数がちょうど points の半分でその解像度、1秒でも短ければ1段細かい解像度
+    window = pd.Timedelta(seconds=RESOLUTIONS[resolution] * points / 2)
+    assert pick_resolution(START, START + window, points) == resolution
+    assert pick_resolution(START, START + window - ONE_SEC, points) == finer
+
+
+def test_pick_resolution_long_and_short_windows():
+    assert pick_resolution(START, START + pd.Timedelta(days=5 * 365)) == "day"
+    assert pick_resolution(START, START + pd.Timedelta(days=30)) == "hour"
+    assert pick_resolution(START, START + pd.Timedelta(days=7)) == "raw"
+    # 文字列でも受け付ける
+    assert pick_resolution("2000-01-01", "2025-01-01") == "month"
+
+
+@pytest.mark.parametrize("size, n", [(10_000, 500), (1_000, 3), (501, 500), (7, 4)])
+def test_lttb_returns_n_points_keeping_first_and_last(size, n):
+    rng = np.random.default_rng(0)
+    x = np.arange(size, dtype=float)
+    y = rng.normal(size=size)
+
+    keep = lttb(x, y, n)
+
+    assert len(keep) == n
+    assert keep[0] == 0
+    assert keep[-1] == size - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+@pytest.mark.parametrize("size, n", [(100, 100), (100, 500), (100, 2), (0, 10)])
+def test_lttb_passthrough(size, n):
+    # n が点数以上（または 3 未満）なら間引かない
+    x = np.arange(size, dtype=float)
+    np.testing.assert_array_equal(lttb(x, np.sin(x), n), np.arange(size))
+
+
+def test_lttb_keeps_spike():
+    # 平坦な系列の1点だけの突出は、三角形の面積が最大なので残る
+    x = np.arange(10_000, dtype=float)
+    y = np.zeros_like(x)
+    y[4_321] = 50.0
+    assert 4_321 in lttb(x, y, 100)
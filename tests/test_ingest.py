@@ -0,0 +1,82 @@
+"""app.core.ingest.ingest_files: パース中は書き込みロックを持たないこと、失敗したファイルだけ巻き戻すこと。"""
+from __future__ import annotations
+
+import sqlite3
+from functools import partial
+
+import pandas as pd
+
+from app.core.db import dispose_engines, get_engine
+from app.core.ingest import ingest_files
+
+
+def _parse_while_writing(db_path: str, path: str) -> pd.DataFrame:
+    # ingest_files のパース中に別の接続から書けること（待たずに失敗させる）
+    con = sqlite3.connect(db_path, timeout=0)
+    try:
+        con.execute("INSERT INTO other(v) VALUES (?)", (path,))
+        con.commit()
+    finally:
+        con.close()
+    if path == "bad":
+        raise ValueError("broken file")
+    return pd.DataFrame({"v": [path]})
+
+
+def _write(conn, entry: dict, df: pd.DataFrame, t0: float) -> None:
+    df.to_sql("t", conn, if_exists="append", index=False)
+    if entry["path"] == "fails_on_write":
+        raise RuntimeError("write failed")
+
+
+def test_parse_runs_outside_the_write_transaction(tmp_path):
+    db = tmp_path / "ingest.db"
+    engine = get_engine(db)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (v TEXT)")
+        conn.exec_driver_sql("CREATE TABLE other (v TEXT)")
+
+    entries = [{"path": p} for p in ("a", "bad", "b", "fails_on_write", "c")]
+    try:
+        ok, errors = ingest_files(engine, entries, partial(_parse_while_writing, str(db)), _write)
+        with engine.connect() as conn:
+            written = [r[0] for r in conn.exec_driver_sql("SELECT v FROM t ORDER BY v")]
+            other = conn.exec_driver_sql("SELECT COUNT(*) FROM other").scalar_one()
+    finally:
+        dispose_engines()
+
+    assert ok == 3
+    assert [p for p, _ in errors] == ["bad", "fails_on_write"]
+    assert written == ["a", "b", "c"]
+    assert other == 5
+
+
+def _parse_after_committed(db_path: str, path: str) -> pd.DataFrame:
+    # パースの時点で、前のバッチまでの書き込みが別の接続から見えること（コミット済み）
+    con = sqlite3.connect(db_path, timeout=0)
+    try:
+        con.execute("INSERT INTO other(v) SELECT ? || ':' || COUNT(*) FROM t", (path,))
+        con.commit()
+    finally:
+        con.close()
+    return pd.DataFrame({"v": [path]})
+
+
+def test_writes_in_bounded_batches(tmp_path):
+    db = tmp_path / "ingest.db"
+    engine = get_engine(db)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (v TEXT)")
+        conn.exec_driver_sql("CREATE TABLE other (v TEXT)")
+
+    entries = [{"path": p} for p in ("a", "b", "c", "d", "e")]
+    try:
+        ok, errors = ingest_files(engine, entries, partial(_parse_after_committed, str(db)), _write, batch_size=2)
+        with engine.connect() as conn:
+            seen = [r[0] for r in conn.exec_driver_sql("SELECT v FROM other ORDER BY rowid")]
+    finally:
+        dispose_engines()
+
+    assert (ok, errors) == (5, [])
+    # 2ファイルずつ書いてコミットし、次の2ファイルはその後にパースする
+    assert seen == ["a:0", "b:0", "c:2", "d:2", "e:4"]
@@ -0,0 +1,96 @@
+"""
+app.common.parsers と旧実装（ETL版・Upload版。tests/legacy_parsers.py に保存）の一致確認。
+
+旧実装ごとに別々に比べる。意図して結果を変えた値は legacy_parsers.INTENDED_*_DIFFS に理由付きで挙げてあり、
+その値は「旧実装と実際に違うこと」も確かめる（表が古くならないように）。
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from app.common.parsers import parse_amounts_kg, parse_harvest_dates
+from tests.legacy_parsers import (
+    AMOUNT_SAMPLES,
+    INTENDED_AMOUNT_DIFFS,
+    INTENDED_DATE_DIFFS,
+    SAMPLES,
+    legacy_etl_parse_amount_to_kg,
+    legacy_etl_parse_harvest_date,
+    legacy_upload_parse_amount_to_kg,
+    legacy_upload_parse_harvest_date,
+    load_inbox_column,
+    same,
+)
+
+DATE_LEGACY = {"etl": legacy_etl_parse_harvest_date, "upload": legacy_upload_parse_harvest_date}
+AMOUNT_LEGACY = {"etl": legacy_etl_parse_amount_to_kg, "upload": legacy_upload_parse_amount_to_kg}
+
+
+def _compare(values: list, new: pd.Series, legacy_fn, intended: dict) -> tuple[list, list]:
+    """(意図しない差分, 差分が無くなった intended の値)"""
+    unexpected, stale = [], []
+    for v, got in zip(values, new):
+        old = legacy_fn(v)
+        if v in intended:
+            if same(got, old):
+                stale.append(v)
+        elif not same(got, old):
+            unexpected.append((v, got, old))
+    return unexpected, stale
+
+
+@pytest.mark.parametrize("path", ["etl", "upload"])
+def test_dates_match_each_legacy_parser(path):
+    inbox = load_inbox_column(("収穫日", "日付", "harvest_date", "date"))
+    values = list(pd.unique(pd.concat([inbox.dropna().astype(str), pd.Series(SAMPLES)])))
+    new = parse_harvest_dates(pd.Series(values, dtype=object))
+    unexpected, stale = _compare(values, new, DATE_LEGACY[path], INTENDED_DATE_DIFFS[path])
+    assert unexpected == []
+    assert stale == []
+
+
+@pytest.mark.parametrize("path", ["etl", "upload"])
+def test_amounts_match_each_legacy_parser(path):
+    inbox = load_inbox_column(("収穫量（ｇ）", "収穫量"))
+    values = list(pd.unique(pd.concat([inbox.dropna().astype(str), pd.Series(AMOUNT_SAMPLES)])))
+    new = parse_amounts_kg(pd.Series(values, dtype=object), "g")
+    unexpected, stale = _compare(values, new, AMOUNT_LEGACY[path], INTENDED_AMOUNT_DIFFS[path])
+    assert unexpected == []
+    assert stale == []
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        # タイムゾーン付きは書かれた日付のまま（UTC に直さない）
+        ("2025-08-18 00:00:00+09:00", "2025-08-18"),
+        ("2025-08-18T23:30:00Z", "2025-08-18"),
+        ("2025/8/18 10:00 +0900", "2025-08-18"),
+        # 8桁は YYYYMMDD（旧Upload と同じ）
+        ("20250818", "2025-08-18"),
+        ("20251301", None),
+        # 時刻が不正なら日付ごと捨てる（旧実装どちらも捨てていた）
+        ("2025/8/18 25:00", None),
+        ("2025/8/18 10:61", None),
+        ("2025/08/18 23:59:60", None),
+        ("2025/8/18 23:59:59", "2025-08-18"),
+    ],
+)
+def test_date_edge_cases(value, expected):
+    assert parse_harvest_dates(pd.Series([value])).iloc[0] == expected
+
+
+def test_tz_offsets_mixed_with_fallback_values_do_not_raise():
+    values = pd.Series([
+        "2025-08-18 00:00:00+09:00", "Aug 18 2025", "18 Aug 2025 10:00+09:00",
+        "Tue, 19 Aug 2025 10:00:00 +0000", "2025-08-18 00:00:00 +09:00 JST", None,
+    ])
+    assert parse_harvest_dates(values).tolist() == [
+        "2025-08-18", "2025-08-18", "2025-08-18", "2025-08-19", None, None,
+    ]
+
+
+def test_space_as_thousands_separator():
+    # 旧Upload（0.001）とは意図して変えた値。旧ETL と同じ
+    assert parse_amounts_kg(pd.Series(["1 234", "1 234 g", "1.2 kg"]), "g").tolist() == [1.234, 1.234, 1.2]
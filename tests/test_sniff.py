@@ -0,0 +1,102 @@
+"""app.common.sniff: 先頭 SNIFF_BYTES より後ろに初めてマルチバイト文字が出るファイルの文字コードのやり直しと、列の役割の判定。"""
+from __future__ import annotations
+
+import io
+from functools import partial
+
+import pandas as pd
+import pytest
+
+from app.common import sniff
+from app.common.sniff import SNIFF_BYTES, SNIFF_CACHE_SIZE, retry_encodings, sniff_bytes, sniff_file
+from etl.import_harvest_csv import parse_harvest_file
+
+HEADER = "date,company,crop,amount\n"
+ASCII_ROW = "2025/8/18,Makino,Lettuce,100\n"
+LATE_ROW = "2025/8/19,牧野フライス,BLレッドオーク,300\n"
+
+
+def _late_multibyte_csv(encoding: str) -> bytes:
+    n = SNIFF_BYTES // len(ASCII_ROW) + 100
+    return (HEADER + ASCII_ROW * n + LATE_ROW).encode(encoding)
+
+
+@pytest.mark.parametrize("encoding", ["cp932", "utf-8"])
+def test_harvest_file_with_late_multibyte_char(tmp_path, encoding):
+    path = tmp_path / f"late_{encoding}.csv"
+    path.write_bytes(_late_multibyte_csv(encoding))
+    # 先頭は ASCII だけなので utf-8-sig と判定される
+    assert sniff_file(path)["encoding"] == "utf-8-sig"
+
+    df = parse_harvest_file(str(path))
+
+    assert df["c2"].iloc[-1] == "牧野フライス"
+    assert df["c3"].iloc[-1] == "BLレッドオーク"
+    assert len(df) == SNIFF_BYTES // len(ASCII_ROW) + 101
+    # 決め直した文字コードは以後の sniff_file() でも返る
+    assert sniff_file(path)["encoding"] == ("cp932" if encoding == "cp932" else "utf-8-sig")
+
+
+def test_chunked_buffer_read_restarts_with_next_encoding():
+    # CSV Upload と同じく、バッファをチャンクで読む途中で UnicodeDecodeError になる場合
+    buf = io.BytesIO(_late_multibyte_csv("cp932"))
+    head = buf.read(SNIFF_BYTES)
+    attempts = []
+
+    def read(info: dict) -> pd.DataFrame:
+        attempts.append(info["encoding"])
+        buf.seek(0)
+        chunks = pd.read_csv(buf, chunksize=500, encoding=info["encoding"], header=info["header_row"], dtype=str)
+        return pd.concat(list(chunks), ignore_index=True)
+
+    info, df = retry_encodings(sniff_bytes(head), partial(sniff_bytes, head), read)
+
+    assert attempts == ["utf-8-sig", "cp932"]
+    assert info["encoding"] == "cp932"
+    assert df["company"].iloc[-1] == "牧野フライス"
+
+
+def test_undecodable_file_still_raises():
+    data = (HEADER + ASCII_ROW * (SNIFF_BYTES // len(ASCII_ROW) + 100)).encode() + b"2025/8/19,\x81,x,1\n"
+    buf = io.BytesIO(data)
+    head = buf.read(SNIFF_BYTES)
+
+    def read(info: dict) -> pd.DataFrame:
+        buf.seek(0)
+        return pd.read_csv(buf, encoding=info["encoding"], header=info["header_row"], dtype=str)
+
+    with pytest.raises(UnicodeDecodeError):
+        retry_encodings(sniff_bytes(head), partial(sniff_bytes, head), read)
+
+
+@pytest.mark.parametrize(
+    "header, layout, roles",
+    [
+        # 収量CSV は日付を先に見る
+        ("収穫日時,企業名,作物名,収穫量", "harvest", {"date": 0, "company": 1, "crop": 2, "amount": 3}),
+        # 旧実装が受け付けていた収量の列名
+        ("収穫日,会社名,品目,重量(g)", "harvest", {"date": 0, "company": 1, "crop": 2, "amount": 3}),
+        ("date,company,crop,weight_kg", "harvest", {"date": 0, "company": 1, "crop": 2, "amount": 3}),
+        # GL240 の "日付 時間" は時刻のまま
+        ("No.,日付 時間,ms,CH1,CH2", "gl240", {"time": 1, "ch1": 3, "ch2": 4}),
+    ],
+)
+def test_header_roles(header, layout, roles):
+    info = sniff_bytes((header + "\n").encode("utf-8"))
+    assert info["layout"] == layout
+    assert info["roles"] == roles
+
+
+def test_encoding_overrides_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(sniff, "_ENCODING_OVERRIDES", {})
+    paths = []
+    for i in range(SNIFF_CACHE_SIZE + 10):
+        path = tmp_path / f"{i}.csv"
+        path.write_bytes(HEADER.encode())
+        sniff_file(path, "cp932")
+        paths.append(path)
+
+    assert len(sniff._ENCODING_OVERRIDES) == SNIFF_CACHE_SIZE
+    # 古いものから捨て、新しいものは残る
+    assert sniff_file(paths[-1])["encoding"] == "cp932"
+    assert sniff_file(paths[0])["encoding"] == "utf-8-sig"
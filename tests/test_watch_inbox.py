@@ -0,0 +1,78 @@
+"""etl/watch_inbox.py: バッチの取り込み・集計で例外が出ても監視を続け、ファイルを inbox に残すこと。"""
+from __future__ import annotations
+
+import os
+import time
+from argparse import Namespace
+from datetime import date
+
+from etl import watch_inbox
+
+
+def _args() -> Namespace:
+    return Namespace(settle=0.0, batch=10, jobs=1, farm="test")
+
+
+def _state() -> dict:
+    return {"seen": {k: {} for k in watch_inbox.KINDS}, "failed": {k: {} for k in watch_inbox.KINDS}}
+
+
+def _put(inbox, name: str) -> None:
+    p = inbox / "harvest" / name
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text("date,company,crop,amount\n")
+    old = time.time() - 60
+    os.utime(p, (old, old))
+
+
+def test_failed_batch_keeps_files_in_inbox(tmp_path, monkeypatch):
+    inbox = tmp_path / "inbox"
+    monkeypatch.setattr(watch_inbox, "INBOX_DIR", inbox)
+    monkeypatch.setattr(watch_inbox, "ARCHIVE_DIR", tmp_path / "archive" / "raw")
+    calls = []
+
+    def broken_ingest(kind, paths, jobs, farm):
+        calls.append([p.name for p in paths])
+        raise RuntimeError("refresh failed")
+
+    monkeypatch.setattr(watch_inbox, "ingest", broken_ingest)
+    _put(inbox, "a.csv")
+    _put(inbox, "b.csv")
+    state = _state()
+
+    watch_inbox.poll_once(state, _args())   # 1回目は一覧を取るだけ
+    assert watch_inbox.poll_once(state, _args()) == 2
+    assert calls == [["a.csv", "b.csv"]]
+    assert sorted(p.name for p in (inbox / "harvest").iterdir()) == ["a.csv", "b.csv"]
+    assert not (tmp_path / "archive").exists()
+
+    # 失敗したファイルは中身が変わるまで再試行しない
+    assert watch_inbox.poll_once(state, _args()) == 0
+    assert len(calls) == 1
+
+
+def test_failed_file_removed_during_batch(tmp_path, monkeypatch):
+    inbox = tmp_path / "inbox"
+    monkeypatch.setattr(watch_inbox, "INBOX_DIR", inbox)
+    monkeypatch.setattr(watch_inbox, "ARCHIVE_DIR", tmp_path / "archive" / "raw")
+
+    def ingest_then_removed(kind, paths, jobs, farm):
+        # 取り込みに失敗している間に、ファイルが inbox から消された
+        (inbox / "harvest" / "a.csv").unlink()
+        raise RuntimeError("refresh failed")
+
+    monkeypatch.setattr(watch_inbox, "ingest", ingest_then_removed)
+    _put(inbox, "a.csv")
+    _put(inbox, "b.csv")
+    state = _state()
+
+    watch_inbox.poll_once(state, _args())
+    assert watch_inbox.poll_once(state, _args()) == 2
+    assert [p.name for p in state["failed"]["harvest"]] == ["b.csv"]
+    assert [p.name for p in (inbox / "harvest").iterdir()] == ["b.csv"]
+
+def test_archive_dir_is_separate_from_parquet_dataset():
+    from app.common.constants import ENV_ARCHIVE_DIR
+
+    dest = watch_inbox.archive_path("env", watch_inbox.INBOX_DIR / "env" / "x.csv", date(2025, 8, 1))
+    assert ENV_ARCHIVE_DIR not in dest.parents